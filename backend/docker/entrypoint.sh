@@ -8,6 +8,11 @@ if [ "${RUNNING_IN_DOCKER}" = "1" ]; then
   export POSTGRES_URL="postgresql://${POSTGRES_USER}:${POSTGRES_PASSWORD}@${POSTGRES_HOST}/${POSTGRES_DB}"
 fi
 
+if [ "${PROCESS_TYPE}" = "worker" ]; then
+  echo 'Running Submission Worker'
+  exec python -m src.worker
+fi
+
 echo 'Running Migrations'
 alembic upgrade head
 
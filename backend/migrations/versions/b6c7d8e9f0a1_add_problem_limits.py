@@ -0,0 +1,28 @@
+"""Add problem time and memory limits
+
+Revision ID: b6c7d8e9f0a1
+Revises: a5b6c7d8e9f0
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "b6c7d8e9f0a1"
+down_revision: Union[str, None] = "a5b6c7d8e9f0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("problems", sa.Column("time_limit_ms", sa.Integer(), nullable=True))
+    op.add_column("problems", sa.Column("memory_limit_mb", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("problems", "memory_limit_mb")
+    op.drop_column("problems", "time_limit_ms")
@@ -0,0 +1,26 @@
+"""Add submission result_json
+
+Revision ID: d2e3f4a5b6c7
+Revises: c9d8e7f6a5b4
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "d2e3f4a5b6c7"
+down_revision: Union[str, None] = "c9d8e7f6a5b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("submissions", sa.Column("result_json", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("submissions", "result_json")
@@ -0,0 +1,28 @@
+"""Add problem output checker
+
+Revision ID: e3f4a5b6c7d8
+Revises: d2e3f4a5b6c7
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "e3f4a5b6c7d8"
+down_revision: Union[str, None] = "d2e3f4a5b6c7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("problems", sa.Column("checker", sa.String(), nullable=False, server_default="whitespace"))
+    op.add_column("problems", sa.Column("checker_tolerance", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("problems", "checker_tolerance")
+    op.drop_column("problems", "checker")
@@ -0,0 +1,32 @@
+"""Add test case blob references
+
+Revision ID: f4a5b6c7d8e9
+Revises: e3f4a5b6c7d8
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "f4a5b6c7d8e9"
+down_revision: Union[str, None] = "e3f4a5b6c7d8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("problem_test_cases", sa.Column("input_hash", sa.String(length=64), nullable=True))
+    op.add_column("problem_test_cases", sa.Column("input_size", sa.Integer(), nullable=True))
+    op.add_column("problem_test_cases", sa.Column("output_hash", sa.String(length=64), nullable=True))
+    op.add_column("problem_test_cases", sa.Column("output_size", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("problem_test_cases", "output_size")
+    op.drop_column("problem_test_cases", "output_hash")
+    op.drop_column("problem_test_cases", "input_size")
+    op.drop_column("problem_test_cases", "input_hash")
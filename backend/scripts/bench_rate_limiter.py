@@ -0,0 +1,66 @@
+"""Hit the in-memory rate limiter with distinct keys and report time and memory.
+
+    python scripts/bench_rate_limiter.py --keys 1000000
+
+Run from ``backend/`` with the usual env files in place. The first pass uses
+a long window so every key stays live and only ``--max-keys`` bounds the
+table; the second uses a window short enough for keys to go idle and be
+evicted as new ones arrive, like a scan against /auth/login.
+"""
+
+import argparse
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from app.services.rate_limiter import InMemoryRateLimiter
+
+
+def run(keys: int, threads: int, window_seconds: float, shards: int, max_keys: int, trace: bool) -> None:
+    limiter = InMemoryRateLimiter(shards=shards, max_keys=max_keys)
+    per_thread = keys // threads
+
+    def worker(offset: int) -> None:
+        for i in range(offset, offset + per_thread):
+            limiter.hit(f"login:ip:10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}#{i}", 10, window_seconds)
+
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(n * per_thread,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    tracemalloc.stop()
+
+    total = per_thread * threads
+    print(
+        f"window={window_seconds:>8}s keys={total:,} threads={threads} "
+        f"{total / elapsed:,.0f} hits/s retained={len(limiter):,}"
+        + (f" peak={peak / 2**20:,.1f} MiB" if trace else "")
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--shards", type=int, default=64)
+    parser.add_argument("--max-keys", type=int, default=1_000_000)
+    parser.add_argument("--no-trace", action="store_true", help="skip tracemalloc, which slows hits down")
+    args = parser.parse_args()
+
+    for window in (3600.0, 0.001):
+        run(args.keys, args.threads, window, args.shards, args.max_keys, not args.no_trace)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
+import math
+
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.services.piston import execute_piston
+from app.services.sandbox_guard import SandboxUnavailable
 from database import get_db
 from app.controllers.auth import get_current_user
 from app.models import Submission
@@ -13,8 +15,7 @@ router = APIRouter()
 
 @router.post("/execute", response_model=ExecutionResult)
 async def execute_code(payload: ExecutionRequest):
-    result = await run_in_threadpool(
-        execute_piston,
+    result = await execute_piston(
         payload.language,
         payload.code,
         payload.input or "",
@@ -29,8 +30,7 @@ async def execute_code(payload: ExecutionRequest):
 
 async def forward_execute(payload: ExecutionRequest) -> ExecutionResult:
     try:
-        result = await run_in_threadpool(
-            execute_piston,
+        result = await execute_piston(
             payload.language,
             payload.code,
             payload.input or "",
@@ -43,6 +43,12 @@ async def forward_execute(payload: ExecutionRequest) -> ExecutionResult:
         )
     except HTTPException:
         raise
+    except SandboxUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
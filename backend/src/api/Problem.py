@@ -6,11 +6,16 @@ from schemas import *
 from app.models import *
 from database import get_db
 from app.controllers.auth import require_admin
+from app.services.case_blobs import store_case_text
+from app.services.case_bundles import case_bundle_cache
+from app.services.verdict_cache import verdict_cache
 from sqlalchemy import func
 from datetime import datetime
 
 router = APIRouter()
 
+_JUDGING_FIELDS = ("checker", "checker_tolerance", "time_limit_ms", "memory_limit_mb")
+
 def serialize_problem(problem: Problem) -> ProblemOut:
     test_cases = []
     if problem.test_cases:
@@ -21,6 +26,11 @@ def serialize_problem(problem: Problem) -> ProblemOut:
                 output_text=tc.output_text,
                 is_sample=tc.is_sample,
                 order=tc.order,
+                input_hash=tc.input_hash,
+                output_hash=tc.output_hash,
+                input_size=tc.input_size,
+                output_size=tc.output_size,
+                truncated=bool(tc.input_hash or tc.output_hash),
             )
             for tc in sorted(problem.test_cases, key=lambda t: t.order)
             if tc.is_sample
@@ -56,6 +66,48 @@ def serialize_problem(problem: Problem) -> ProblemOut:
         tags=problem.tags,
         test_cases=test_cases,
         starter_codes=starter_codes,
+        checker=problem.checker or "whitespace",
+        checker_tolerance=problem.checker_tolerance,
+        time_limit_ms=problem.time_limit_ms,
+        memory_limit_mb=problem.memory_limit_mb,
+    )
+
+def _case_blobs(cases) -> dict:
+    # Keyed by hash and by (order, field): previews alone can collide.
+    blobs = {}
+    for tc in cases or ():
+        for field, text, digest, size in (
+            ("input", tc.input_text, tc.input_hash, tc.input_size),
+            ("output", tc.output_text, tc.output_hash, tc.output_size),
+        ):
+            if digest:
+                blobs[digest] = blobs[(tc.order, field)] = (text, digest, size)
+    return blobs
+
+def _store_or_keep(text: str, digest: Optional[str], blobs: dict, position: tuple):
+    # A blob-backed field comes back from the API as its preview (and hash);
+    # saving that would replace the real data, so keep the blob unless edited.
+    # Without the hash only the same case's own preview counts as unedited.
+    kept = blobs.get(digest) if digest else blobs.get(position)
+    if kept is not None and text == kept[0]:
+        return kept
+    return store_case_text(text)
+
+def build_test_case(problem_id: int, tc: ProblemTestCaseIn, idx: int, blobs: Optional[dict] = None) -> ProblemTestCase:
+    blobs = blobs or {}
+    order = tc.order if tc.order is not None else idx
+    input_text, input_hash, input_size = _store_or_keep(tc.input_text, tc.input_hash, blobs, (order, "input"))
+    output_text, output_hash, output_size = _store_or_keep(tc.output_text, tc.output_hash, blobs, (order, "output"))
+    return ProblemTestCase(
+        problem_id=problem_id,
+        input_text=input_text,
+        output_text=output_text,
+        input_hash=input_hash,
+        input_size=input_size,
+        output_hash=output_hash,
+        output_size=output_size,
+        is_sample=tc.is_sample if tc.is_sample is not None else True,
+        order=order,
     )
 
 def default_starter_codes(title: str) -> List[ProblemStarterCodeIn]:
@@ -94,6 +146,10 @@ def create_problem(data: ProblemIn, db: Session = Depends(get_db), user=Depends(
             external_link=data.external_link,
             description=data.description,
             constraints=data.constraints,
+            checker=data.checker,
+            checker_tolerance=data.checker_tolerance,
+            time_limit_ms=data.time_limit_ms,
+            memory_limit_mb=data.memory_limit_mb,
             tags=tags
         )
         db.add(problem)
@@ -101,13 +157,7 @@ def create_problem(data: ProblemIn, db: Session = Depends(get_db), user=Depends(
         db.refresh(problem)
         if data.test_cases:
             for idx, tc in enumerate(data.test_cases):
-                db.add(ProblemTestCase(
-                    problem_id=problem.id,
-                    input_text=tc.input_text,
-                    output_text=tc.output_text,
-                    is_sample=tc.is_sample if tc.is_sample is not None else True,
-                    order=tc.order if tc.order is not None else idx,
-                ))
+                db.add(build_test_case(problem.id, tc, idx))
             db.commit()
             db.refresh(problem)
         starter_codes = data.starter_codes or default_starter_codes(problem.title)
@@ -191,17 +241,21 @@ def update_problem(problem_id: int, data: ProblemIn, db: Session = Depends(get_d
         problem.external_link = data.external_link
         problem.description = data.description
         problem.constraints = data.constraints
+        # Fields the client left out keep their stored value.
+        judging_changed = False
+        for field in _JUDGING_FIELDS:
+            if field in data.model_fields_set and getattr(problem, field) != getattr(data, field):
+                setattr(problem, field, getattr(data, field))
+                judging_changed = True
         problem.tags = db.query(Tag).filter(Tag.id.in_(data.tag_ids)).all()
         if data.test_cases is not None:
+            blobs = _case_blobs(problem.test_cases)
             db.query(ProblemTestCase).filter(ProblemTestCase.problem_id == problem_id).delete()
             for idx, tc in enumerate(data.test_cases):
-                db.add(ProblemTestCase(
-                    problem_id=problem_id,
-                    input_text=tc.input_text,
-                    output_text=tc.output_text,
-                    is_sample=tc.is_sample if tc.is_sample is not None else True,
-                    order=tc.order if tc.order is not None else idx,
-                ))
+                db.add(build_test_case(problem_id, tc, idx, blobs=blobs))
+        judging_changed = judging_changed or data.test_cases is not None
+        if judging_changed:
+            problem.test_version = (problem.test_version or 1) + 1
         if data.starter_codes is not None:
             db.query(ProblemStarterCode).filter(ProblemStarterCode.problem_id == problem_id).delete()
             for sc in data.starter_codes:
@@ -211,6 +265,9 @@ def update_problem(problem_id: int, data: ProblemIn, db: Session = Depends(get_d
                     code=sc.code,
                 ))
         db.commit()
+        if judging_changed:
+            case_bundle_cache.invalidate(problem_id, problem.test_version)
+            verdict_cache.invalidate_problem(problem_id)
         db.refresh(problem)
         return serialize_problem(problem)
     except Exception as e:
@@ -223,8 +280,11 @@ def delete_problem(problem_id: int, db: Session = Depends(get_db), user=Depends(
         problem = db.get(Problem, problem_id)
         if not problem:
             raise HTTPException(status_code=404, detail="Problem not found")
+        version = (problem.test_version or 1) + 1
         db.delete(problem)
         db.commit()
+        case_bundle_cache.invalidate(problem_id, version)
+        verdict_cache.invalidate_problem(problem_id)
         return {"detail": "Deleted"}
     except Exception as e:
         db.rollback()
@@ -1,71 +1,257 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import math
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.controllers.auth import get_current_user
 from app.controllers.submission import (
     list_user_problem_submissions,
     run_problem_submission,
+    stream_run_problem_submission,
+    stream_submit_problem_solution,
     submit_problem_solution,
 )
-from app.services.rate_limiter import rate_limit_from_setting
+from app.controllers.submission_jobs import enqueue_submission, job_status, load_submission_job, stream_submission_job
+from app.services.concurrency_limiter import ConcurrencyLimitExceeded, execution_leases
+from app.services.execution_quota import ExecutionQuota
+from app.services.execution_scheduler import ExecutionQueueFull
+from app.services.rate_limiter import bearer_user_id, extract_identity, rate_limit_from_setting
+from app.services.sandbox_guard import SandboxUnavailable
 from database import get_db
-from schemas import SubmissionListItem, SubmissionRequest, SubmissionSummary
+from schemas import SubmissionJobStatus, SubmissionListItem, SubmissionRequest, SubmissionSummary
 
 router = APIRouter()
 
 
+def _queue_full_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Execution queue is full, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _too_many_in_flight_error() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many executions in progress",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _lease_or_429(identity: str):
+    try:
+        return await execution_leases.acquire(identity)
+    except ConcurrencyLimitExceeded:
+        raise _too_many_in_flight_error()
+
+
+async def _release_after(events, lease):
+    try:
+        async for event in events:
+            yield event
+    finally:
+        await execution_leases.release(lease)
+
+
+def _sandbox_unavailable_error(exc: SandboxUnavailable) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(exc),
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
 @router.post(
     "/run",
     response_model=SubmissionSummary,
 )
-def run_submission(
+async def run_submission(
     payload: SubmissionRequest,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     _: None = Depends(rate_limit_from_setting("RATE_LIMIT_SUBMISSION_RUN", "submission:run")),
 ):
+    quota = ExecutionQuota.for_request(request, user_id=bearer_user_id(request))
     try:
-        return run_problem_submission(
-            db=db,
-            problem_id=payload.problem_id,
-            language=payload.language,
-            code=payload.code,
-        )
+        async with execution_leases.hold(extract_identity(request)):
+            return await run_problem_submission(
+                db=db,
+                problem_id=payload.problem_id,
+                language=payload.language,
+                code=payload.code,
+                owner=extract_identity(request),
+                fail_fast=payload.fail_fast,
+                quota=quota,
+            )
     except HTTPException:
         raise
+    except ConcurrencyLimitExceeded:
+        raise _too_many_in_flight_error()
+    except ExecutionQueueFull:
+        raise _queue_full_error()
+    except SandboxUnavailable as exc:
+        raise _sandbox_unavailable_error(exc)
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail="Execution service unavailable",
         )
+    finally:
+        response.headers.update(quota.headers())
 
 
 @router.post(
     "/submit",
     response_model=SubmissionSummary,
 )
-def submit_submission(
+async def submit_submission(
     payload: SubmissionRequest,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
     _: None = Depends(rate_limit_from_setting("RATE_LIMIT_SUBMISSION_SUBMIT", "submission:submit")),
 ):
+    quota = ExecutionQuota.for_request(request, user_id=user.id if user else None)
     try:
         if not user:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
-        return submit_problem_solution(
-            db=db,
-            user_id=user.id,
-            problem_id=payload.problem_id,
-            language=payload.language,
-            code=payload.code,
-        )
+        async with execution_leases.hold(f"user:{user.id}"):
+            return await submit_problem_solution(
+                db=db,
+                user_id=user.id,
+                problem_id=payload.problem_id,
+                language=payload.language,
+                code=payload.code,
+                fail_fast=payload.fail_fast,
+                quota=quota,
+            )
     except HTTPException:
         raise
+    except ConcurrencyLimitExceeded:
+        raise _too_many_in_flight_error()
+    except ExecutionQueueFull:
+        raise _queue_full_error()
+    except SandboxUnavailable as exc:
+        raise _sandbox_unavailable_error(exc)
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail="Execution service unavailable",
         )
+    finally:
+        response.headers.update(quota.headers())
+
+
+def _event_stream(events, headers=None) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})},
+    )
+
+
+@router.post("/run/stream")
+async def run_submission_stream(
+    payload: SubmissionRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    _: None = Depends(rate_limit_from_setting("RATE_LIMIT_SUBMISSION_RUN", "submission:run")),
+):
+    quota = ExecutionQuota.for_request(request, user_id=bearer_user_id(request))
+    lease = await _lease_or_429(extract_identity(request))
+    try:
+        events = await stream_run_problem_submission(
+            db=db,
+            problem_id=payload.problem_id,
+            language=payload.language,
+            code=payload.code,
+            owner=extract_identity(request),
+            fail_fast=payload.fail_fast,
+            quota=quota,
+        )
+    except BaseException:
+        await execution_leases.release(lease)
+        raise
+    return _event_stream(_release_after(events, lease), quota.headers())
+
+
+@router.post("/submit/stream")
+async def submit_submission_stream(
+    payload: SubmissionRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    _: None = Depends(rate_limit_from_setting("RATE_LIMIT_SUBMISSION_SUBMIT", "submission:submit")),
+):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    quota = ExecutionQuota.for_request(request, user_id=user.id)
+    lease = await _lease_or_429(f"user:{user.id}")
+    try:
+        events = await stream_submit_problem_solution(
+            db=db,
+            user_id=user.id,
+            problem_id=payload.problem_id,
+            language=payload.language,
+            code=payload.code,
+            fail_fast=payload.fail_fast,
+            quota=quota,
+        )
+    except BaseException:
+        await execution_leases.release(lease)
+        raise
+    return _event_stream(_release_after(events, lease), quota.headers())
+
+
+@router.post("/jobs", response_model=SubmissionJobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_submission_job(
+    payload: SubmissionRequest,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+    _: None = Depends(rate_limit_from_setting("RATE_LIMIT_SUBMISSION_SUBMIT", "submission:submit")),
+):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    quota = ExecutionQuota.for_request(request, user_id=user.id)
+    job = await enqueue_submission(
+        db=db,
+        user_id=user.id,
+        problem_id=payload.problem_id,
+        language=payload.language,
+        code=payload.code,
+        fail_fast=payload.fail_fast,
+        quota=quota,
+    )
+    response.headers.update(quota.headers())
+    return job
+
+
+@router.get("/jobs/{submission_id}", response_model=SubmissionJobStatus)
+def get_submission_job(
+    submission_id: int,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    return job_status(load_submission_job(db, user.id, submission_id))
+
+
+@router.get("/jobs/{submission_id}/events")
+def wait_submission_job(
+    submission_id: int,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    return _event_stream(stream_submission_job(load_submission_job(db, user.id, submission_id).id))
 
 
 @router.get("/problem/{problem_id}", response_model=list[SubmissionListItem])
@@ -4,7 +4,7 @@ from fastapi import Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 
 from app.schemas.auth import AuthPrincipal
-from app.services.auth import decode_access_token
+from app.services.auth import verify_access_token
 from config import settings
 from database import get_db
 from app.models import User
@@ -47,8 +47,10 @@ def get_current_user(request: Request) -> AuthPrincipal | None:
     token = extract_access_token(request)
     if not token:
         return None
-    payload = decode_access_token(token)
-    return principal_from_payload(payload)
+    verified = verify_access_token(token, request)
+    if verified.principal is None:
+        verified.principal = principal_from_payload(verified.payload)
+    return verified.principal
 
 
 def require_user(user: AuthPrincipal | None = Depends(get_current_user)) -> AuthPrincipal:
@@ -1,15 +1,33 @@
+import asyncio
+import json
+import logging
+import math
+from typing import AsyncIterator
+
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 
-from app.models import Problem, Submission
-from app.services.piston import execute_test_cases, summarize_results
+from app.models import Submission
+from config import settings
+from database import SessionLocal
+from app.services.case_bundles import CaseBundle, case_bundle_cache
+from app.services.execution_scheduler import DEFAULT_LANE, ExecutionQueueFull
+from app.services.piston import (
+    execute_test_cases,
+    local_backend,
+    runtime_version,
+    summarize_results,
+    summarize_usage,
+    total_cpu_seconds,
+)
+from app.services.sandbox_guard import SandboxUnavailable
+from app.services.single_flight import single_flight
+from app.services.verdict_cache import verdict_cache, verdict_cache_key
+from schemas import SubmissionSummary
 
+logger = logging.getLogger(__name__)
 
-def load_problem(db: Session, problem_id: int) -> Problem:
-    problem = db.get(Problem, problem_id)
-    if not problem:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Problem not found")
-    return problem
+session_factory = SessionLocal
 
 
 def normalize_language(value: str) -> str:
@@ -29,8 +47,11 @@ def serialize_cases(results, include_io: bool, only_sample: bool):
             "compile_output": result.get("compile_output"),
             "status": result.get("status"),
             "time": result.get("time"),
+            "cpu_time": result.get("cpu_time"),
             "memory": result.get("memory"),
+            "mismatch": result.get("mismatch"),
             "passed": result.get("passed"),
+            "skipped": result.get("skipped", False),
         }
         if include_io:
             case["input_text"] = result.get("input_text")
@@ -39,26 +60,120 @@ def serialize_cases(results, include_io: bool, only_sample: bool):
     return cases
 
 
-def run_problem_submission(db: Session, problem_id: int, language: str, code: str):
-    problem = load_problem(db, problem_id)
-    sample_cases = [tc for tc in problem.test_cases if tc.is_sample]
+def first_failed_case(results):
+    for index, result in enumerate(results):
+        if result.get("skipped") or result.get("passed"):
+            continue
+        return {
+            "index": index,
+            "id": result.get("id"),
+            "is_sample": result.get("is_sample", True),
+            "status": result.get("status"),
+            "line": (result.get("mismatch") or {}).get("line"),
+            "column": (result.get("mismatch") or {}).get("column"),
+        }
+    return None
+
+
+def load_case_bundle(db: Session, problem_id: int) -> CaseBundle:
+    bundle = case_bundle_cache.get(db, problem_id)
+    if bundle is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Problem not found")
+    return bundle
+
+
+async def judge_cases(
+    problem_id: int,
+    language: str,
+    code: str,
+    test_cases,
+    owner: str,
+    fail_fast: bool = False,
+    backend=None,
+    on_case=None,
+    limits=None,
+    lane: str = DEFAULT_LANE,
+    quota=None,
+):
+    cache_key = None
+    if settings.VERDICT_CACHE_ENABLED or settings.SINGLE_FLIGHT_ENABLED:
+        try:
+            cache_key = verdict_cache_key(
+                code,
+                language,
+                await runtime_version(language, backend),
+                test_cases,
+                fail_fast,
+                limits,
+            )
+        except Exception:
+            cache_key = None
+    if cache_key:
+        cached = await verdict_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    executed = False
+
+    async def _judge():
+        nonlocal executed
+        executed = True
+        results = await execute_test_cases(
+            language=language,
+            source_code=code,
+            test_cases=test_cases,
+            owner=owner,
+            fail_fast=fail_fast,
+            backend=backend,
+            on_case=on_case,
+            limits=limits,
+            lane=lane,
+        )
+        if cache_key:
+            await verdict_cache.set(cache_key, problem_id, results)
+        # Settled inside the shielded run, so a leader that disconnects still pays.
+        if quota is not None:
+            await quota.settle(total_cpu_seconds(results))
+        return results
+
+    # Streaming callers need their own per-case events, so only plain calls share a run.
+    if cache_key and on_case is None and settings.SINGLE_FLIGHT_ENABLED:
+        results = await single_flight.run(cache_key, _judge)
+        if not executed and quota is not None:
+            # A follower pays for the run it shared, like its leader did.
+            await quota.settle(total_cpu_seconds(results))
+        return results
+    return await _judge()
+
+
+def _algo_outputs(results):
+    return [
+        {"id": r.get("id"), "stdout": r.get("stdout"), "stderr": r.get("stderr")}
+        for r in results
+        if r.get("is_sample", True)
+    ]
+
+
+def _prepare_run(db: Session, problem_id: int, language: str, owner: str):
+    bundle = load_case_bundle(db, problem_id)
+    sample_cases = bundle.samples
     if not sample_cases:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No sample test cases available")
 
     normalized_language = normalize_language(language)
-    results = execute_test_cases(
-        language=normalized_language,
-        source_code=code,
-        test_cases=[
-            {
-                "id": tc.id,
-                "input_text": tc.input_text,
-                "output_text": tc.output_text,
-                "is_sample": tc.is_sample,
-            }
-            for tc in sorted(sample_cases, key=lambda t: t.order)
-        ],
+    backend = (
+        local_backend
+        if (
+            settings.EXECUTION_LOCAL_SAMPLE_RUNS
+            and local_backend.supports(normalized_language)
+            and local_backend.accepts(owner, "run")
+        )
+        else None
     )
+    return normalized_language, sample_cases, backend, bundle.limits(normalized_language)
+
+
+def _run_response(normalized_language: str, results):
     summary = summarize_results(results)
     response = {
         "verdict": summary["verdict"],
@@ -66,75 +181,256 @@ def run_problem_submission(db: Session, problem_id: int, language: str, code: st
         "total": summary["total"],
         "cases": serialize_cases(results, include_io=True, only_sample=True),
         "hidden": None,
+        "failed_case": first_failed_case(results),
+        **summarize_usage(results),
     }
     if normalized_language == "algo":
-        response["algo_outputs"] = [
-            {"id": r.get("id"), "stdout": r.get("stdout"), "stderr": r.get("stderr")}
-            for r in results
-            if r.get("is_sample", True)
-        ]
+        response["algo_outputs"] = _algo_outputs(results)
     return response
 
 
-def submit_problem_solution(
+async def run_problem_submission(
     db: Session,
-    user_id: int,
     problem_id: int,
     language: str,
     code: str,
+    owner: str = "anonymous",
+    fail_fast: bool = False,
+    quota=None,
 ):
-    problem = load_problem(db, problem_id)
-    all_cases = sorted(problem.test_cases, key=lambda t: t.order)
-    if not all_cases:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No test cases available")
+    # Sync SQLAlchemy calls run off the event loop so a slow query stalls only this request.
+    normalized_language, cases, backend, limits = await asyncio.to_thread(_prepare_run, db, problem_id, language, owner)
+    if quota is not None:
+        await quota.admit(len(cases))
+    results = await judge_cases(
+        problem_id,
+        normalized_language,
+        code,
+        cases,
+        owner=owner,
+        fail_fast=fail_fast,
+        limits=limits,
+        lane="run",
+        backend=backend,
+        quota=quota,
+    )
+    return _run_response(normalized_language, results)
+
 
+def prepare_submit(db: Session, problem_id: int, language: str):
+    bundle = load_case_bundle(db, problem_id)
+    if not bundle.cases:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No test cases available")
     normalized_language = normalize_language(language)
-    results = execute_test_cases(
-        language=normalized_language,
-        source_code=code,
-        test_cases=[
-            {
-                "id": tc.id,
-                "input_text": tc.input_text,
-                "output_text": tc.output_text,
-                "is_sample": tc.is_sample,
-            }
-            for tc in all_cases
-        ],
-    )
+    return normalized_language, bundle.cases, bundle.limits(normalized_language)
 
+
+def submit_response(normalized_language: str, results, fail_fast: bool):
     summary = summarize_results(results)
     hidden_total = len([r for r in results if not r.get("is_sample")])
     hidden_passed = len([r for r in results if not r.get("is_sample") and r.get("passed")])
+    response = {
+        "verdict": summary["verdict"],
+        "passed": summary["passed"],
+        "total": summary["total"],
+        "cases": serialize_cases(results, include_io=True, only_sample=True),
+        "hidden": {"passed": hidden_passed, "total": hidden_total},
+        "failed_case": first_failed_case(results),
+        **summarize_usage(results),
+    }
+    if fail_fast:
+        response["hidden"]["skipped"] = len([r for r in results if not r.get("is_sample") and r.get("skipped")])
+    if normalized_language == "algo":
+        response["algo_outputs"] = _algo_outputs(results)
+    return response
+
 
+def _record_submit(
+    db: Session,
+    user_id: int,
+    problem_id: int,
+    normalized_language: str,
+    code: str,
+    results,
+    fail_fast: bool,
+):
+    response = submit_response(normalized_language, results, fail_fast)
     submission = Submission(
         user_id=user_id,
         problem_id=problem_id,
         language=normalized_language,
         code=code,
-        verdict=summary["verdict"],
-        passed=summary["passed"],
-        total=summary["total"],
+        verdict=response["verdict"],
+        passed=response["passed"],
+        total=response["total"],
+        runtime_ms=response["runtime_ms"],
+        memory_kb=response["memory_kb"],
         is_submit=True,
-        status=summary["verdict"],
+        status=response["verdict"],
     )
     db.add(submission)
     db.commit()
+    return response
 
-    response = {
-        "verdict": summary["verdict"],
-        "passed": summary["passed"],
-        "total": summary["total"],
-        "cases": serialize_cases(results, include_io=True, only_sample=True),
-        "hidden": {"passed": hidden_passed, "total": hidden_total},
+
+async def submit_problem_solution(
+    db: Session,
+    user_id: int,
+    problem_id: int,
+    language: str,
+    code: str,
+    fail_fast: bool = False,
+    quota=None,
+):
+    normalized_language, cases, limits = await asyncio.to_thread(prepare_submit, db, problem_id, language)
+    if quota is not None:
+        await quota.admit(len(cases))
+    results = await judge_cases(
+        problem_id,
+        normalized_language,
+        code,
+        cases,
+        owner=f"user:{user_id}",
+        fail_fast=fail_fast,
+        limits=limits,
+        lane="submit",
+        quota=quota,
+    )
+    return await asyncio.to_thread(
+        _record_submit, db, user_id, problem_id, normalized_language, code, results, fail_fast
+    )
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _case_event(index: int, result, completed: int, total: int):
+    serialized = serialize_cases([result], include_io=True, only_sample=True)
+    return {
+        "index": index,
+        "completed": completed,
+        "total": total,
+        "is_sample": result.get("is_sample", True),
+        "passed": result.get("passed"),
+        "skipped": result.get("skipped", False),
+        "case": serialized[0] if serialized else None,
     }
-    if normalized_language == "algo":
-        response["algo_outputs"] = [
-            {"id": r.get("id"), "stdout": r.get("stdout"), "stderr": r.get("stderr")}
-            for r in results
-            if r.get("is_sample", True)
-        ]
-    return response
+
+
+def _error_event(exc: Exception):
+    if isinstance(exc, HTTPException):
+        return {"status_code": exc.status_code, "detail": exc.detail}
+    if isinstance(exc, SandboxUnavailable):
+        return {"status_code": 503, "detail": str(exc), "retry_after": max(1, math.ceil(exc.retry_after))}
+    if isinstance(exc, ExecutionQueueFull):
+        return {"status_code": 503, "detail": "Execution queue is full, try again shortly", "retry_after": 1}
+    return {"status_code": 502, "detail": "Execution service unavailable"}
+
+
+async def _stream_judgement(cases, judge, finish) -> AsyncIterator[str]:
+    # Emits one ``case`` event per test case as its result becomes final, then
+    # a ``summary`` event shaped like SubmissionSummary (or an ``error`` event).
+    events: asyncio.Queue = asyncio.Queue()
+    task = asyncio.ensure_future(judge(lambda index, result: events.put_nowait((index, result))))
+    task.add_done_callback(lambda _: events.put_nowait(None))
+    reported = set()
+    try:
+        while True:
+            item = await events.get()
+            if item is None:
+                break
+            index, result = item
+            reported.add(index)
+            yield sse_event("case", _case_event(index, result, len(reported), len(cases)))
+
+        try:
+            results = task.result()
+            # ``finish`` may write to the database.
+            summary = await asyncio.to_thread(finish, results)
+        except Exception as exc:
+            logger.warning("Streamed judgement failed: %s", exc)
+            yield sse_event("error", _error_event(exc))
+            return
+        # Cached verdicts and skipped cases never went through the callback.
+        for index, result in enumerate(results):
+            if index not in reported:
+                reported.add(index)
+                yield sse_event("case", _case_event(index, result, len(reported), len(cases)))
+        yield sse_event("summary", SubmissionSummary(**summary).model_dump(mode="json"))
+    finally:
+        if not task.done():
+            # The client went away; stop judging for it.
+            task.cancel()
+
+
+async def stream_run_problem_submission(
+    db: Session,
+    problem_id: int,
+    language: str,
+    code: str,
+    owner: str = "anonymous",
+    fail_fast: bool = False,
+    quota=None,
+) -> AsyncIterator[str]:
+    normalized_language, cases, backend, limits = await asyncio.to_thread(_prepare_run, db, problem_id, language, owner)
+    if quota is not None:
+        await quota.admit(len(cases))
+
+    def judge(on_case):
+        return judge_cases(
+            problem_id,
+            normalized_language,
+            code,
+            cases,
+            owner=owner,
+            fail_fast=fail_fast,
+            limits=limits,
+            lane="run",
+            backend=backend,
+            on_case=on_case,
+            quota=quota,
+        )
+
+    return _stream_judgement(cases, judge, lambda results: _run_response(normalized_language, results))
+
+
+async def stream_submit_problem_solution(
+    db: Session,
+    user_id: int,
+    problem_id: int,
+    language: str,
+    code: str,
+    fail_fast: bool = False,
+    quota=None,
+) -> AsyncIterator[str]:
+    normalized_language, cases, limits = await asyncio.to_thread(prepare_submit, db, problem_id, language)
+    if quota is not None:
+        await quota.admit(len(cases))
+
+    def judge(on_case):
+        return judge_cases(
+            problem_id,
+            normalized_language,
+            code,
+            cases,
+            owner=f"user:{user_id}",
+            fail_fast=fail_fast,
+            limits=limits,
+            lane="submit",
+            on_case=on_case,
+            quota=quota,
+        )
+
+    def finish(results):
+        # The request's session is closed once the response starts streaming.
+        session = session_factory()
+        try:
+            return _record_submit(session, user_id, problem_id, normalized_language, code, results, fail_fast)
+        finally:
+            session.close()
+
+    return _stream_judgement(cases, judge, finish)
 
 
 def list_user_problem_submissions(db: Session, user_id: int, problem_id: int):
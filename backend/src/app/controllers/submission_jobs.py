@@ -0,0 +1,213 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Dict, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.controllers.submission import judge_cases, prepare_submit, sse_event, submit_response
+from app.models import Submission
+from app.services.concurrency_limiter import execution_leases
+from app.services.execution_quota import ExecutionQuota
+from app.services.job_queue import JobWorker, PermanentJobError, build_job_queue
+from config import settings
+from database import SessionLocal
+
+QUEUED = "queued"
+RUNNING = "running"
+FAILED = "failed"
+_PENDING = (QUEUED, RUNNING)
+
+submission_queue = build_job_queue()
+# Workers open their own sessions; tests point this at the test database.
+session_factory = SessionLocal
+
+
+def job_status(submission: Submission) -> Dict:
+    stored = json.loads(submission.result_json) if submission.result_json else None
+    failed = submission.status == FAILED
+    return {
+        "submission_id": submission.id,
+        "status": submission.status,
+        "done": submission.status not in _PENDING,
+        "verdict": submission.verdict,
+        "passed": submission.passed,
+        "total": submission.total,
+        "result": stored if stored is not None and not failed else None,
+        "detail": (stored or {}).get("detail") if failed else None,
+    }
+
+
+def _check_pending(db: Session, user_id: int) -> None:
+    pending = (
+        db.query(Submission)
+        .filter(Submission.user_id == user_id, Submission.status.in_(_PENDING))
+        .count()
+    )
+    if pending >= settings.EXECUTION_CONCURRENCY_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many executions in progress",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _save(db: Session, submission: Submission) -> Submission:
+    db.add(submission)
+    db.commit()
+    db.refresh(submission)
+    return submission
+
+
+async def enqueue_submission(
+    db: Session,
+    user_id: int,
+    problem_id: int,
+    language: str,
+    code: str,
+    fail_fast: bool = False,
+    quota: Optional[ExecutionQuota] = None,
+) -> Dict:
+    # Sync SQLAlchemy calls run off the event loop so a slow query stalls only this request.
+    normalized_language, cases, _ = await asyncio.to_thread(prepare_submit, db, problem_id, language)
+    if execution_leases.enabled:
+        await asyncio.to_thread(_check_pending, db, user_id)
+    if quota is not None:
+        await quota.admit(len(cases))
+    submission = Submission(
+        user_id=user_id,
+        problem_id=problem_id,
+        language=normalized_language,
+        code=code,
+        is_submit=True,
+        status=QUEUED,
+    )
+    await asyncio.to_thread(_save, db, submission)
+
+    try:
+        job = {"submission_id": submission.id, "fail_fast": fail_fast}
+        if quota is not None and quota.ip:
+            job["ip"] = quota.ip
+        await submission_queue.enqueue(job)
+    except Exception as exc:
+        submission.status = FAILED
+        submission.result_json = json.dumps({"detail": "Submission queue unavailable"})
+        await asyncio.to_thread(db.commit)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Submission queue unavailable, try again shortly",
+            headers={"Retry-After": "1"},
+        ) from exc
+    return job_status(submission)
+
+
+def load_submission_job(db: Session, user_id: int, submission_id: int) -> Submission:
+    submission = db.get(Submission, submission_id)
+    if not submission or submission.user_id != user_id or not submission.is_submit:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Submission not found")
+    return submission
+
+
+def _poll_job(db: Session, submission_id: int) -> Optional[Dict]:
+    db.expire_all()
+    submission = db.get(Submission, submission_id)
+    return job_status(submission) if submission is not None else None
+
+
+async def stream_submission_job(submission_id: int) -> AsyncIterator[str]:
+    # Polls the row so the wait works whichever process does the judging. The
+    # request's session is closed once streaming starts, so this uses its own.
+    deadline = time.monotonic() + settings.SUBMISSION_JOB_WAIT_SECONDS
+    last = None
+    db = session_factory()
+    try:
+        while True:
+            current = await asyncio.to_thread(_poll_job, db, submission_id)
+            if current is None:
+                return
+            if current != last:
+                yield sse_event("status", current)
+                last = current
+            if current["done"] or time.monotonic() >= deadline:
+                return
+            await asyncio.sleep(settings.SUBMISSION_JOB_POLL_SECONDS)
+    finally:
+        db.close()
+
+
+def _start_job(db: Session, submission_id: int) -> Optional[Submission]:
+    submission = db.get(Submission, submission_id)
+    if submission is None or submission.status not in _PENDING:
+        # Deleted, or judged already by an earlier delivery of this job.
+        return None
+    submission.status = RUNNING
+    db.commit()
+    return submission
+
+
+async def process_submission_job(job: Dict) -> None:
+    db = session_factory()
+    try:
+        submission = await asyncio.to_thread(_start_job, db, job["submission_id"])
+        if submission is None:
+            return
+
+        try:
+            normalized_language, cases, limits = await asyncio.to_thread(
+                prepare_submit, db, submission.problem_id, submission.language
+            )
+        except HTTPException as exc:
+            raise PermanentJobError(exc.detail) from exc
+        fail_fast = bool(job.get("fail_fast"))
+        try:
+            results = await judge_cases(
+                submission.problem_id,
+                normalized_language,
+                submission.code,
+                cases,
+                owner=f"user:{submission.user_id}",
+                fail_fast=fail_fast,
+                limits=limits,
+                lane="submit",
+                quota=ExecutionQuota(
+                    f"user:{submission.user_id}", user_id=submission.user_id, ip=job.get("ip")
+                ),
+            )
+        except Exception:
+            submission.status = QUEUED
+            await asyncio.to_thread(db.commit)
+            raise
+
+        response = submit_response(normalized_language, results, fail_fast)
+        submission.verdict = response["verdict"]
+        submission.passed = response["passed"]
+        submission.total = response["total"]
+        submission.runtime_ms = response["runtime_ms"]
+        submission.memory_kb = response["memory_kb"]
+        submission.status = response["verdict"]
+        submission.result_json = json.dumps(response)
+        await asyncio.to_thread(db.commit)
+    finally:
+        db.close()
+
+
+def _mark_failed(submission_id: int, detail: str) -> None:
+    db = session_factory()
+    try:
+        submission = db.get(Submission, submission_id)
+        if submission is None:
+            return
+        submission.status = FAILED
+        submission.result_json = json.dumps({"detail": detail})
+        db.commit()
+    finally:
+        db.close()
+
+
+async def mark_submission_failed(job: Dict, exc: Exception) -> None:
+    detail = str(exc) if isinstance(exc, PermanentJobError) else "Execution service unavailable"
+    await asyncio.to_thread(_mark_failed, job["submission_id"], detail)
+
+
+submission_worker = JobWorker(submission_queue, process_submission_job, mark_submission_failed)
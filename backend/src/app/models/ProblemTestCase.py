@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey
 from sqlalchemy.orm import relationship
 from . import Base
 
@@ -10,6 +10,11 @@ class ProblemTestCase(Base):
     problem_id = Column(ForeignKey("problems.id"), nullable=False)
     input_text = Column(Text, nullable=False)
     output_text = Column(Text, nullable=False)
+    # Large data lives in the case blob store; the text columns then hold a preview.
+    input_hash = Column(String(64), nullable=True)
+    input_size = Column(Integer, nullable=True)
+    output_hash = Column(String(64), nullable=True)
+    output_size = Column(Integer, nullable=True)
     is_sample = Column(Boolean, default=True, nullable=False)
     order = Column(Integer, default=0, nullable=False)
 
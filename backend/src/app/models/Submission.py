@@ -20,6 +20,7 @@ class Submission(Base):
     total = Column(Integer, nullable=True)
     runtime_ms = Column(Integer, nullable=True)
     memory_kb = Column(Integer, nullable=True)
+    result_json = Column(Text, nullable=True)
     is_submit = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
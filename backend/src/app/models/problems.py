@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from . import Base
@@ -10,6 +10,13 @@ class Problem(Base):
     external_link = Column(String, nullable=True)
     description = Column(Text, nullable=True)
     constraints = Column(Text, nullable=True)
+    checker = Column(String, nullable=False, default="whitespace", server_default="whitespace")
+    checker_tolerance = Column(Float, nullable=True)
+    # Per-case limits before language multipliers; NULL uses the judge default.
+    time_limit_ms = Column(Integer, nullable=True)
+    memory_limit_mb = Column(Integer, nullable=True)
+    # Bumped whenever anything the judge reads changes; keys cached case bundles.
+    test_version = Column(Integer, nullable=False, default=1, server_default="1")
 
     problem_tags = relationship("ProblemTag", back_populates="problem", cascade="all, delete-orphan")
     tags = relationship("Tag", secondary="problem_tags", viewonly=True)
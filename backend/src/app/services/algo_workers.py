@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_REPLY_PREFIX = b"@@CMJOB "
+
+
+class AlgoWorkerError(RuntimeError):
+    pass
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+class AlgoWorker:
+    """One long-lived compiler JVM speaking the AlgoWorker.java pipe protocol."""
+
+    def __init__(self, process: asyncio.subprocess.Process) -> None:
+        self.process = process
+        self.jobs = 0
+        self.heap_bytes = 0
+        self.retiring = False
+
+    @classmethod
+    async def spawn(cls, command: List[str]) -> "AlgoWorker":
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+        except FileNotFoundError as exc:
+            raise AlgoWorkerError(f"Java runtime not found: {command[0]}") from exc
+        return cls(process)
+
+    async def run(self, source_path: str, stdin: bytes) -> Dict:
+        self.process.stdin.write(f"{source_path}\n{len(stdin)}\n".encode("utf-8") + stdin)
+        await self.process.stdin.drain()
+
+        header = await self.process.stdout.readline()
+        if not header.startswith(_REPLY_PREFIX):
+            raise AlgoWorkerError("Algo worker exited or sent a malformed reply")
+        try:
+            code, out_len, err_len, heap, retire = (int(v) for v in header[len(_REPLY_PREFIX):].split())
+        except ValueError as exc:
+            raise AlgoWorkerError(f"Malformed Algo worker reply: {header!r}") from exc
+        stdout = await self.process.stdout.readexactly(out_len)
+        stderr = await self.process.stdout.readexactly(err_len)
+
+        self.jobs += 1
+        self.heap_bytes = heap
+        self.retiring = retire == 1
+        return {
+            "run": {
+                "stdout": _decode(stdout),
+                "stderr": _decode(stderr),
+                "code": code,
+                "signal": None,
+            }
+        }
+
+    def worn_out(self) -> bool:
+        return (
+            self.retiring
+            or self.jobs >= settings.ALGO_WORKER_MAX_JOBS
+            or self.heap_bytes >= settings.ALGO_WORKER_MAX_HEAP_MB * 1024 * 1024
+        )
+
+    async def stop(self) -> None:
+        if self.process.returncode is None:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+        await self.process.wait()
+
+
+class AlgoWorkerPool:
+    """Bounded pool of warm Algo compiler JVMs.
+
+    Started and closed by the application lifespan. Each JVM is capped at
+    ``ALGO_WORKER_JVM_HEAP_MB`` and recycled after ``ALGO_WORKER_MAX_JOBS`` jobs,
+    once its heap passes ``ALGO_WORKER_MAX_HEAP_MB``, or when a job left threads
+    running; a worker that times out is killed and replaced.
+    """
+
+    def __init__(self, command: Optional[List[str]] = None, size: Optional[int] = None) -> None:
+        self._command = command
+        self._size = size
+        self._idle: List[AlgoWorker] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def size(self) -> int:
+        return max(0, self._size if self._size is not None else settings.ALGO_WORKER_POOL_SIZE)
+
+    def command(self) -> List[str]:
+        if self._command is not None:
+            return list(self._command)
+        return [
+            settings.JAVA_BIN,
+            "-Djava.security.manager=allow",
+            f"-Xmx{settings.ALGO_WORKER_JVM_HEAP_MB}m",
+            "-XX:+UseSerialGC",
+            "-cp",
+            settings.ALGO_WORKER_CLASSPATH,
+            "AlgoWorker",
+            settings.ALGO_COMPILER_JAR,
+            str(settings.LOCAL_SANDBOX_OUTPUT_LIMIT_BYTES),
+        ]
+
+    def _installed(self) -> bool:
+        if self._command is not None:
+            return True
+        return (
+            Path(settings.ALGO_WORKER_CLASSPATH, "AlgoWorker.class").exists()
+            and Path(settings.ALGO_COMPILER_JAR).exists()
+        )
+
+    @property
+    def running(self) -> bool:
+        try:
+            return self._loop is asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+    async def start(self) -> None:
+        if self._loop is not None or self.size == 0 or not self._installed():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.size)
+        for _ in range(self.size):
+            try:
+                self._idle.append(await AlgoWorker.spawn(self.command()))
+            except Exception as exc:
+                logger.warning("Algo worker prewarm failed: %s", exc)
+                break
+
+    async def close(self) -> None:
+        self._loop = None
+        idle, self._idle = self._idle, []
+        for worker in idle:
+            await worker.stop()
+
+    async def run(self, source_path: str, stdin: bytes, timeout: float) -> Dict:
+        async with self._slots:
+            worker = self._idle.pop() if self._idle else await AlgoWorker.spawn(self.command())
+            try:
+                result = await asyncio.wait_for(worker.run(source_path, stdin), timeout=timeout)
+            except asyncio.TimeoutError:
+                await worker.stop()
+                return {
+                    "run": {
+                        "stdout": "",
+                        "stderr": "\nExecution timed out",
+                        "code": 124,
+                        "signal": "timeout",
+                    }
+                }
+            except BaseException:
+                await worker.stop()
+                raise
+
+            if worker.worn_out() or not self.running:
+                await worker.stop()
+            else:
+                self._idle.append(worker)
+            return result
+
+
+algo_worker_pool = AlgoWorkerPool()
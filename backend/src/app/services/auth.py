@@ -1,9 +1,12 @@
 import hashlib
 import secrets
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Optional
 
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Request, status
 from jose import JWTError, ExpiredSignatureError, jwt
 from passlib.context import CryptContext
 
@@ -73,6 +76,101 @@ def decode_access_token(token: str) -> dict[str, Any]:
     return payload
 
 
+class VerifiedToken:
+    __slots__ = ("payload", "expires_at", "principal")
+
+    def __init__(self, payload: dict[str, Any], expires_at: float) -> None:
+        self.payload = payload
+        self.expires_at = expires_at
+        # Filled in once by whoever builds the principal from ``payload``.
+        self.principal = None
+
+
+class VerifiedTokenCache:
+    """Process-wide LRU of access tokens that already passed verification.
+
+    Entries are keyed by a digest of the signing key and the token, so the
+    raw token is never kept and rotating ``SECRET_KEY`` orphans every entry.
+    An entry is dropped once its ``exp`` passes and the token is decoded
+    again, which raises the usual "Token has expired". Rejected tokens are
+    never cached, so garbage cannot push out valid entries.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None) -> None:
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, VerifiedToken]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(f"{settings.SECRET_KEY}\x00{token}".encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> VerifiedToken | None:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, token: str, payload: dict[str, Any]) -> VerifiedToken:
+        entry = VerifiedToken(payload, float(payload.get("exp") or 0))
+        max_entries = self._max_entries or settings.TOKEN_CACHE_MAX_ENTRIES
+        if not settings.TOKEN_CACHE_ENABLED or max_entries <= 0 or entry.expires_at <= time.time():
+            return entry
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+verified_tokens = VerifiedTokenCache()
+
+
+def verify_access_token(token: str, request: Request | None = None) -> VerifiedToken:
+    """Decode ``token`` at most once per request and once per worker.
+
+    The outcome, including a rejection, is memoized on ``request.state`` so
+    the rate limiter and ``get_current_user`` share one verification.
+    """
+    memo = None
+    if request is not None:
+        memo = getattr(request.state, "verified_tokens", None)
+        if memo is None:
+            memo = request.state.verified_tokens = {}
+        outcome = memo.get(token)
+        if isinstance(outcome, HTTPException):
+            raise outcome
+        if outcome is not None:
+            return outcome
+
+    entry = verified_tokens.get(token)
+    if entry is None:
+        try:
+            entry = verified_tokens.put(token, decode_access_token(token))
+        except HTTPException as exc:
+            if memo is not None:
+                memo[token] = exc
+            raise
+    if memo is not None:
+        memo[token] = entry
+    return entry
+
+
 def create_state_token(*, provider: str) -> str:
     now = utcnow()
     expire_at = now + timedelta(minutes=10)
@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.services.object_storage import download_object_file, object_exists, r2_is_configured, upload_object_file
+from config import settings
+
+
+class CaseBlobStore:
+    """Content-addressed, gzip-compressed storage for large test case data.
+
+    A blob lives at ``<root>/<sha[:2]>/<sha>.gz`` keyed by the SHA-256 of
+    the uncompressed bytes, so identical inputs or outputs are stored once.
+    With ``CASE_BLOB_R2_ENABLED`` blobs are also uploaded to the R2 bucket
+    and fetched back into the local directory on a miss, which then acts as
+    a cache for every judge process sharing it.
+    """
+
+    def __init__(self, root: Optional[str] = None) -> None:
+        self._root = root
+
+    @property
+    def root(self) -> Path:
+        return Path(self._root or settings.CASE_BLOB_DIR)
+
+    @property
+    def remote(self) -> bool:
+        return settings.CASE_BLOB_R2_ENABLED and r2_is_configured()
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.gz"
+
+    def _key(self, digest: str) -> str:
+        return f"{settings.CASE_BLOB_R2_PREFIX}{digest}.gz"
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as fh:
+                    fh.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        if self.remote:
+            self._upload(digest, path)
+        return digest
+
+    def _upload(self, digest: str, path: Path) -> None:
+        if not object_exists(self._key(digest)):
+            upload_object_file(object_key=self._key(digest), path=str(path))
+
+    def _fetch(self, digest: str) -> Path:
+        path = self.path(digest)
+        if path.exists():
+            return path
+        if not self.remote:
+            raise FileNotFoundError(f"Test data blob {digest} is missing")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            download_object_file(object_key=self._key(digest), path=tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return path
+
+    def open(self, digest: str):
+        """Binary file object streaming the decompressed blob."""
+        return gzip.open(self._fetch(digest), "rb")
+
+    def read_text(self, digest: str) -> str:
+        with self.open(digest) as fh:
+            return fh.read().decode("utf-8")
+
+
+case_blob_store = CaseBlobStore()
+
+
+def store_case_text(text: str) -> Tuple[str, Optional[str], int]:
+    """Return ``(column text, blob digest, size)`` for one input or output.
+
+    Text up to ``CASE_BLOB_INLINE_MAX_BYTES`` stays inline with no digest;
+    anything larger goes to the blob store and the column keeps a preview.
+    """
+    data = (text or "").encode("utf-8")
+    if len(data) <= settings.CASE_BLOB_INLINE_MAX_BYTES:
+        return text or "", None, len(data)
+    digest = case_blob_store.put(data)
+    return case_preview(text), digest, len(data)
+
+
+def case_preview(text: str) -> str:
+    return (text or "")[: settings.CASE_BLOB_PREVIEW_CHARS]
+
+
+def load_case_text(case: Dict, field: str) -> str:
+    """Full ``input_text``/``output_text`` of a judge case, from its blob if it has one."""
+    digest = case.get(f"{field}_blob")
+    if not digest:
+        return case.get(f"{field}_text") or ""
+    return case_blob_store.read_text(digest)
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import cached_property
+from typing import Dict, Optional
+
+from redis.asyncio.client import Redis
+from sqlalchemy.orm import Session
+
+from app.models import Problem
+from app.services.execution_backends import RunLimits, run_limits
+from app.services.verdict_cache import fingerprint_test_cases
+from config import settings
+from redis_db import redis_pool
+
+logger = logging.getLogger(__name__)
+
+
+class JudgeCase:
+    """One test case as the judge sees it; reads like the dicts it replaces."""
+
+    __slots__ = (
+        "id",
+        "input_text",
+        "output_text",
+        "input_blob",
+        "output_blob",
+        "is_sample",
+        "checker",
+        "checker_tolerance",
+    )
+
+    def __init__(self, problem: Problem, tc) -> None:
+        self.id = tc.id
+        self.input_text = tc.input_text
+        self.output_text = tc.output_text
+        self.input_blob = tc.input_hash
+        self.output_blob = tc.output_hash
+        self.is_sample = tc.is_sample
+        self.checker = problem.checker
+        self.checker_tolerance = problem.checker_tolerance
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+
+class CaseSet(tuple):
+    """Ordered judge cases whose verdict-cache fingerprint is hashed once."""
+
+    @cached_property
+    def fingerprint(self) -> str:
+        return fingerprint_test_cases(self)
+
+
+class CaseBundle:
+    __slots__ = ("problem_id", "version", "cases", "samples", "time_limit_ms", "memory_limit_mb", "loaded_at")
+
+    def __init__(self, problem: Problem) -> None:
+        ordered = sorted(problem.test_cases, key=lambda t: t.order)
+        self.problem_id = problem.id
+        self.version = problem.test_version or 1
+        self.cases = CaseSet(JudgeCase(problem, tc) for tc in ordered)
+        self.samples = CaseSet(case for case in self.cases if case.is_sample)
+        self.time_limit_ms = problem.time_limit_ms
+        self.memory_limit_mb = problem.memory_limit_mb
+        self.loaded_at = time.monotonic()
+
+    def limits(self, language: str) -> RunLimits:
+        return run_limits(language, self.time_limit_ms, self.memory_limit_mb)
+
+
+class CaseBundleCache:
+    """Per-process cache of each problem's judge cases, keyed by test version.
+
+    ``create_problem``/``update_problem`` bump ``Problem.test_version`` and
+    call ``invalidate``, which drops the local bundle and publishes the new
+    version on ``CASE_BUNDLE_REDIS_CHANNEL`` so every other process drops
+    theirs too. A bundle read from the database with an older version than
+    the last invalidation seen is not cached, and bundles expire after
+    ``CASE_BUNDLE_CACHE_TTL_SECONDS`` in case a message was missed.
+    """
+
+    def __init__(self) -> None:
+        self._bundles: "OrderedDict[int, CaseBundle]" = OrderedDict()
+        self._floors: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, problem_id: int) -> Optional[CaseBundle]:
+        if settings.CASE_BUNDLE_CACHE_ENABLED:
+            with self._lock:
+                bundle = self._bundles.get(problem_id)
+                if bundle is not None:
+                    if time.monotonic() - bundle.loaded_at < settings.CASE_BUNDLE_CACHE_TTL_SECONDS:
+                        self._bundles.move_to_end(problem_id)
+                        self.hits += 1
+                        return bundle
+                    del self._bundles[problem_id]
+                self.misses += 1
+
+        problem = db.get(Problem, problem_id)
+        if problem is None:
+            return None
+        bundle = CaseBundle(problem)
+        if settings.CASE_BUNDLE_CACHE_ENABLED:
+            self._store(bundle)
+        return bundle
+
+    def _store(self, bundle: CaseBundle) -> None:
+        with self._lock:
+            if bundle.version < self._floors.get(bundle.problem_id, 0):
+                return
+            self._bundles[bundle.problem_id] = bundle
+            self._bundles.move_to_end(bundle.problem_id)
+            while len(self._bundles) > max(1, settings.CASE_BUNDLE_CACHE_MAX_PROBLEMS):
+                self._bundles.popitem(last=False)
+
+    def _drop(self, problem_id: int, version: int) -> None:
+        with self._lock:
+            self._floors[problem_id] = max(version, self._floors.get(problem_id, 0))
+            self._bundles.pop(problem_id, None)
+
+    def invalidate(self, problem_id: int, version: int) -> None:
+        self._drop(problem_id, version)
+        if self._loop is None or not settings.CASE_BUNDLE_REDIS_ENABLED:
+            return
+        # Called from sync endpoints on a worker thread, so hop onto the loop.
+        try:
+            asyncio.run_coroutine_threadsafe(self._publish(problem_id, version), self._loop)
+        except RuntimeError:
+            pass
+
+    async def _publish(self, problem_id: int, version: int) -> None:
+        try:
+            await Redis(connection_pool=redis_pool).publish(
+                settings.CASE_BUNDLE_REDIS_CHANNEL,
+                json.dumps({"problem_id": problem_id, "version": version}),
+            )
+        except Exception as exc:
+            logger.warning("Could not publish test bundle invalidation: %s", exc)
+
+    def _on_message(self, raw) -> None:
+        try:
+            payload = json.loads(raw)
+            self._drop(int(payload["problem_id"]), int(payload["version"]))
+        except (TypeError, ValueError, KeyError):
+            logger.warning("Ignoring malformed test bundle invalidation: %r", raw)
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if settings.CASE_BUNDLE_REDIS_ENABLED and self._listener is None:
+            self._listener = asyncio.ensure_future(self._listen())
+
+    async def close(self) -> None:
+        listener, self._listener = self._listener, None
+        self._loop = None
+        if listener is not None:
+            listener.cancel()
+            try:
+                await listener
+            except asyncio.CancelledError:
+                pass
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = Redis(connection_pool=redis_pool).pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.CASE_BUNDLE_REDIS_CHANNEL)
+                # Anything published while we were not subscribed was missed.
+                with self._lock:
+                    self._bundles.clear()
+                async for message in pubsub.listen():
+                    self._on_message(message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Test bundle invalidation channel unavailable: %s", exc)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(5.0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._bundles.clear()
+            self._floors.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"problems": len(self._bundles), "hits": self.hits, "misses": self.misses}
+
+
+case_bundle_cache = CaseBundleCache()
@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+
+from redis.asyncio.client import Redis
+from redis.exceptions import NoScriptError
+
+from config import settings
+from redis_db import redis_pool
+
+logger = logging.getLogger(__name__)
+
+# Leases live in a sorted set per identity scored by expiry (ms), so a lease
+# whose worker died stops counting once its TTL passes.
+_ACQUIRE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[3])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+_RENEW_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+if not redis.call('ZSCORE', KEYS[1], ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], 'XX', now + tonumber(ARGV[1]), ARGV[2])
+redis.call('PEXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+_SCRIPTS = {
+    script: hashlib.sha1(script.encode("utf-8")).hexdigest() for script in (_ACQUIRE_SCRIPT, _RENEW_SCRIPT)
+}
+
+
+class ConcurrencyLimitExceeded(RuntimeError):
+    pass
+
+
+class Lease:
+    __slots__ = ("key", "token", "remote", "renewer")
+
+    def __init__(self, key: str, token: str, remote: bool) -> None:
+        self.key = key
+        self.token = token
+        self.remote = remote
+        self.renewer: Optional[asyncio.Task] = None
+
+
+class ConcurrencyLimiter:
+    """Caps how many executions one identity (user or IP) has in flight.
+
+    With ``RATE_LIMIT_BACKEND=redis`` slots are leases in Redis shared by
+    every worker. A held lease is renewed every third of
+    ``EXECUTION_CONCURRENCY_LEASE_SECONDS``, so the slots of a crashed worker
+    free themselves once the TTL runs out. Otherwise, or while Redis is
+    unreachable, slots are counted per process. A caller over the limit
+    polls for up to ``EXECUTION_CONCURRENCY_MAX_WAIT_SECONDS`` before
+    ``ConcurrencyLimitExceeded`` is raised.
+    """
+
+    def __init__(self, redis: Optional[Redis] = None) -> None:
+        self._redis = redis
+        self._local: Dict[str, Set[str]] = {}
+        self._retry_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.RATE_LIMIT_ENABLED and settings.EXECUTION_CONCURRENCY_LIMIT > 0
+
+    @asynccontextmanager
+    async def hold(self, identity: str) -> AsyncIterator[None]:
+        lease = await self.acquire(identity)
+        try:
+            yield
+        finally:
+            await self.release(lease)
+
+    async def acquire(self, identity: str) -> Optional[Lease]:
+        if not self.enabled:
+            return None
+        key = f"{settings.RATE_LIMIT_REDIS_PREFIX}inflight:{identity}"
+        deadline = time.monotonic() + max(0.0, settings.EXECUTION_CONCURRENCY_MAX_WAIT_SECONDS)
+        delay = 0.05
+        while True:
+            lease = await self._try_acquire(key)
+            if lease is not None:
+                if lease.remote:
+                    lease.renewer = asyncio.ensure_future(self._renew(lease))
+                return lease
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ConcurrencyLimitExceeded("Too many executions in progress")
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.5)
+
+    async def release(self, lease: Optional[Lease]) -> None:
+        if lease is None:
+            return
+        if lease.renewer is not None:
+            lease.renewer.cancel()
+        if not lease.remote:
+            tokens = self._local.get(lease.key)
+            if tokens is not None:
+                tokens.discard(lease.token)
+                if not tokens:
+                    del self._local[lease.key]
+            return
+        try:
+            await asyncio.wait_for(
+                self._client().zrem(lease.key, lease.token), settings.RATE_LIMIT_REDIS_TIMEOUT_SECONDS
+            )
+        except Exception as exc:
+            # The lease expires on its own once renewal stops.
+            logger.warning("Could not release execution lease: %s", exc)
+
+    def in_flight(self, identity: str) -> int:
+        return len(self._local.get(f"{settings.RATE_LIMIT_REDIS_PREFIX}inflight:{identity}", ()))
+
+    def reset(self) -> None:
+        self._local.clear()
+        self._retry_at = 0.0
+
+    def _client(self) -> Redis:
+        return self._redis if self._redis is not None else Redis(connection_pool=redis_pool)
+
+    def _use_redis(self) -> bool:
+        return settings.RATE_LIMIT_BACKEND == "redis" and time.monotonic() >= self._retry_at
+
+    async def _try_acquire(self, key: str) -> Optional[Lease]:
+        token = uuid.uuid4().hex
+        if self._use_redis():
+            ttl_ms = max(1000, int(settings.EXECUTION_CONCURRENCY_LEASE_SECONDS * 1000))
+            try:
+                acquired = await self._script(
+                    _ACQUIRE_SCRIPT, key, settings.EXECUTION_CONCURRENCY_LIMIT, ttl_ms, token
+                )
+            except Exception as exc:
+                self._retry_at = time.monotonic() + settings.RATE_LIMIT_REDIS_RETRY_SECONDS
+                logger.warning("Execution lease Redis unavailable, counting per process: %s", exc)
+            else:
+                return Lease(key, token, remote=True) if int(acquired) else None
+
+        tokens = self._local.setdefault(key, set())
+        if len(tokens) >= settings.EXECUTION_CONCURRENCY_LIMIT:
+            return None
+        tokens.add(token)
+        return Lease(key, token, remote=False)
+
+    async def _script(self, script: str, key: str, *args):
+        client = self._client()
+        timeout = settings.RATE_LIMIT_REDIS_TIMEOUT_SECONDS
+        try:
+            return await asyncio.wait_for(client.evalsha(_SCRIPTS[script], 1, key, *args), timeout)
+        except NoScriptError:
+            return await asyncio.wait_for(client.eval(script, 1, key, *args), timeout)
+
+    async def _renew(self, lease: Lease) -> None:
+        ttl_seconds = max(1.0, float(settings.EXECUTION_CONCURRENCY_LEASE_SECONDS))
+        while True:
+            await asyncio.sleep(ttl_seconds / 3)
+            try:
+                if not int(await self._script(_RENEW_SCRIPT, lease.key, int(ttl_seconds * 1000), lease.token)):
+                    logger.warning("Execution lease %s expired before renewal", lease.key)
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Could not renew execution lease: %s", exc)
+
+
+execution_leases = ConcurrencyLimiter()
@@ -0,0 +1,88 @@
+import math
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from config import settings
+
+
+class RunLimits:
+    """Time and memory a single test case may use, after language scaling."""
+
+    __slots__ = ("time_ms", "memory_mb")
+
+    def __init__(self, time_ms: int, memory_mb: int) -> None:
+        self.time_ms = time_ms
+        self.memory_mb = memory_mb
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.memory_mb * 1024 * 1024
+
+    def __repr__(self) -> str:
+        return f"RunLimits(time_ms={self.time_ms}, memory_mb={self.memory_mb})"
+
+
+@lru_cache(maxsize=8)
+def _multipliers(spec: str) -> Dict[str, float]:
+    # "python=3,java=2" -> {"python": 3.0, "java": 2.0}
+    factors = {}
+    for item in spec.split(","):
+        name, _, factor = item.partition("=")
+        if name.strip() and factor.strip():
+            factors[name.strip().lower()] = float(factor)
+    return factors
+
+
+def run_limits(
+    language: str,
+    time_limit_ms: Optional[int] = None,
+    memory_limit_mb: Optional[int] = None,
+) -> RunLimits:
+    lang = (language or "").strip().lower()
+    time_factor = _multipliers(settings.JUDGE_TIME_MULTIPLIERS).get(lang, 1.0)
+    memory_factor = _multipliers(settings.JUDGE_MEMORY_MULTIPLIERS).get(lang, 1.0)
+    return RunLimits(
+        math.ceil((time_limit_ms or settings.JUDGE_DEFAULT_TIME_LIMIT_MS) * time_factor),
+        math.ceil((memory_limit_mb or settings.JUDGE_DEFAULT_MEMORY_LIMIT_MB) * memory_factor),
+    )
+
+
+class ExecutionBackend:
+    """Runs a submission against one stdin and returns a Piston-shaped result.
+
+    Results look like ``{"compile": stage | None, "run": stage}`` where a stage
+    carries ``stdout``, ``stderr``, ``output``, ``code`` and ``signal``, plus
+    ``wall_time`` and ``cpu_time`` (ms) and ``memory`` (bytes) when the
+    backend can measure them; a failed compile comes back without a ``run``
+    stage. ``limits``, when given, is enforced by the sandbox so a runaway
+    case is killed at the problem's limit. Backends that can judge many
+    inputs in one call set ``supports_batch`` and override ``execute_batch``.
+    """
+
+    name = "base"
+    supports_batch = False
+
+    def supports(self, language: str) -> bool:
+        raise NotImplementedError
+
+    async def runtime_version(self, language: str) -> str:
+        raise NotImplementedError
+
+    async def execute(
+        self,
+        language: str,
+        source_code: str,
+        stdin: str,
+        limits: Optional[RunLimits] = None,
+    ) -> Dict:
+        raise NotImplementedError
+
+    async def execute_batch(
+        self,
+        language: str,
+        source_code: str,
+        inputs: List[str],
+        stop_on_error: bool = False,
+        limits: Optional[RunLimits] = None,
+    ) -> List[Optional[Dict]]:
+        return [None] * len(inputs)
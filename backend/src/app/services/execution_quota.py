@@ -0,0 +1,91 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from app.services.rate_limiter import Charge, charge, client_ip, extract_identity, parse_limit
+from config import settings
+
+CASES_REMAINING_HEADER = "X-RateLimit-Cases-Remaining"
+CPU_REMAINING_HEADER = "X-Sandbox-CPU-Remaining"
+
+
+class ExecutionQuota:
+    """Cost-weighted execution budgets for one caller.
+
+    ``admit`` runs before judging. It refuses a caller whose rolling CPU
+    quota is already spent (``SANDBOX_CPU_QUOTA_USER`` per user and
+    ``SANDBOX_CPU_QUOTA_IP`` per client IP, in CPU-seconds), then charges the
+    number of test cases against ``RATE_LIMIT_SUBMISSION_CASES``.
+
+    ``settle`` runs once the sandbox has actually executed the job. It
+    charges the measured CPU-seconds even past the quota, so one heavy run
+    leaves its owner in debt until the window rolls forward. A run shared
+    through single flight is settled by every caller that received it, and
+    by its leader even if the leader disconnected before it finished.
+    Verdict-cache hits are not charged.
+    """
+
+    def __init__(self, identity: str, user_id=None, ip: Optional[str] = None) -> None:
+        self.identity = identity
+        self.user_id = user_id
+        self.ip = ip
+        self.remaining: Dict[str, str] = {}
+
+    @classmethod
+    def for_request(cls, request: Request, user_id=None) -> "ExecutionQuota":
+        return cls(extract_identity(request), user_id=user_id, ip=client_ip(request))
+
+    def _cpu_limits(self) -> List[Tuple[str, str]]:
+        limits = []
+        if self.user_id is not None and settings.SANDBOX_CPU_QUOTA_USER:
+            limits.append((f"sandbox:cpu:user:{self.user_id}", settings.SANDBOX_CPU_QUOTA_USER))
+        if self.ip and settings.SANDBOX_CPU_QUOTA_IP:
+            limits.append((f"sandbox:cpu:ip:{self.ip}", settings.SANDBOX_CPU_QUOTA_IP))
+        return limits
+
+    def _note_cpu(self, results: List[Charge]) -> None:
+        if results:
+            self.remaining[CPU_REMAINING_HEADER] = f"{min(r.remaining for r in results):.1f}"
+
+    def _rejected(self, detail: str, retry_after: float) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after))), **self.remaining},
+        )
+
+    async def admit(self, case_count: int) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        checks = []
+        for key, limit_value in self._cpu_limits():
+            amount, window_seconds = parse_limit(limit_value)
+            checks.append(await charge(key, amount, window_seconds, cost=0))
+        self._note_cpu(checks)
+        exhausted = [r for r in checks if not r.allowed]
+        if exhausted:
+            raise self._rejected("Sandbox CPU quota exceeded", max(r.retry_after for r in exhausted))
+
+        if settings.RATE_LIMIT_SUBMISSION_CASES:
+            amount, window_seconds = parse_limit(settings.RATE_LIMIT_SUBMISSION_CASES)
+            # A problem with more cases than the whole budget still fits an idle budget.
+            cost = min(max(1, case_count), amount)
+            result = await charge(f"submission:cases:{self.identity}", amount, window_seconds, cost=cost)
+            self.remaining[CASES_REMAINING_HEADER] = str(math.floor(result.remaining))
+            if not result.allowed:
+                raise self._rejected("Rate limit exceeded", result.retry_after)
+
+    async def settle(self, cpu_seconds: float) -> None:
+        if not settings.RATE_LIMIT_ENABLED or cpu_seconds <= 0:
+            return
+
+        charged = []
+        for key, limit_value in self._cpu_limits():
+            amount, window_seconds = parse_limit(limit_value)
+            charged.append(await charge(key, amount, window_seconds, cost=cpu_seconds, force=True))
+        self._note_cpu(charged)
+
+    def headers(self) -> Dict[str, str]:
+        return dict(self.remaining)
@@ -0,0 +1,308 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Deque, Dict, Mapping, Optional
+
+from app.services.sandbox_guard import adaptive_limit
+from config import settings
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram
+except ImportError:  # optional in local environments without network install
+    Counter = Gauge = Histogram = None
+
+
+class ExecutionQueueFull(RuntimeError):
+    pass
+
+
+LANES = ("interview", "submit", "run")
+DEFAULT_LANE = "run"
+
+
+if Gauge is not None:
+    _IN_FLIGHT_GAUGE = Gauge("codemaster_execution_in_flight", "Sandbox jobs currently executing", ["lane"])
+    _QUEUE_DEPTH_GAUGE = Gauge("codemaster_execution_queue_depth", "Sandbox jobs waiting for a slot", ["lane"])
+    _WAIT_HISTOGRAM = Histogram(
+        "codemaster_execution_queue_wait_seconds",
+        "Time a sandbox job waited for a slot",
+        ["lane"],
+        buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+    _HOLD_HISTOGRAM = Histogram(
+        "codemaster_execution_slot_seconds",
+        "Time a sandbox job held its slot",
+        ["lane"],
+        buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+    )
+    _REJECTED_COUNTER = Counter(
+        "codemaster_execution_rejected_total", "Sandbox jobs rejected by a full queue", ["lane"]
+    )
+else:
+    _IN_FLIGHT_GAUGE = _QUEUE_DEPTH_GAUGE = _WAIT_HISTOGRAM = _HOLD_HISTOGRAM = _REJECTED_COUNTER = None
+
+
+@lru_cache(maxsize=8)
+def _lane_values(spec: str) -> Dict[str, int]:
+    # "interview=6,submit=3" -> {"interview": 6, "submit": 3}
+    values = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() in LANES and value.strip():
+            values[name.strip()] = max(0, int(value))
+    return values
+
+
+class _Lane:
+    __slots__ = ("name", "waiters", "owners", "queued", "in_flight", "credit", "stats")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.waiters: Dict[str, Deque[asyncio.Future]] = {}
+        self.owners: Deque[str] = deque()
+        self.queued = 0
+        self.in_flight = 0
+        self.credit = 0
+        self.stats = {
+            "acquired": 0,
+            "rejected": 0,
+            "max_queue_depth": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "total_hold_seconds": 0.0,
+        }
+
+
+class ExecutionScheduler:
+    """Per-process gate in front of the sandbox.
+
+    At most ``max_in_flight`` jobs execute at once. Every job belongs to a
+    lane (``interview``, ``submit`` or ``run``); each lane has its own
+    bounded queue, and within a lane free slots are handed out round-robin
+    across owners (user or client IP) so a large submit cannot starve
+    everyone queued behind it.
+
+    Between lanes, slots go first to any lane still below its reserved
+    minimum and otherwise by smooth weighted round-robin, so a spike of
+    practice runs only delays graded work by its weight share. Reserved
+    slots are never lent out: a lane can only take a slot if that leaves
+    enough free for every other lane to reach its reservation, keeping at
+    least one slot shared.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        weights: Optional[Mapping[str, int]] = None,
+        reserved: Optional[Mapping[str, int]] = None,
+    ) -> None:
+        self._max_in_flight = max_in_flight
+        self._max_queue = max_queue
+        self._weights = weights
+        self._reserved = reserved
+        self._lanes = {name: _Lane(name) for name in LANES}
+        self._in_flight = 0
+        self._queued = 0
+
+    @property
+    def max_in_flight(self) -> int:
+        if self._max_in_flight:
+            return max(1, self._max_in_flight)
+        return adaptive_limit.limit
+
+    @property
+    def max_queue(self) -> int:
+        """Queue bound for each lane."""
+        return max(0, self._max_queue if self._max_queue is not None else settings.EXECUTION_MAX_QUEUE)
+
+    def weight(self, lane: str) -> int:
+        weights = self._weights if self._weights is not None else _lane_values(settings.EXECUTION_LANE_WEIGHTS)
+        return max(1, weights.get(lane, 1))
+
+    def reserved(self, lane: str) -> int:
+        reserved = self._reserved if self._reserved is not None else _lane_values(settings.EXECUTION_LANE_RESERVED)
+        return reserved.get(lane, 0)
+
+    def _lane(self, lane: str) -> _Lane:
+        try:
+            return self._lanes[lane]
+        except KeyError:
+            raise ValueError(f"Unknown execution lane: {lane}") from None
+
+    @asynccontextmanager
+    async def slot(self, owner: str, lane: str = DEFAULT_LANE) -> AsyncIterator[None]:
+        await self.acquire(owner, lane)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._record_hold(lane, time.monotonic() - started)
+            self.release(lane)
+
+    async def acquire(self, owner: str, lane: str = DEFAULT_LANE) -> None:
+        state = self._lane(lane)
+        if not state.queued and self._admits(state):
+            self._grant(state)
+            self._record_wait(state, 0.0)
+            self._publish()
+            return
+        if state.queued >= self.max_queue:
+            state.stats["rejected"] += 1
+            if _REJECTED_COUNTER is not None:
+                _REJECTED_COUNTER.labels(lane).inc()
+            raise ExecutionQueueFull("Execution queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue = state.waiters.get(owner)
+        if queue is None:
+            queue = state.waiters[owner] = deque()
+            state.owners.append(owner)
+        queue.append(waiter)
+        state.queued += 1
+        self._queued += 1
+        state.stats["max_queue_depth"] = max(state.stats["max_queue_depth"], state.queued)
+        # A slot may be free for this lane even though other lanes are waiting.
+        self._dispatch()
+        self._publish()
+
+        enqueued_at = time.monotonic()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted just before the cancellation landed.
+                self.release(lane)
+            else:
+                self._discard(state, owner, waiter)
+            raise
+        self._record_wait(state, time.monotonic() - enqueued_at)
+
+    def release(self, lane: str = DEFAULT_LANE) -> None:
+        state = self._lane(lane)
+        state.in_flight = max(0, state.in_flight - 1)
+        self._in_flight = max(0, self._in_flight - 1)
+        self._dispatch()
+        self._publish()
+
+    def _admits(self, state: _Lane) -> bool:
+        limit = self.max_in_flight
+        free = limit - self._in_flight
+        if free <= 0:
+            return False
+        held_back = sum(
+            max(0, self.reserved(other.name) - other.in_flight)
+            for other in self._lanes.values()
+            if other is not state
+        )
+        return free > min(held_back, limit - 1)
+
+    def _grant(self, state: _Lane) -> None:
+        state.in_flight += 1
+        self._in_flight += 1
+
+    def _next_lane(self) -> Optional[_Lane]:
+        ready = [state for state in self._lanes.values() if state.queued and self._admits(state)]
+        if not ready:
+            return None
+        starved = [state for state in ready if state.in_flight < self.reserved(state.name)]
+        if starved:
+            return starved[0]
+        # Smooth weighted round-robin (as in nginx upstreams).
+        total = 0
+        best = None
+        for state in ready:
+            weight = self.weight(state.name)
+            state.credit += weight
+            total += weight
+            if best is None or state.credit > best.credit:
+                best = state
+        best.credit -= total
+        return best
+
+    def _dispatch(self) -> None:
+        while True:
+            state = self._next_lane()
+            if state is None:
+                return
+            owner = state.owners.popleft()
+            queue = state.waiters[owner]
+            waiter = queue.popleft()
+            state.queued -= 1
+            self._queued -= 1
+            if queue:
+                state.owners.append(owner)
+            else:
+                del state.waiters[owner]
+            if waiter.done():
+                continue
+            self._grant(state)
+            waiter.set_result(None)
+
+    def _discard(self, state: _Lane, owner: str, waiter: asyncio.Future) -> None:
+        queue = state.waiters.get(owner)
+        if not queue or waiter not in queue:
+            return
+        queue.remove(waiter)
+        state.queued -= 1
+        self._queued -= 1
+        if not queue:
+            del state.waiters[owner]
+            state.owners.remove(owner)
+        self._publish()
+
+    def _record_wait(self, state: _Lane, seconds: float) -> None:
+        stats = state.stats
+        stats["acquired"] += 1
+        stats["total_wait_seconds"] += seconds
+        stats["max_wait_seconds"] = max(stats["max_wait_seconds"], seconds)
+        if _WAIT_HISTOGRAM is not None:
+            _WAIT_HISTOGRAM.labels(state.name).observe(seconds)
+
+    def _record_hold(self, lane: str, seconds: float) -> None:
+        self._lane(lane).stats["total_hold_seconds"] += seconds
+        if _HOLD_HISTOGRAM is not None:
+            _HOLD_HISTOGRAM.labels(lane).observe(seconds)
+
+    def _publish(self) -> None:
+        if _IN_FLIGHT_GAUGE is not None:
+            for state in self._lanes.values():
+                _IN_FLIGHT_GAUGE.labels(state.name).set(state.in_flight)
+                _QUEUE_DEPTH_GAUGE.labels(state.name).set(state.queued)
+
+    def snapshot(self) -> Dict:
+        lanes = {}
+        for state in self._lanes.values():
+            stats = state.stats
+            acquired = stats["acquired"]
+            lanes[state.name] = {
+                "in_flight": state.in_flight,
+                "queued": state.queued,
+                "weight": self.weight(state.name),
+                "reserved": self.reserved(state.name),
+                "max_queue_depth": stats["max_queue_depth"],
+                "acquired": acquired,
+                "rejected": stats["rejected"],
+                "avg_wait_seconds": (stats["total_wait_seconds"] / acquired) if acquired else 0.0,
+                "max_wait_seconds": stats["max_wait_seconds"],
+                "avg_slot_seconds": (stats["total_hold_seconds"] / acquired) if acquired else 0.0,
+            }
+        acquired = sum(lane["acquired"] for lane in lanes.values())
+        total_wait = sum(state.stats["total_wait_seconds"] for state in self._lanes.values())
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": self._queued,
+            "max_queue_depth": max(lane["max_queue_depth"] for lane in lanes.values()),
+            "owners_waiting": sum(len(state.owners) for state in self._lanes.values()),
+            "acquired": acquired,
+            "rejected": sum(lane["rejected"] for lane in lanes.values()),
+            "avg_wait_seconds": (total_wait / acquired) if acquired else 0.0,
+            "max_wait_seconds": max(lane["max_wait_seconds"] for lane in lanes.values()),
+            "lanes": lanes,
+        }
+
+
+execution_scheduler = ExecutionScheduler()
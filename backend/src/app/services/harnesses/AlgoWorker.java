@@ -0,0 +1,210 @@
+// Long-lived Algo compiler worker.
+//
+// Starting a JVM for every test case dominates Algo judging time. This worker
+// stays up, loads the compiler jar once so its JIT-compiled code survives
+// between jobs, and runs the compiler's main class once per job on a fresh
+// thread with its own stdin, stdout and stderr. Captured output is capped at
+// the output limit per stream. A job that leaves threads running asks to be
+// retired, so nothing it started can reach the next submission.
+//
+// System.exit() in the compiler is trapped with a SecurityManager, which needs
+// -Djava.security.manager=allow and so a JDK from 18 to 23: JDK 24 removed the
+// SecurityManager. The Docker image pins JDK 21 for this reason.
+//
+// Arguments: <compiler jar> <output limit bytes>.
+// Job (stdin):   "<source path>\n<stdin byte length>\n<stdin bytes>"
+// Reply (stdout): "@@CMJOB <exit code> <stdout length> <stderr length> <heap used bytes> <retire 0|1>\n<stdout><stderr>"
+
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.DataInputStream;
+import java.io.EOFException;
+import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.security.Permission;
+import java.util.jar.Attributes;
+import java.util.jar.JarFile;
+
+public class AlgoWorker {
+    private static volatile boolean inJob = false;
+
+    private static final class ExitTrap extends SecurityException {
+        final int status;
+
+        ExitTrap(int status) {
+            super("System.exit(" + status + ")");
+            this.status = status;
+        }
+    }
+
+    // Keeps the first `limit` bytes and drops the rest, so a submission that
+    // prints in a loop cannot grow the worker's heap until it is killed.
+    private static final class CappedOutput extends ByteArrayOutputStream {
+        private final int limit;
+
+        CappedOutput(int limit) {
+            this.limit = limit;
+        }
+
+        @Override
+        public synchronized void write(int b) {
+            if (count < limit) {
+                super.write(b);
+            }
+        }
+
+        @Override
+        public synchronized void write(byte[] b, int off, int len) {
+            super.write(b, off, Math.min(len, Math.max(0, limit - count)));
+        }
+    }
+
+    private static final class Job implements Runnable {
+        private final Method main;
+        private final String sourcePath;
+        private final PrintStream err;
+        int code = 0;
+
+        Job(Method main, String sourcePath, PrintStream err) {
+            this.main = main;
+            this.sourcePath = sourcePath;
+            this.err = err;
+        }
+
+        @Override
+        public void run() {
+            try {
+                main.invoke(null, (Object) new String[] {sourcePath});
+            } catch (InvocationTargetException ex) {
+                Throwable cause = ex.getCause();
+                if (cause instanceof ExitTrap) {
+                    code = ((ExitTrap) cause).status;
+                } else {
+                    err.print("Exception in thread \"main\" ");
+                    cause.printStackTrace(err);
+                    code = 1;
+                }
+            } catch (ExitTrap ex) {
+                code = ex.status;
+            } catch (Throwable ex) {
+                ex.printStackTrace(err);
+                code = 1;
+            }
+        }
+    }
+
+    private static String readLine(DataInputStream in) throws Exception {
+        ByteArrayOutputStream line = new ByteArrayOutputStream();
+        int b;
+        while ((b = in.read()) != '\n') {
+            if (b < 0) {
+                if (line.size() == 0) {
+                    return null;
+                }
+                throw new EOFException();
+            }
+            line.write(b);
+        }
+        return line.toString(StandardCharsets.UTF_8);
+    }
+
+    // Returns true when the job left threads running and the worker must retire.
+    private static boolean runJob(Job job, ClassLoader loader, byte[] input, ByteArrayOutputStream stdout)
+            throws InterruptedException {
+        InputStream originalIn = System.in;
+        PrintStream originalOut = System.out;
+        PrintStream originalErr = System.err;
+        PrintStream jobOut = new PrintStream(stdout, true, StandardCharsets.UTF_8);
+        System.setIn(new ByteArrayInputStream(input));
+        System.setOut(jobOut);
+        System.setErr(job.err);
+        // A fresh thread per job, so thread locals never carry over and any
+        // threads the job starts land in a group that can be checked after.
+        ThreadGroup group = new ThreadGroup("algo-job");
+        Thread thread = new Thread(group, job, "main");
+        thread.setContextClassLoader(loader);
+        inJob = true;
+        try {
+            thread.start();
+            thread.join();
+        } finally {
+            inJob = false;
+            jobOut.flush();
+            job.err.flush();
+            System.setIn(originalIn);
+            System.setOut(originalOut);
+            System.setErr(originalErr);
+        }
+        return group.activeCount() > 0;
+    }
+
+    @SuppressWarnings("removal")
+    public static void main(String[] args) throws Exception {
+        File jar = new File(args[0]);
+        int outputLimit = Integer.parseInt(args[1]);
+        String mainClass;
+        try (JarFile file = new JarFile(jar)) {
+            mainClass = file.getManifest().getMainAttributes().getValue(Attributes.Name.MAIN_CLASS);
+        }
+        URLClassLoader loader = new URLClassLoader(new URL[] {jar.toURI().toURL()}, ClassLoader.getPlatformClassLoader());
+        Method compilerMain = Class.forName(mainClass, true, loader).getMethod("main", String[].class);
+
+        System.setSecurityManager(new SecurityManager() {
+            @Override
+            public void checkPermission(Permission perm) {
+            }
+
+            @Override
+            public void checkPermission(Permission perm, Object context) {
+            }
+
+            @Override
+            public void checkExit(int status) {
+                if (inJob) {
+                    throw new ExitTrap(status);
+                }
+            }
+        });
+
+        DataInputStream in = new DataInputStream(new BufferedInputStream(new FileInputStream(FileDescriptor.in)));
+        OutputStream protocol = new BufferedOutputStream(new FileOutputStream(FileDescriptor.out));
+        Runtime runtime = Runtime.getRuntime();
+        while (true) {
+            String sourcePath = readLine(in);
+            if (sourcePath == null) {
+                break;
+            }
+            byte[] input = new byte[Integer.parseInt(readLine(in).trim())];
+            in.readFully(input);
+
+            ByteArrayOutputStream stdout = new CappedOutput(outputLimit);
+            ByteArrayOutputStream stderr = new CappedOutput(outputLimit);
+            Job job = new Job(compilerMain, sourcePath, new PrintStream(stderr, true, StandardCharsets.UTF_8));
+            boolean retire = runJob(job, loader, input, stdout);
+            byte[] out = stdout.toByteArray();
+            byte[] err = stderr.toByteArray();
+            long heapUsed = runtime.totalMemory() - runtime.freeMemory();
+            protocol.write(("@@CMJOB " + job.code + " " + out.length + " " + err.length + " " + heapUsed
+                + " " + (retire ? 1 : 0) + "\n").getBytes(StandardCharsets.US_ASCII));
+            protocol.write(out);
+            protocol.write(err);
+            protocol.flush();
+            if (retire) {
+                break;
+            }
+        }
+        runtime.halt(0);
+    }
+}
@@ -0,0 +1,122 @@
+// Batched judging driver for the Piston java runtime.
+//
+// Piston launches the first uploaded file in source-file mode, which would
+// recompile the submission on every run. This driver compiles the submission
+// once with the in-process javac, then starts one JVM per test case against
+// the compiled classes and reports each case as a single "@@CMCASE" line
+// tagged with the per-run nonce from the header. Cases run in fresh JVMs, so
+// the nonce never reaches the submission's address space.
+// Arguments: <submission file name> <main class name>.
+
+import java.io.PrintStream;
+import java.io.StringWriter;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import java.util.Arrays;
+import java.util.Base64;
+import java.util.concurrent.TimeUnit;
+import javax.tools.JavaCompiler;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+
+public class BatchHarness {
+    private static int cursor = 0;
+
+    private static String readLine(byte[] data) {
+        int start = cursor;
+        while (cursor < data.length && data[cursor] != '\n') {
+            cursor++;
+        }
+        String line = new String(data, start, cursor - start, StandardCharsets.US_ASCII);
+        cursor++;
+        return line;
+    }
+
+    private static String b64(byte[] data) {
+        return data.length == 0 ? "-" : Base64.getEncoder().encodeToString(data);
+    }
+
+    // Trailing fields are wall ms, CPU ms and peak RSS in KB; the JVM only
+    // knows the first, so the others are "-".
+    private static void emit(PrintStream out, String tag, int idx, String code, String signal, byte[] stdout, byte[] stderr, String wallMs) {
+        out.print(tag + idx + " " + code + " " + signal + " " + b64(stdout) + " " + b64(stderr) + " " + wallMs + " - -\n");
+        out.flush();
+    }
+
+    public static void main(String[] args) throws Exception {
+        String sourceFile = args[0];
+        String mainClass = args[1];
+        PrintStream out = new PrintStream(System.out, false, "US-ASCII");
+
+        byte[] data = System.in.readAllBytes();
+        String[] header = readLine(data).split(" ");
+        if (header.length != 5 || !header[0].equals("CMBATCH1")) {
+            System.exit(72);
+        }
+        int count = Integer.parseInt(header[1]);
+        long timeoutMs = Long.parseLong(header[2]);
+        boolean stopOnError = header[3].equals("1");
+        String tag = "@@CMCASE " + header[4] + " ";
+
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        if (compiler == null) {
+            System.exit(75);
+        }
+        Path classes = Files.createTempDirectory(Paths.get("."), "cm_classes");
+        StringWriter diagnostics = new StringWriter();
+        boolean compiled;
+        try (StandardJavaFileManager files = compiler.getStandardFileManager(null, null, StandardCharsets.UTF_8)) {
+            compiled = compiler.getTask(
+                diagnostics,
+                files,
+                null,
+                Arrays.asList("-d", classes.toString(), "-encoding", "UTF-8"),
+                null,
+                files.getJavaFileObjects(sourceFile)
+            ).call();
+        }
+        byte[] compileError = (diagnostics + "error: compilation failed\n").getBytes(StandardCharsets.UTF_8);
+
+        String javaBin = Paths.get(System.getProperty("java.home"), "bin", "java").toString();
+        Path input = Paths.get(".cm_in");
+        Path stdout = Paths.get(".cm_out");
+        Path stderr = Paths.get(".cm_err");
+        for (int idx = 0; idx < count; idx++) {
+            int size = Integer.parseInt(readLine(data));
+            Files.write(input, Arrays.copyOfRange(data, cursor, cursor + size));
+            cursor += size;
+
+            if (!compiled) {
+                emit(out, tag, idx, "1", "-", new byte[0], compileError, "-");
+                if (stopOnError) {
+                    break;
+                }
+                continue;
+            }
+
+            long started = System.nanoTime();
+            Process process = new ProcessBuilder(javaBin, "-cp", classes.toString(), mainClass)
+                .redirectInput(input.toFile())
+                .redirectOutput(stdout.toFile())
+                .redirectError(stderr.toFile())
+                .start();
+            String code;
+            String signal = "-";
+            if (process.waitFor(timeoutMs, TimeUnit.MILLISECONDS)) {
+                code = String.valueOf(process.exitValue());
+            } else {
+                process.destroyForcibly();
+                process.waitFor();
+                code = "-";
+                signal = "SIGKILL";
+            }
+            String wallMs = String.valueOf((System.nanoTime() - started) / 1000000L);
+            emit(out, tag, idx, code, signal, Files.readAllBytes(stdout), Files.readAllBytes(stderr), wallMs);
+            if (stopOnError && !code.equals("0")) {
+                break;
+            }
+        }
+    }
+}
@@ -0,0 +1,431 @@
+/*
+ * Batched judging driver for the Piston gcc runtime (C and C++).
+ *
+ * Piston compiles every uploaded file into one binary, so this file is linked
+ * next to the submission. The constructor runs before any of the submission's
+ * static initializers: it streams each framed test input from stdin to a file
+ * just before its case, forks one child per case with stdin/stdout/stderr
+ * redirected to files, and lets each child fall through into the submission's
+ * own main(). Later cases are still unread in the pipe, which the child no
+ * longer holds, and the copy buffer is wiped before every fork. The parent
+ * reports one "@@CMCASE" record per case, tagged with the per-run nonce from
+ * the header, and exits without ever running main() itself. The nonce lives
+ * only in cm_tag, which children clear before running user code, and the
+ * parent is non-dumpable so they cannot reach it through /proc.
+ *
+ * Written in the common subset of C and C++ because Piston picks the
+ * compiler from the requested language.
+ */
+#ifndef _GNU_SOURCE
+#define _GNU_SOURCE
+#endif
+
+#include <errno.h>
+#include <fcntl.h>
+#include <signal.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/prctl.h>
+#include <sys/resource.h>
+#include <sys/stat.h>
+#include <sys/types.h>
+#include <sys/wait.h>
+#include <time.h>
+#include <unistd.h>
+
+#define CM_MAGIC "CMBATCH1 "
+#define CM_IN_PATH ".cm_in"
+#define CM_OUT_PATH ".cm_out"
+#define CM_ERR_PATH ".cm_err"
+#define CM_RECORD_PREFIX "@@CMCASE "
+#define CM_NONCE_MAX 64
+
+typedef struct {
+    char *data;
+    size_t len;
+    size_t cap;
+} cm_buf;
+
+static const char CM_B64[] = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+
+/* CM_RECORD_PREFIX followed by the nonce; written ahead of every record. */
+static char cm_tag[sizeof(CM_RECORD_PREFIX) + CM_NONCE_MAX];
+static size_t cm_tag_len;
+
+/* One case's input passes through here on its way to CM_IN_PATH. */
+static char cm_chunk[65536];
+
+static void cm_reserve(cm_buf *buf, size_t extra) {
+    size_t cap;
+    if (buf->len + extra <= buf->cap) {
+        return;
+    }
+    cap = buf->cap ? buf->cap : 4096;
+    while (cap < buf->len + extra) {
+        cap *= 2;
+    }
+    buf->data = (char *)realloc(buf->data, cap);
+    if (!buf->data) {
+        _exit(70);
+    }
+    buf->cap = cap;
+}
+
+static void cm_put(cm_buf *buf, const char *data, size_t len) {
+    cm_reserve(buf, len);
+    memcpy(buf->data + buf->len, data, len);
+    buf->len += len;
+}
+
+static void cm_put_str(cm_buf *buf, const char *text) {
+    cm_put(buf, text, strlen(text));
+}
+
+static void cm_put_long(cm_buf *buf, long value) {
+    char digits[24];
+    size_t pos = sizeof(digits);
+    unsigned long magnitude = value < 0 ? 0UL - (unsigned long)value : (unsigned long)value;
+    do {
+        digits[--pos] = (char)('0' + magnitude % 10);
+        magnitude /= 10;
+    } while (magnitude);
+    if (value < 0) {
+        digits[--pos] = '-';
+    }
+    cm_put(buf, digits + pos, sizeof(digits) - pos);
+}
+
+static void cm_put_b64(cm_buf *buf, const cm_buf *raw) {
+    const unsigned char *src = (const unsigned char *)raw->data;
+    size_t i = 0;
+    char quad[4];
+    if (raw->len == 0) {
+        cm_put(buf, "-", 1);
+        return;
+    }
+    cm_reserve(buf, (raw->len + 2) / 3 * 4);
+    for (; i + 2 < raw->len; i += 3) {
+        quad[0] = CM_B64[src[i] >> 2];
+        quad[1] = CM_B64[((src[i] & 3) << 4) | (src[i + 1] >> 4)];
+        quad[2] = CM_B64[((src[i + 1] & 15) << 2) | (src[i + 2] >> 6)];
+        quad[3] = CM_B64[src[i + 2] & 63];
+        cm_put(buf, quad, 4);
+    }
+    if (raw->len - i == 1) {
+        quad[0] = CM_B64[src[i] >> 2];
+        quad[1] = CM_B64[(src[i] & 3) << 4];
+        quad[2] = '=';
+        quad[3] = '=';
+        cm_put(buf, quad, 4);
+    } else if (raw->len - i == 2) {
+        quad[0] = CM_B64[src[i] >> 2];
+        quad[1] = CM_B64[((src[i] & 3) << 4) | (src[i + 1] >> 4)];
+        quad[2] = CM_B64[(src[i + 1] & 15) << 2];
+        quad[3] = '=';
+        cm_put(buf, quad, 4);
+    }
+}
+
+static int cm_read_fd(int fd, cm_buf *buf) {
+    ssize_t count;
+    for (;;) {
+        cm_reserve(buf, 65536);
+        count = read(fd, buf->data + buf->len, buf->cap - buf->len);
+        if (count < 0) {
+            if (errno == EINTR) {
+                continue;
+            }
+            return -1;
+        }
+        if (count == 0) {
+            return 0;
+        }
+        buf->len += (size_t)count;
+    }
+}
+
+static void cm_read_path(const char *path, cm_buf *buf) {
+    int fd = open(path, O_RDONLY);
+    buf->len = 0;
+    if (fd < 0) {
+        return;
+    }
+    cm_read_fd(fd, buf);
+    close(fd);
+}
+
+static int cm_write_all(int fd, const char *data, size_t len) {
+    ssize_t count;
+    while (len > 0) {
+        count = write(fd, data, len);
+        if (count < 0) {
+            if (errno == EINTR) {
+                continue;
+            }
+            return -1;
+        }
+        data += count;
+        len -= (size_t)count;
+    }
+    return 0;
+}
+
+static int cm_read_byte(void) {
+    unsigned char byte;
+    ssize_t count;
+    do {
+        count = read(0, &byte, 1);
+    } while (count < 0 && errno == EINTR);
+    return count == 1 ? byte : -1;
+}
+
+/* Reads digits up to and including a ' ' or '\n' delimiter. */
+static long cm_read_long(void) {
+    long value = 0;
+    int digits = 0;
+    int c = cm_read_byte();
+    while (c >= '0' && c <= '9') {
+        value = value * 10 + (c - '0');
+        digits++;
+        c = cm_read_byte();
+    }
+    if (!digits || (c != ' ' && c != '\n')) {
+        _exit(72);
+    }
+    return value;
+}
+
+static void cm_read_header(long *count, long *timeout_ms, long *stop_on_error) {
+    const char *magic = CM_MAGIC;
+    size_t len = 0;
+    int c;
+    while (*magic) {
+        if (cm_read_byte() != (unsigned char)*magic++) {
+            _exit(72);
+        }
+    }
+    *count = cm_read_long();
+    *timeout_ms = cm_read_long();
+    *stop_on_error = cm_read_long();
+    /* Straight into cm_tag: the nonce is never buffered anywhere else. */
+    memcpy(cm_tag, CM_RECORD_PREFIX, strlen(CM_RECORD_PREFIX));
+    cm_tag_len = strlen(CM_RECORD_PREFIX);
+    while ((c = cm_read_byte()) >= 0 && c != '\n') {
+        if (len == CM_NONCE_MAX) {
+            _exit(72);
+        }
+        cm_tag[cm_tag_len++] = (char)c;
+        len++;
+    }
+    if (len == 0 || c != '\n') {
+        _exit(72);
+    }
+}
+
+static void cm_copy_case(long size) {
+    ssize_t count;
+    int fd = open(CM_IN_PATH, O_WRONLY | O_CREAT | O_TRUNC, 0600);
+    if (fd < 0) {
+        _exit(74);
+    }
+    while (size > 0) {
+        count = read(0, cm_chunk, size < (long)sizeof(cm_chunk) ? (size_t)size : sizeof(cm_chunk));
+        if (count < 0 && errno == EINTR) {
+            continue;
+        }
+        if (count <= 0) {
+            _exit(73);
+        }
+        if (cm_write_all(fd, cm_chunk, (size_t)count) < 0) {
+            _exit(74);
+        }
+        size -= count;
+    }
+    close(fd);
+    memset(cm_chunk, 0, sizeof(cm_chunk));
+}
+
+/* Current RSS in KB. A forked child's peak RSS starts from this, not from 0. */
+static long cm_rss_kb(void) {
+    char text[64];
+    long pages = 0;
+    ssize_t count;
+    size_t pos = 0;
+    int fd = open("/proc/self/statm", O_RDONLY);
+    if (fd < 0) {
+        return 0;
+    }
+    count = read(fd, text, sizeof(text) - 1);
+    close(fd);
+    if (count <= 0) {
+        return 0;
+    }
+    text[count] = '\0';
+    while (text[pos] && text[pos] != ' ') {
+        pos++;
+    }
+    while (text[pos] == ' ') {
+        pos++;
+    }
+    while (text[pos] >= '0' && text[pos] <= '9') {
+        pages = pages * 10 + (text[pos++] - '0');
+    }
+    return pages * (sysconf(_SC_PAGESIZE) / 1024);
+}
+
+static const char *cm_signal_name(int sig) {
+    switch (sig) {
+    case SIGKILL: return "SIGKILL";
+    case SIGSEGV: return "SIGSEGV";
+    case SIGABRT: return "SIGABRT";
+    case SIGFPE: return "SIGFPE";
+    case SIGBUS: return "SIGBUS";
+    case SIGILL: return "SIGILL";
+    case SIGTERM: return "SIGTERM";
+    case SIGPIPE: return "SIGPIPE";
+    case SIGALRM: return "SIGALRM";
+    case SIGXCPU: return "SIGXCPU";
+    case SIGXFSZ: return "SIGXFSZ";
+    default: return "SIGUNKNOWN";
+    }
+}
+
+static void cm_redirect(int target, const char *path, int flags) {
+    int fd = open(path, flags, 0600);
+    if (fd < 0) {
+        _exit(76);
+    }
+    if (fd != target) {
+        dup2(fd, target);
+        close(fd);
+    }
+}
+
+static long cm_elapsed_ms(const struct timespec *start) {
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    return (long)(now.tv_sec - start->tv_sec) * 1000L + (now.tv_nsec - start->tv_nsec) / 1000000L;
+}
+
+static int cm_wait(pid_t pid, long timeout_ms, const sigset_t *sigchld, int *status, struct rusage *usage) {
+    struct timespec start;
+    struct timespec slice;
+    long remaining;
+    clock_gettime(CLOCK_MONOTONIC, &start);
+    for (;;) {
+        pid_t done = wait4(pid, status, WNOHANG, usage);
+        if (done == pid) {
+            return 0;
+        }
+        if (done < 0 && errno != EINTR) {
+            return -1;
+        }
+        remaining = timeout_ms - cm_elapsed_ms(&start);
+        if (remaining <= 0) {
+            kill(pid, SIGKILL);
+            wait4(pid, status, 0, usage);
+            return 1;
+        }
+        slice.tv_sec = remaining / 1000;
+        slice.tv_nsec = (remaining % 1000) * 1000000L;
+        sigtimedwait(sigchld, NULL, &slice);
+    }
+}
+
+static long cm_cpu_ms(const struct rusage *usage) {
+    return (long)(usage->ru_utime.tv_sec + usage->ru_stime.tv_sec) * 1000L
+        + (long)(usage->ru_utime.tv_usec + usage->ru_stime.tv_usec) / 1000L;
+}
+
+static void __attribute__((constructor(101))) cm_batch_main(void) {
+    cm_buf captured_out = {NULL, 0, 0};
+    cm_buf captured_err = {NULL, 0, 0};
+    cm_buf record = {NULL, 0, 0};
+    long count, timeout_ms, stop_on_error, idx, baseline_kb, rss_kb;
+    sigset_t sigchld;
+
+    prctl(PR_SET_DUMPABLE, 0, 0, 0, 0);
+    cm_read_header(&count, &timeout_ms, &stop_on_error);
+
+    sigemptyset(&sigchld);
+    sigaddset(&sigchld, SIGCHLD);
+    sigprocmask(SIG_BLOCK, &sigchld, NULL);
+
+    for (idx = 0; idx < count; idx++) {
+        int status = 0;
+        int timed_out;
+        long wall_ms;
+        struct timespec started;
+        struct rusage usage;
+        pid_t pid;
+
+        cm_copy_case(cm_read_long());
+        baseline_kb = cm_rss_kb();
+
+        clock_gettime(CLOCK_MONOTONIC, &started);
+        pid = fork();
+        if (pid < 0) {
+            _exit(75);
+        }
+        if (pid == 0) {
+            sigprocmask(SIG_UNBLOCK, &sigchld, NULL);
+            memset(cm_tag, 0, sizeof(cm_tag));
+            /* Replaces the stdin pipe, which still holds the later cases. */
+            cm_redirect(0, CM_IN_PATH, O_RDONLY);
+            cm_redirect(1, CM_OUT_PATH, O_WRONLY | O_CREAT | O_TRUNC);
+            cm_redirect(2, CM_ERR_PATH, O_WRONLY | O_CREAT | O_TRUNC);
+            free(record.data);
+            free(captured_out.data);
+            free(captured_err.data);
+            return;
+        }
+
+        memset(&usage, 0, sizeof(usage));
+        timed_out = cm_wait(pid, timeout_ms, &sigchld, &status, &usage);
+        if (timed_out < 0) {
+            _exit(77);
+        }
+        wall_ms = cm_elapsed_ms(&started);
+        cm_read_path(CM_OUT_PATH, &captured_out);
+        cm_read_path(CM_ERR_PATH, &captured_err);
+
+        record.len = 0;
+        cm_put(&record, " ", 1);
+        cm_put_long(&record, idx);
+        cm_put(&record, " ", 1);
+        if (timed_out) {
+            cm_put_str(&record, "- SIGKILL");
+        } else if (WIFSIGNALED(status)) {
+            cm_put_str(&record, "- ");
+            cm_put_str(&record, cm_signal_name(WTERMSIG(status)));
+        } else {
+            cm_put_long(&record, WEXITSTATUS(status));
+            cm_put_str(&record, " -");
+        }
+        cm_put(&record, " ", 1);
+        cm_put_b64(&record, &captured_out);
+        cm_put(&record, " ", 1);
+        cm_put_b64(&record, &captured_err);
+        /* wall ms, CPU ms and peak RSS in KB above what the child inherited */
+        rss_kb = usage.ru_maxrss - baseline_kb;
+        cm_put(&record, " ", 1);
+        cm_put_long(&record, wall_ms);
+        cm_put(&record, " ", 1);
+        cm_put_long(&record, cm_cpu_ms(&usage));
+        cm_put(&record, " ", 1);
+        cm_put_long(&record, rss_kb > 0 ? rss_kb : 0);
+        cm_put(&record, "\n", 1);
+        if (cm_write_all(1, cm_tag, cm_tag_len) < 0 || cm_write_all(1, record.data, record.len) < 0) {
+            _exit(78);
+        }
+
+        if (stop_on_error && (timed_out || !WIFEXITED(status) || WEXITSTATUS(status) != 0)) {
+            break;
+        }
+    }
+
+    unlink(CM_IN_PATH);
+    unlink(CM_OUT_PATH);
+    unlink(CM_ERR_PATH);
+    _exit(0);
+}
@@ -0,0 +1,214 @@
+"""Batched judging driver for the Piston python runtime.
+
+Compiles the submission once, then forks one child per test case with
+stdin/stdout/stderr redirected to files and executes the compiled code object
+in it. Each case's input is streamed from stdin to its file just before the
+fork, through a buffer that is wiped first, so no child can find later
+cases' inputs in memory. Each case is reported as a single "@@CMCASE" line on stdout, tagged
+with the per-run nonce from the header. The nonce is only kept in mutable
+buffers so each child can wipe it before running the submission, and the
+driver marks itself non-dumpable so children cannot reach its stdout or
+memory through /proc.
+"""
+
+import base64
+import ctypes
+import os
+import signal
+import sys
+import time
+import traceback
+
+IN_PATH = ".cm_in"
+OUT_PATH = ".cm_out"
+ERR_PATH = ".cm_err"
+RECORD_PREFIX = b"@@CMCASE "
+PR_SET_DUMPABLE = 4
+
+
+def _wipe(buf):
+    buf[:] = bytes(len(buf))
+
+
+def _read_header():
+    # Read byte by byte straight into mutable buffers: the nonce must never
+    # land in an immutable object (or stdin's buffer) that cannot be wiped.
+    line = bytearray(256)
+    byte = bytearray(1)
+    size = 0
+    while os.readv(0, [byte]) == 1 and byte[0] != 0x0A:
+        if size == len(line):
+            os._exit(72)
+        line[size] = byte[0]
+        size += 1
+    header = line[:size]
+    parts = header.split()
+    if len(parts) != 5 or parts[0] != b"CMBATCH1":
+        os._exit(72)
+    count, timeout_ms, stop_on_error = int(parts[1]), int(parts[2]), parts[3] == b"1"
+    tag = bytearray(RECORD_PREFIX)
+    tag += parts[4]
+    for buf in (line, header, *parts):
+        _wipe(buf)
+    return count, timeout_ms / 1000.0, stop_on_error, tag
+
+
+def _copy_case(chunk):
+    # The size line, then exactly that many bytes of input into IN_PATH.
+    size = 0
+    byte = bytearray(1)
+    while os.readv(0, [byte]) == 1 and byte[0] != 0x0A:
+        if not 0x30 <= byte[0] <= 0x39:
+            os._exit(72)
+        size = size * 10 + byte[0] - 0x30
+    fd = os.open(IN_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    view = memoryview(chunk)
+    while size > 0:
+        count = os.readv(0, [view[:min(size, len(chunk))]])
+        if count == 0:
+            os._exit(73)
+        os.write(fd, view[:count])
+        size -= count
+    os.close(fd)
+    _wipe(chunk)
+
+
+def _no_dump():
+    try:
+        ctypes.CDLL(None, use_errno=True).prctl(PR_SET_DUMPABLE, 0, 0, 0, 0)
+    except (AttributeError, OSError):
+        pass
+
+
+def _exit_status(exc):
+    code = exc.code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code & 0xFF
+    sys.stderr.write(f"{code}\n")
+    return 1
+
+
+def _run_child(code, filename, tag):
+    _wipe(tag)
+    for target, path, flags in (
+        (0, IN_PATH, os.O_RDONLY),
+        (1, OUT_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+        (2, ERR_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC),
+    ):
+        fd = os.open(path, flags, 0o600)
+        os.dup2(fd, target)
+        os.close(fd)
+    sys.stdin = sys.__stdin__ = open(0, "r", closefd=False)
+    sys.stdout = sys.__stdout__ = open(1, "w", closefd=False)
+    sys.stderr = sys.__stderr__ = open(2, "w", closefd=False)
+    sys.argv = [filename]
+
+    status = 0
+    try:
+        exec(code, {"__name__": "__main__", "__file__": filename, "__builtins__": __builtins__})
+    except SystemExit as exc:
+        status = _exit_status(exc)
+    except BaseException as exc:
+        traceback.print_exception(type(exc), exc, exc.__traceback__.tb_next)
+        status = 1
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    os._exit(status)
+
+
+def _wait(pid, timeout):
+    started = time.monotonic()
+    deadline = started + timeout
+    delay = 0.0005
+    while True:
+        done, status, usage = os.wait4(pid, os.WNOHANG)
+        if done == pid:
+            return status, usage, time.monotonic() - started, False
+        if time.monotonic() >= deadline:
+            os.kill(pid, signal.SIGKILL)
+            _, status, usage = os.wait4(pid, 0)
+            return status, usage, time.monotonic() - started, True
+        time.sleep(delay)
+        delay = min(delay * 2, 0.01)
+
+
+def _signal_name(signum):
+    try:
+        return signal.Signals(signum).name
+    except ValueError:
+        return "SIGUNKNOWN"
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii") if data else "-"
+
+
+def _read(path):
+    try:
+        with open(path, "rb") as fh:
+            return fh.read()
+    except OSError:
+        return b""
+
+
+def _emit(tag, idx, code, sig, stdout, stderr, wall=None, usage=None):
+    # Trailing fields: wall ms, CPU ms and peak RSS in KB ("-" when unknown).
+    if usage is None:
+        metrics = "- - -"
+    else:
+        cpu_ms = round((usage.ru_utime + usage.ru_stime) * 1000)
+        metrics = f"{round(wall * 1000)} {cpu_ms} {usage.ru_maxrss}"
+    body = f" {idx} {'-' if code is None else code} {sig or '-'} {_b64(stdout)} {_b64(stderr)} {metrics}\n"
+    os.writev(1, [tag, body.encode("ascii")])
+
+
+def main():
+    filename = sys.argv[1]
+    _no_dump()
+    count, timeout, stop_on_error, tag = _read_header()
+    with open(filename, "rb") as fh:
+        source = fh.read()
+
+    try:
+        code = compile(source, filename, "exec")
+    except (SyntaxError, ValueError) as exc:
+        message = "".join(traceback.format_exception_only(type(exc), exc)).encode("utf-8")
+        for idx in range(count):
+            _emit(tag, idx, 1, None, b"", message)
+            if stop_on_error:
+                break
+        return
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    chunk = bytearray(65536)
+    for idx in range(count):
+        _copy_case(chunk)
+        pid = os.fork()
+        if pid == 0:
+            _run_child(code, filename, tag)
+        status, usage, wall, timed_out = _wait(pid, timeout)
+        if timed_out:
+            exit_code, sig = None, "SIGKILL"
+        elif os.WIFSIGNALED(status):
+            exit_code, sig = None, _signal_name(os.WTERMSIG(status))
+        else:
+            exit_code, sig = os.WEXITSTATUS(status), None
+        _emit(tag, idx, exit_code, sig, _read(OUT_PATH), _read(ERR_PATH), wall, usage)
+        if stop_on_error and exit_code != 0:
+            break
+
+    for path in (IN_PATH, OUT_PATH, ERR_PATH):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import os
+import socket
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from redis.asyncio.client import Redis
+from redis.exceptions import NoScriptError, ResponseError
+
+from config import settings
+from redis_db import redis_pool
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentJobError(RuntimeError):
+    """Raised by a job handler when retrying cannot help."""
+
+
+class Reservation:
+    __slots__ = ("job", "token")
+
+    def __init__(self, job: Dict, token: Optional[str] = None) -> None:
+        self.job = job
+        self.token = token
+
+
+class JobQueue:
+    async def enqueue(self, job: Dict, delay: float = 0.0) -> None:
+        """Add ``job``; with ``delay`` it is handed out no sooner than that many seconds from now."""
+        raise NotImplementedError
+
+    async def reserve(self, timeout: float) -> Optional[Reservation]:
+        raise NotImplementedError
+
+    async def ack(self, reservation: Reservation) -> None:
+        raise NotImplementedError
+
+
+class InMemoryJobQueue(JobQueue):
+    """Process-local stand-in for tests and single-process development."""
+
+    def __init__(self) -> None:
+        self._jobs: Deque[Dict] = deque()
+        self._delayed: List = []
+        self._order = itertools.count()
+
+    async def enqueue(self, job: Dict, delay: float = 0.0) -> None:
+        if delay > 0:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._order), job))
+        else:
+            self._jobs.append(job)
+
+    def _promote(self) -> None:
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            self._jobs.append(heapq.heappop(self._delayed)[2])
+
+    async def reserve(self, timeout: float) -> Optional[Reservation]:
+        deadline = time.monotonic() + timeout
+        self._promote()
+        while not self._jobs:
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(0.02)
+            self._promote()
+        return Reservation(self._jobs.popleft())
+
+    async def ack(self, reservation: Reservation) -> None:
+        return None
+
+    def __len__(self) -> int:
+        return len(self._jobs) + len(self._delayed)
+
+
+# Moves delayed jobs that are due from the sorted set KEYS[1] (scored by
+# due time, ms) onto the stream KEYS[2]. ARGV: now_ms, max jobs to move.
+# Returns the due time of the earliest job still waiting, or -1.
+_PROMOTE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, job in ipairs(due) do
+    redis.call('ZREM', KEYS[1], job)
+    redis.call('XADD', KEYS[2], '*', 'job', job)
+end
+local next_due = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if next_due[2] then
+    return tonumber(next_due[2])
+end
+return -1
+"""
+_PROMOTE_SHA = hashlib.sha1(_PROMOTE_SCRIPT.encode("utf-8")).hexdigest()
+
+
+class RedisStreamJobQueue(JobQueue):
+    """Durable queue on a Redis stream with a consumer group.
+
+    A reserved job stays pending until acked. If its worker dies, another
+    worker claims it once it has been idle for
+    ``SUBMISSION_QUEUE_VISIBILITY_SECONDS``. Delayed jobs wait in a sorted
+    set next to the stream and are moved onto it by whichever consumer
+    reserves after they fall due.
+    """
+
+    def __init__(self, stream: Optional[str] = None, group: Optional[str] = None) -> None:
+        self._stream = stream
+        self._group = group
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._group_ready = False
+        self._next_reclaim = 0.0
+
+    @property
+    def stream(self) -> str:
+        return self._stream or settings.SUBMISSION_QUEUE_STREAM
+
+    @property
+    def group(self) -> str:
+        return self._group or settings.SUBMISSION_QUEUE_GROUP
+
+    @property
+    def delayed(self) -> str:
+        return self.stream + ":delayed"
+
+    async def _redis(self) -> Redis:
+        redis = Redis(connection_pool=redis_pool)
+        if not self._group_ready:
+            try:
+                await redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+            except ResponseError as exc:
+                if "BUSYGROUP" not in str(exc):
+                    raise
+            self._group_ready = True
+        return redis
+
+    async def enqueue(self, job: Dict, delay: float = 0.0) -> None:
+        redis = await self._redis()
+        if delay > 0:
+            await redis.zadd(self.delayed, {json.dumps(job): (time.time() + delay) * 1000})
+        else:
+            await redis.xadd(self.stream, {"job": json.dumps(job)})
+
+    async def _promote(self, redis: Redis) -> float:
+        """Move due delayed jobs onto the stream; seconds until the next one is due, or -1."""
+        args = (2, self.delayed, self.stream, int(time.time() * 1000), 100)
+        try:
+            next_due = await redis.evalsha(_PROMOTE_SHA, *args)
+        except NoScriptError:
+            next_due = await redis.eval(_PROMOTE_SCRIPT, *args)
+        next_due = float(next_due)
+        return -1.0 if next_due < 0 else max(0.0, next_due / 1000 - time.time())
+
+    async def reserve(self, timeout: float) -> Optional[Reservation]:
+        redis = await self._redis()
+        next_due = await self._promote(redis)
+        if 0 <= next_due < timeout:
+            # Wake up in time to promote it.
+            timeout = next_due
+        if time.monotonic() >= self._next_reclaim:
+            self._next_reclaim = time.monotonic() + 5.0
+            _, claimed, *_ = await redis.xautoclaim(
+                self.stream,
+                self.group,
+                self.consumer,
+                min_idle_time=settings.SUBMISSION_QUEUE_VISIBILITY_SECONDS * 1000,
+                start_id="0-0",
+                count=1,
+            )
+            entry = self._first(claimed)
+            if entry is not None:
+                return entry
+        response = await redis.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.stream: ">"},
+            count=1,
+            block=max(1, int(timeout * 1000)),
+        )
+        for _, entries in response or []:
+            entry = self._first(entries)
+            if entry is not None:
+                return entry
+        return None
+
+    @staticmethod
+    def _first(entries: List) -> Optional[Reservation]:
+        for entry_id, fields in entries or []:
+            if fields and "job" in fields:
+                return Reservation(json.loads(fields["job"]), entry_id)
+        return None
+
+    async def ack(self, reservation: Reservation) -> None:
+        redis = await self._redis()
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, self.group, reservation.token)
+            pipe.xdel(self.stream, reservation.token)
+            await pipe.execute()
+
+
+def build_job_queue() -> JobQueue:
+    if settings.SUBMISSION_QUEUE_BACKEND == "memory":
+        return InMemoryJobQueue()
+    return RedisStreamJobQueue()
+
+
+class JobWorker:
+    """Drains a JobQueue with a fixed number of concurrent consumers.
+
+    A handler failure is retried with exponential backoff up to
+    ``SUBMISSION_QUEUE_MAX_ATTEMPTS`` times: the next attempt is re-enqueued
+    with the backoff as its delay and the failed one acked at once, so the
+    consumer is free for other jobs meanwhile. A ``PermanentJobError`` or the
+    last failed attempt goes to ``on_failure`` instead. Jobs interrupted by a
+    shutdown are left unacked so the queue hands them out again.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: Callable[[Dict], Awaitable[None]],
+        on_failure: Callable[[Dict, Exception], Awaitable[None]],
+        concurrency: Optional[int] = None,
+    ) -> None:
+        self.queue = queue
+        self._handler = handler
+        self._on_failure = on_failure
+        self._concurrency = concurrency
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def concurrency(self) -> int:
+        return max(1, self._concurrency or settings.SUBMISSION_WORKER_CONCURRENCY)
+
+    async def run(self) -> None:
+        await self.start()
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.close()
+
+    async def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.ensure_future(self._consume()) for _ in range(self.concurrency)]
+
+    async def close(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _consume(self) -> None:
+        while True:
+            try:
+                reservation = await self.queue.reserve(timeout=5.0)
+            except Exception as exc:
+                logger.warning("Job queue unavailable: %s", exc)
+                await asyncio.sleep(1.0)
+                continue
+            if reservation is None:
+                continue
+            try:
+                await self.process(reservation)
+            except Exception as exc:
+                # Left unacked; the queue hands the job out again later.
+                logger.error("Job %s could not be settled: %s", reservation.job, exc)
+
+    async def process(self, reservation: Reservation) -> None:
+        job = reservation.job
+        attempt = int(job.get("attempt", 1))
+        try:
+            await self._handler(job)
+        except PermanentJobError as exc:
+            await self._fail(job, exc)
+        except Exception as exc:
+            if attempt < settings.SUBMISSION_QUEUE_MAX_ATTEMPTS:
+                delay = settings.SUBMISSION_QUEUE_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1))
+                logger.warning("Job %s failed (attempt %d), retrying in %.1fs: %s", job, attempt, delay, exc)
+                await self.queue.enqueue({**job, "attempt": attempt + 1}, delay=delay)
+            else:
+                await self._fail(job, exc)
+        await self.queue.ack(reservation)
+
+    async def _fail(self, job: Dict, exc: Exception) -> None:
+        logger.warning("Job %s failed permanently: %s", job, exc)
+        try:
+            await self._on_failure(job, exc)
+        except Exception as failure_exc:
+            logger.error("Recording failure of job %s failed: %s", job, failure_exc)
@@ -0,0 +1,198 @@
+"""Launcher for local sandbox runs, exec'd as a script rather than imported.
+
+``local_sandbox`` starts it as ``python -I -S local_jail.py <config> <argv...>``
+instead of configuring the child in a ``preexec_fn``, which is unsafe in the
+threaded API process. The launcher confines itself (see ``enter_jail``),
+forks the program with its rlimits applied and privileges dropped, enforces
+the wall-clock limit, and writes one line to the inherited report fd:
+
+    ok <wait status> <user s> <system s> <peak RSS KB> <timed out 0|1>
+    error <message>
+
+Only the standard library is available here.
+"""
+
+import ctypes
+import json
+import os
+import platform
+import resource
+import signal
+import sys
+
+CLONE_NEWNS = 0x00020000
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+
+MS_RDONLY = 0x1
+MS_REMOUNT = 0x20
+MS_BIND = 0x1000
+MS_REC = 0x4000
+MS_PRIVATE = 0x40000
+MS_RELATIME = 0x200000
+MNT_DETACH = 0x2
+# statvfs flags a bind remount must carry over; inside a user namespace the
+# kernel refuses to clear them. All but relatime share the MS_* bit.
+KEPT_MOUNT_FLAGS = os.ST_NOSUID | os.ST_NODEV | os.ST_NOEXEC | os.ST_NOATIME | os.ST_NODIRATIME
+
+PR_SET_DUMPABLE = 4
+PR_CAPBSET_DROP = 24
+PR_SET_NO_NEW_PRIVS = 38
+# glibc has no pivot_root() wrapper.
+SYS_PIVOT_ROOT = {"x86_64": 155, "aarch64": 41}
+
+libc = ctypes.CDLL(None, use_errno=True)
+
+
+def _check(result, action):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{action} failed: {os.strerror(errno)}")
+
+
+def _unshare_network():
+    if libc.unshare(CLONE_NEWNET) == 0:
+        return
+    # Unprivileged fallback: a fresh user namespace grants CAP_SYS_ADMIN inside it.
+    _check(libc.unshare(CLONE_NEWUSER | CLONE_NEWNET), "unshare(CLONE_NEWNET)")
+
+
+def _bind(source, target, flags=0):
+    _check(libc.mount(source.encode(), target.encode(), None, MS_BIND | MS_REC | flags, None), f"bind {source}")
+
+
+def _bind_readonly(source, target):
+    _bind(source, target)
+    kept = os.statvfs(source).f_flag
+    flags = MS_BIND | MS_REMOUNT | MS_RDONLY | (kept & KEPT_MOUNT_FLAGS)
+    if kept & os.ST_RELATIME:
+        flags |= MS_RELATIME
+    _check(libc.mount(None, target.encode(), None, flags, None), f"remount {source} read-only")
+
+
+def enter_jail(config):
+    """Make ``config["root"]`` this process's whole filesystem.
+
+    A private mount namespace gets the read-only paths bound at their usual
+    place under the root, then ``pivot_root`` swaps it in and the old root is
+    detached, so no path (``..`` included) leads back to the host. Without
+    root, a user namespace maps the API's ids to the sandbox ids rather than
+    to 0, so nothing inside holds root and the program keeps no capabilities
+    once it execs.
+    """
+    root = config["root"]
+    outer_uid, outer_gid = os.getuid(), os.getgid()
+    flags = CLONE_NEWNS
+    if config["isolate_network"]:
+        flags |= CLONE_NEWNET
+    if not config["privileged"]:
+        flags |= CLONE_NEWUSER
+    _check(libc.unshare(flags), "unshare")
+    if not config["privileged"]:
+        for name, mapping in (
+            ("setgroups", "deny"),
+            ("uid_map", f"{config['uid']} {outer_uid} 1"),
+            ("gid_map", f"{config['gid']} {outer_gid} 1"),
+        ):
+            with open(f"/proc/self/{name}", "w") as fh:
+                fh.write(mapping)
+    # Without this the binds below would propagate back into the host namespace.
+    _check(libc.mount(None, b"/", None, MS_REC | MS_PRIVATE, None), "make / private")
+    # pivot_root needs the new root to be a mount point of its own.
+    _bind(root, root)
+    for path in config["readonly_paths"]:
+        target = root + path
+        if os.path.islink(path):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.symlink(os.readlink(path), target)
+            continue
+        if os.path.isdir(path):
+            os.makedirs(target, exist_ok=True)
+        elif os.path.exists(path):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            open(target, "a").close()
+        else:
+            continue
+        _bind_readonly(path, target)
+    os.makedirs(root + "/tmp", exist_ok=True)
+    os.chmod(root + "/tmp", 0o1777)
+    os.chdir(root)
+    syscall = SYS_PIVOT_ROOT.get(platform.machine())
+    if syscall is None:
+        raise OSError(0, f"pivot_root is not wired up for {platform.machine()}")
+    _check(libc.syscall(syscall, b".", b"."), "pivot_root")
+    _check(libc.umount2(b".", MNT_DETACH), "detach the old root")
+    os.chdir("/")
+
+
+def _drop_privileges(config):
+    # Empty the bounding set first: nothing the program execs can regain a capability.
+    cap = 0
+    while libc.prctl(PR_CAPBSET_DROP, cap, 0, 0, 0) == 0:
+        cap += 1
+    if config["privileged"]:
+        os.setgroups([])
+        os.setgid(config["gid"])
+        os.setuid(config["uid"])
+
+
+def _apply_limits(config):
+    cpu_seconds, memory_bytes = config["cpu_seconds"], config["memory_bytes"]
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    memory_limit = resource.RLIMIT_AS if config["limit_address_space"] else resource.RLIMIT_DATA
+    resource.setrlimit(memory_limit, (memory_bytes, memory_bytes))
+    file_bytes = config["max_file_bytes"]
+    resource.setrlimit(resource.RLIMIT_FSIZE, (file_bytes, file_bytes))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+
+
+def _run_program(config, argv, report):
+    try:
+        if config.get("root"):
+            _drop_privileges(config)
+        _check(libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), "PR_SET_NO_NEW_PRIVS")
+        _apply_limits(config)
+        os.execvp(argv[0], argv)
+    except OSError as exc:
+        os.write(report, f"error {argv[0]}: {exc.strerror or exc}\n".encode())
+    os._exit(127)
+
+
+def main():
+    config = json.loads(sys.argv[1])
+    argv = sys.argv[2:]
+    report = config["report_fd"]
+    os.set_inheritable(report, False)
+    try:
+        if config.get("root"):
+            enter_jail(config)
+        elif config["isolate_network"]:
+            _unshare_network()
+    except OSError as exc:
+        os.write(report, f"error {exc}\n".encode())
+        os._exit(70)
+    # The program may share our uid; keep it out of our memory and fds.
+    libc.prctl(PR_SET_DUMPABLE, 0, 0, 0, 0)
+
+    pid = os.fork()
+    if pid == 0:
+        _run_program(config, argv, report)
+    timed_out = []
+
+    def _expire(signum, frame):
+        timed_out.append(True)
+        os.kill(pid, signal.SIGKILL)
+
+    signal.signal(signal.SIGALRM, _expire)
+    signal.setitimer(signal.ITIMER_REAL, config["wall_seconds"])
+    _, status, usage = os.wait4(pid, 0)
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    os.write(
+        report,
+        f"ok {status} {usage.ru_utime} {usage.ru_stime} {usage.ru_maxrss} {1 if timed_out else 0}\n".encode(),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.execution_backends import ExecutionBackend, RunLimits
+from config import settings
+
+_LANGUAGES = {
+    "python": "python",
+    "py": "python",
+    "python3": "python",
+    "cpp": "cpp",
+    "c++": "cpp",
+    "cxx": "cpp",
+    "javascript": "javascript",
+    "js": "javascript",
+    "node": "javascript",
+    "nodejs": "javascript",
+}
+
+# Exec'd (not imported) to set up each run; see its docstring.
+_JAIL_HELPER = str(Path(__file__).with_name("local_jail.py"))
+
+
+def local_language(language: str) -> Optional[str]:
+    return _LANGUAGES.get((language or "").strip().lower())
+
+
+def _privileged() -> bool:
+    """Whether runs drop from root to the sandbox ids rather than entering a user namespace."""
+    return os.geteuid() == 0
+
+
+def _jail_paths(paths: List[str], program: str) -> List[str]:
+    """``paths`` plus the install prefix of ``program`` when it lies outside them.
+
+    Covers interpreters installed under pyenv, nvm and the like.
+    """
+    prefix = str(Path(program).parent.parent)
+    if any(prefix == path or prefix.startswith(path.rstrip("/") + "/") for path in paths):
+        return paths
+    return [*paths, prefix]
+
+
+def _signal_name(returncode: int) -> str:
+    try:
+        return signal.Signals(-returncode).name
+    except ValueError:
+        return "SIGUNKNOWN"
+
+
+def _kill_group(pid: int) -> None:
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _drain(stream, sink: bytearray, limit: int) -> None:
+    fd = stream.fileno()
+    try:
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return
+            if len(sink) < limit:
+                sink.extend(chunk[: limit - len(sink)])
+    finally:
+        stream.close()
+
+
+def _run_blocking(
+    argv,
+    cwd: Path,
+    stdin: bytes,
+    cpu_seconds: int,
+    wall_seconds: float,
+    memory_bytes: int,
+    limit_address_space: bool,
+    on_start: Callable[[int], None],
+) -> Dict:
+    # The helper reaps the program with wait4() and reports its exit status,
+    # its own CPU time and peak RSS over a pipe; see local_jail.py.
+    config = {
+        "root": None,
+        "readonly_paths": [],
+        "privileged": _privileged(),
+        "uid": settings.LOCAL_SANDBOX_UID,
+        "gid": settings.LOCAL_SANDBOX_GID,
+        "isolate_network": settings.LOCAL_SANDBOX_ISOLATE_NETWORK,
+        "cpu_seconds": cpu_seconds,
+        "memory_bytes": memory_bytes,
+        "limit_address_space": limit_address_space,
+        "max_file_bytes": settings.LOCAL_SANDBOX_MAX_FILE_BYTES,
+        "wall_seconds": wall_seconds,
+    }
+    home = str(cwd)
+    if settings.LOCAL_SANDBOX_ISOLATE_FILESYSTEM:
+        argv = list(argv)
+        paths = [path.strip() for path in settings.LOCAL_SANDBOX_READONLY_PATHS.split(",") if path.strip()]
+        if not argv[0].startswith("./"):
+            # A toolchain binary: run it by its real path, with its install prefix visible.
+            argv[0] = os.path.realpath(shutil.which(argv[0]) or argv[0])
+            paths = _jail_paths(paths, argv[0])
+        config.update(root=str(cwd), readonly_paths=paths)
+        home = "/"
+        if config["privileged"]:
+            os.chown(cwd, settings.LOCAL_SANDBOX_UID, settings.LOCAL_SANDBOX_GID)
+    report_read, report_write = os.pipe()
+    config["report_fd"] = report_write
+    started = time.monotonic()
+    try:
+        process = subprocess.Popen(
+            [sys.executable, "-I", "-S", _JAIL_HELPER, json.dumps(config), *argv],
+            cwd=str(cwd),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env={"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "HOME": home, "LANG": "C.UTF-8"},
+            pass_fds=(report_write,),
+            start_new_session=True,
+        )
+    except (OSError, subprocess.SubprocessError) as exc:
+        os.close(report_read)
+        raise RuntimeError(f"Local sandbox could not start {argv[0]}: {exc}") from exc
+    finally:
+        os.close(report_write)
+    on_start(process.pid)
+
+    limit = settings.LOCAL_SANDBOX_OUTPUT_LIMIT_BYTES
+    stdout, stderr = bytearray(), bytearray()
+    report = bytearray()
+    readers = [
+        threading.Thread(target=_drain, args=(process.stdout, stdout, limit), daemon=True),
+        threading.Thread(target=_drain, args=(process.stderr, stderr, limit), daemon=True),
+        threading.Thread(target=_drain, args=(os.fdopen(report_read, "rb"), report, 4096), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    expired = threading.Event()
+
+    def _expire() -> None:
+        expired.set()
+        _kill_group(process.pid)
+
+    # Backstop only: the helper enforces the wall limit itself.
+    timer = threading.Timer(wall_seconds + 2, _expire)
+    timer.start()
+    try:
+        try:
+            process.stdin.write(stdin)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        process.wait()
+    finally:
+        timer.cancel()
+    wall_seconds_used = time.monotonic() - started
+    # Anything the program left running in its session would hold the pipes open.
+    _kill_group(process.pid)
+    for reader in readers:
+        reader.join()
+
+    fields = report.decode("utf-8", errors="replace").split()
+    if fields[:1] == ["error"]:
+        raise RuntimeError(f"Local sandbox could not start {argv[0]}: {' '.join(fields[1:])}")
+    if fields[:1] == ["ok"] and len(fields) == 6:
+        status, utime, stime, maxrss, timed_out = fields[1:]
+        returncode = os.waitstatus_to_exitcode(int(status))
+        cpu_used, maxrss = float(utime) + float(stime), int(maxrss)
+        timed_out = timed_out == "1"
+    elif expired.is_set():
+        returncode, cpu_used, maxrss, timed_out = -signal.SIGKILL, 0.0, 0, True
+    else:
+        raise RuntimeError(f"Local sandbox helper exited with {process.returncode} and no report")
+
+    stdout_text = stdout.decode("utf-8", errors="replace")
+    stderr_text = stderr.decode("utf-8", errors="replace")
+    if timed_out and returncode < 0:
+        code, sig = None, "SIGKILL"
+    elif returncode < 0:
+        code, sig = None, _signal_name(returncode)
+    else:
+        code, sig = returncode, None
+    return {
+        "stdout": stdout_text,
+        "stderr": stderr_text,
+        "output": stdout_text + stderr_text,
+        "code": code,
+        "signal": sig,
+        "wall_time": round(wall_seconds_used * 1000),
+        "cpu_time": round(cpu_used * 1000),
+        "memory": maxrss * 1024,
+    }
+
+
+async def _run(
+    argv,
+    cwd: Path,
+    stdin: bytes,
+    cpu_seconds: int,
+    wall_seconds: float,
+    memory_bytes: int,
+    limit_address_space: bool = True,
+) -> Dict:
+    started = {}
+    run = asyncio.get_running_loop().run_in_executor(
+        None,
+        _run_blocking,
+        argv,
+        cwd,
+        stdin,
+        cpu_seconds,
+        wall_seconds,
+        memory_bytes,
+        limit_address_space,
+        lambda pid: started.setdefault("pid", pid),
+    )
+    try:
+        return await asyncio.shield(run)
+    except asyncio.CancelledError:
+        if "pid" in started:
+            _kill_group(started["pid"])
+        raise
+
+
+class LocalSandboxBackend(ExecutionBackend):
+    """Runs Python, C++ and JavaScript in rlimited subprocesses on this node.
+
+    Each run gets its own session, CPU/memory/file-size/fd limits, a scrubbed
+    environment and (by default) an empty network namespace, and is jailed in
+    its work directory as an unprivileged user (see ``local_jail.py``). C++
+    binaries are compiled once per source and reused across cases. Meant for
+    sample runs, overflow when Piston is saturated, and Piston-free load tests.
+    With ``LOCAL_SANDBOX_ISOLATE_FILESYSTEM`` off the program can read
+    whatever the API can, so ``accepts`` then limits it to signed-in users'
+    sample runs.
+    """
+
+    name = "local"
+
+    def __init__(self) -> None:
+        self._binaries: "OrderedDict[str, Tuple[Path, Dict]]" = OrderedDict()
+        self._compile_locks: Dict[str, asyncio.Lock] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._build_root: Optional[Path] = None
+
+    def supports(self, language: str) -> bool:
+        return local_language(language) is not None
+
+    def accepts(self, owner: str, lane: str) -> bool:
+        """Whether code from ``owner`` on the scheduler ``lane`` may run here."""
+        if settings.LOCAL_SANDBOX_ISOLATE_FILESYSTEM:
+            return True
+        return lane == "run" and owner.startswith("user:")
+
+    async def runtime_version(self, language: str) -> str:
+        lang = local_language(language)
+        binary = {
+            "python": settings.LOCAL_SANDBOX_PYTHON or sys.executable,
+            "cpp": settings.LOCAL_SANDBOX_CXX,
+            "javascript": settings.LOCAL_SANDBOX_NODE,
+        }.get(lang, "")
+        return f"local-{lang}-{binary}"
+
+    def _slot(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(max(1, settings.LOCAL_SANDBOX_MAX_WORKERS))
+            self._slots_loop = loop
+        return self._slots
+
+    def _builds(self) -> Path:
+        if self._build_root is None or not self._build_root.exists():
+            self._build_root = Path(tempfile.mkdtemp(prefix="codemaster-local-"))
+        return self._build_root
+
+    async def execute(
+        self,
+        language: str,
+        source_code: str,
+        stdin: str,
+        limits: Optional[RunLimits] = None,
+    ) -> Dict:
+        lang = local_language(language)
+        if lang is None:
+            raise ValueError(f"Unsupported language for local sandbox: {language}")
+
+        memory_mb = settings.LOCAL_SANDBOX_MEMORY_MB
+        cpu_seconds = settings.LOCAL_SANDBOX_CPU_SECONDS
+        wall_seconds = settings.LOCAL_SANDBOX_WALL_SECONDS
+        if limits is not None:
+            memory_mb = limits.memory_mb
+            # RLIMIT_CPU has whole-second granularity; the judge compares the
+            # measured CPU time against the exact limit afterwards.
+            cpu_seconds = max(1, math.ceil(limits.time_ms / 1000))
+            wall_seconds = max(1.0, 2 * limits.time_ms / 1000)
+        memory_bytes = memory_mb * 1024 * 1024
+        async with self._slot():
+            compile_stage = None
+            workdir = Path(tempfile.mkdtemp(prefix="run-", dir=self._builds()))
+            try:
+                if lang == "cpp":
+                    binary, compile_stage = await self._compile_cpp(source_code)
+                    if binary is None:
+                        return {"compile": compile_stage}
+                    # A private copy: the cached binary must survive whatever this run does.
+                    shutil.copyfile(binary, workdir / "main")
+                    (workdir / "main").chmod(0o755)
+                    argv = ["./main"]
+                    limit_address_space = True
+                elif lang == "python":
+                    (workdir / "main.py").write_text(source_code, encoding="utf-8")
+                    argv = [settings.LOCAL_SANDBOX_PYTHON or sys.executable, "-I", "main.py"]
+                    limit_address_space = True
+                else:
+                    (workdir / "main.js").write_text(source_code, encoding="utf-8")
+                    # V8 reserves far more address space than it uses; cap the heap instead.
+                    argv = [
+                        settings.LOCAL_SANDBOX_NODE,
+                        f"--max-old-space-size={memory_mb}",
+                        "main.js",
+                    ]
+                    limit_address_space = False
+
+                run_stage = await _run(
+                    argv,
+                    workdir,
+                    (stdin or "").encode("utf-8"),
+                    cpu_seconds=cpu_seconds,
+                    wall_seconds=wall_seconds,
+                    memory_bytes=memory_bytes,
+                    limit_address_space=limit_address_space,
+                )
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+        return {"compile": compile_stage, "run": run_stage}
+
+    async def _compile_cpp(self, source_code: str) -> Tuple[Optional[Path], Dict]:
+        digest = hashlib.sha256(source_code.encode("utf-8")).hexdigest()
+        lock = self._compile_locks.setdefault(digest, asyncio.Lock())
+        async with lock:
+            cached = self._binaries.get(digest)
+            if cached is not None and cached[0].exists():
+                self._binaries.move_to_end(digest)
+                return cached
+
+            build_dir = self._builds() / f"cpp-{digest}"
+            build_dir.mkdir(parents=True, exist_ok=True)
+            (build_dir / "main.cpp").write_text(source_code, encoding="utf-8")
+            stage = await _run(
+                [settings.LOCAL_SANDBOX_CXX, "-std=c++17", "-O2", "-pipe", "-o", "main", "main.cpp"],
+                build_dir,
+                b"",
+                cpu_seconds=settings.LOCAL_SANDBOX_COMPILE_SECONDS,
+                wall_seconds=settings.LOCAL_SANDBOX_COMPILE_SECONDS * 2,
+                memory_bytes=1024 * 1024 * 1024,
+            )
+            binary = build_dir / "main"
+            entry = (binary if stage["code"] == 0 and binary.exists() else None, stage)
+            if entry[0] is None:
+                self._compile_locks.pop(digest, None)
+                shutil.rmtree(build_dir, ignore_errors=True)
+                return entry
+
+            self._binaries[digest] = entry
+            while len(self._binaries) > 32:
+                evicted, _ = self._binaries.popitem(last=False)
+                self._compile_locks.pop(evicted, None)
+                shutil.rmtree(self._builds() / f"cpp-{evicted}", ignore_errors=True)
+            return entry
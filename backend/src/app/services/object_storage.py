@@ -61,3 +61,28 @@ def generate_interview_media_download_url(object_key: str, expires_in: int | Non
         )
     except Exception as exc:
         raise ObjectStorageError("Failed to generate media download URL") from exc
+
+
+def object_exists(object_key: str) -> bool:
+    client = _get_r2_client()
+    try:
+        client.head_object(Bucket=settings.R2_BUCKET, Key=object_key)
+    except Exception:
+        return False
+    return True
+
+
+def upload_object_file(*, object_key: str, path: str) -> None:
+    client = _get_r2_client()
+    try:
+        client.upload_file(path, settings.R2_BUCKET, object_key)
+    except Exception as exc:
+        raise ObjectStorageError("Failed to upload file to object storage") from exc
+
+
+def download_object_file(*, object_key: str, path: str) -> None:
+    client = _get_r2_client()
+    try:
+        client.download_file(settings.R2_BUCKET, object_key, path)
+    except Exception as exc:
+        raise ObjectStorageError("Failed to download file from object storage") from exc
@@ -0,0 +1,166 @@
+import math
+import re
+from itertools import zip_longest
+from typing import Dict, Iterator, Optional, Tuple
+
+CHECKER_MODES = ("exact", "whitespace", "token", "float")
+DEFAULT_CHECKER = "whitespace"
+DEFAULT_FLOAT_TOLERANCE = 1e-6
+
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+_TOKEN = re.compile(r"\S+")
+_TRAILING_SPACE = " \t\f\v"
+_CHUNK = 1 << 16
+_SNIPPET = 40
+
+Span = Tuple[int, int, int]  # (line number, start, end)
+
+
+def compare_output(
+    expected: Optional[str],
+    actual: Optional[str],
+    mode: Optional[str] = None,
+    tolerance: Optional[float] = None,
+) -> Optional[Dict]:
+    """Compare program output against the expected answer.
+
+    Works on offsets into the two strings, so at most one chunk or token is
+    copied at a time however large the output is. Returns ``None`` when the
+    outputs match, otherwise the first difference as ``line`` and ``column``
+    (1-based, in the actual output) plus short ``expected``/``actual``
+    snippets starting there.
+
+    Modes: ``exact`` compares line by line, ignoring only line-ending style
+    and one final newline; ``whitespace`` also ignores trailing spaces and
+    leading or trailing blank lines; ``token`` compares whitespace-separated
+    tokens; ``float`` is ``token`` with numbers equal within ``tolerance``
+    (absolute or relative).
+    """
+    expected = expected or ""
+    actual = actual or ""
+    mode = mode or DEFAULT_CHECKER
+    if mode in ("token", "float"):
+        if tolerance is None:
+            tolerance = DEFAULT_FLOAT_TOLERANCE
+        return _compare_tokens(expected, actual, tolerance if mode == "float" else None)
+    if mode == "exact":
+        return _compare_lines(expected, actual, _exact_lines)
+    if mode == "whitespace":
+        return _compare_lines(expected, actual, _content_lines)
+    raise ValueError(f"Unknown checker mode: {mode}")
+
+
+def _content_end(text: str) -> int:
+    if text.endswith("\r\n"):
+        return len(text) - 2
+    if text.endswith(("\n", "\r")):
+        return len(text) - 1
+    return len(text)
+
+
+def _exact_lines(text: str) -> Iterator[Span]:
+    end = _content_end(text)
+    start = 0
+    line = 1
+    for match in _LINE_BREAK.finditer(text, 0, end):
+        yield line, start, match.start()
+        start = match.end()
+        line += 1
+    yield line, start, end
+
+
+def _content_lines(text: str) -> Iterator[Span]:
+    # Lines with trailing whitespace trimmed, from the first non-blank line on;
+    # that line's leading whitespace is trimmed too. Trailing blank lines are
+    # still yielded and dropped by the caller.
+    started = False
+    for line, start, end in _exact_lines(text):
+        while end > start and text[end - 1] in _TRAILING_SPACE:
+            end -= 1
+        if not started:
+            while start < end and text[start].isspace():
+                start += 1
+            if start == end:
+                continue
+            started = True
+        yield line, start, end
+
+
+def _compare_lines(expected: str, actual: str, lines) -> Optional[Dict]:
+    last_line = 0
+    for want, got in zip_longest(lines(expected), lines(actual)):
+        if got is not None:
+            last_line = got[0]
+        if want is None:
+            if got[1] == got[2]:
+                continue
+            return _mismatch(got[0], 1, "", actual[got[1]:got[1] + _SNIPPET])
+        if got is None:
+            if want[1] == want[2]:
+                continue
+            return _mismatch(last_line + 1, 1, expected[want[1]:want[1] + _SNIPPET], "")
+        offset = _first_difference(expected, want[1], want[2], actual, got[1], got[2])
+        if offset is not None:
+            return _mismatch(
+                got[0],
+                offset + 1,
+                expected[want[1] + offset:min(want[2], want[1] + offset + _SNIPPET)],
+                actual[got[1] + offset:min(got[2], got[1] + offset + _SNIPPET)],
+            )
+    return None
+
+
+def _first_difference(a: str, a_start: int, a_end: int, b: str, b_start: int, b_end: int) -> Optional[int]:
+    # Offset of the first differing character of two spans, or None if equal.
+    length = min(a_end - a_start, b_end - b_start)
+    for offset in range(0, length, _CHUNK):
+        size = min(_CHUNK, length - offset)
+        left = a[a_start + offset:a_start + offset + size]
+        right = b[b_start + offset:b_start + offset + size]
+        if left != right:
+            return offset + next(i for i, (x, y) in enumerate(zip(left, right)) if x != y)
+    if a_end - a_start != b_end - b_start:
+        return length
+    return None
+
+
+def _compare_tokens(expected: str, actual: str, tolerance: Optional[float]) -> Optional[Dict]:
+    last_end = 0
+    for want, got in zip_longest(_TOKEN.finditer(expected), _TOKEN.finditer(actual)):
+        if got is not None:
+            last_end = got.end()
+        if want is not None and got is not None and _tokens_equal(want.group(), got.group(), tolerance):
+            continue
+        position = got.start() if got is not None else last_end
+        line, column = _locate(actual, position)
+        return _mismatch(
+            line,
+            column,
+            want.group()[:_SNIPPET] if want is not None else "",
+            got.group()[:_SNIPPET] if got is not None else "",
+        )
+    return None
+
+
+def _tokens_equal(want: str, got: str, tolerance: Optional[float]) -> bool:
+    if want == got:
+        return True
+    if tolerance is None:
+        return False
+    try:
+        expected_value = float(want)
+        actual_value = float(got)
+    except ValueError:
+        return False
+    if math.isnan(expected_value) or math.isnan(actual_value):
+        return math.isnan(expected_value) and math.isnan(actual_value)
+    return math.isclose(expected_value, actual_value, rel_tol=tolerance, abs_tol=tolerance)
+
+
+def _locate(text: str, position: int) -> Tuple[int, int]:
+    line = text.count("\n", 0, position) + 1
+    return line, position - (text.rfind("\n", 0, position) + 1) + 1
+
+
+def _mismatch(line: int, column: int, expected: str, actual: str) -> Dict:
+    return {"line": line, "column": column, "expected": expected, "actual": actual}
@@ -1,105 +1,446 @@
+import asyncio
+from contextlib import asynccontextmanager, nullcontext
+from functools import lru_cache
+import logging
 import os
 from pathlib import Path
 import re
-import subprocess
 import tempfile
 import time
-from concurrent.futures import ThreadPoolExecutor
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.services.algo_workers import algo_worker_pool
+from app.services.case_blobs import load_case_text
+from app.services.execution_backends import ExecutionBackend, RunLimits
+from app.services.execution_scheduler import DEFAULT_LANE, ExecutionQueueFull, execution_scheduler
+from app.services.local_sandbox import LocalSandboxBackend
+from app.services.output_checker import compare_output
+from app.services.piston_batch import build_batch_request, encode_batch_stdin, new_batch_nonce, parse_batch_output
+from app.services.sandbox_guard import SandboxUnavailable, adaptive_limit, circuit_breaker
+from config import settings
 
-import requests
+try:
+    from prometheus_client import Counter, Gauge, Histogram
+except ImportError:  # optional in local environments without network install
+    Counter = Gauge = Histogram = None
+
+logger = logging.getLogger(__name__)
+
+# Our UI language names and the Piston names/aliases that may serve them.
+_RUNTIME_SYNONYMS = {
+    "javascript": ["javascript", "js", "node", "nodejs"],
+    "python": ["python", "py"],
+    "java": ["java"],
+    "cpp": ["cpp", "c++", "cxx"],
+}
+
+if Gauge is not None:
+    _NODE_LATENCY = Histogram(
+        "codemaster_piston_request_seconds",
+        "Latency of requests to a Piston node",
+        ["node"],
+        buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+    _NODE_ERRORS = Counter("codemaster_piston_errors_total", "Failed requests to a Piston node", ["node"])
+    _NODE_OUTSTANDING = Gauge("codemaster_piston_outstanding", "Requests in flight to a Piston node", ["node"])
+    _NODE_UP = Gauge("codemaster_piston_node_up", "1 while a Piston node is admitted for traffic", ["node"])
+else:
+    _NODE_LATENCY = _NODE_ERRORS = _NODE_OUTSTANDING = _NODE_UP = None
+
+# Worth trying the next node: the request never reached Piston or it shed load.
+_RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_RETRYABLE_STATUS = {502, 503, 504}
+
+
+def _node_urls() -> List[str]:
+    urls = [url.strip().rstrip("/") for url in settings.PISTON_URLS.split(",") if url.strip()]
+    return urls or [settings.PISTON_URL.rstrip("/")]
+
+
+class PistonNode:
+    """One Piston endpoint with its in-flight count, health and latency stats."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.client: Optional[httpx.AsyncClient] = None
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.latency_ewma = 0.0
+        self.health_latency: Optional[float] = None
+        self.ejected_until = 0.0
+        self.ejections = 0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def record(self, seconds: float, ok: bool) -> None:
+        self.requests += 1
+        self.latency_ewma = seconds if self.requests == 1 else 0.8 * self.latency_ewma + 0.2 * seconds
+        if _NODE_LATENCY is not None:
+            _NODE_LATENCY.labels(self.url).observe(seconds)
+        if ok:
+            self.consecutive_failures = 0
+            return
+        self.errors += 1
+        self.consecutive_failures += 1
+        if _NODE_ERRORS is not None:
+            _NODE_ERRORS.labels(self.url).inc()
+        if self.consecutive_failures >= settings.PISTON_NODE_MAX_FAILURES:
+            self.eject(f"{self.consecutive_failures} consecutive failures")
+
+    def eject(self, reason: str) -> None:
+        if self.available:
+            self.ejections += 1
+            logger.warning("Ejecting Piston node %s: %s", self.url, reason)
+        self.ejected_until = time.monotonic() + settings.PISTON_NODE_EJECT_SECONDS
+        self._publish()
+
+    def admit(self) -> None:
+        if not self.available:
+            logger.info("Re-admitting Piston node %s", self.url)
+        self.ejected_until = 0.0
+        self.consecutive_failures = 0
+        self._publish()
+
+    def _publish(self) -> None:
+        if _NODE_UP is not None:
+            _NODE_UP.labels(self.url).set(1 if self.available else 0)
+            _NODE_OUTSTANDING.labels(self.url).set(self.outstanding)
+
+    def snapshot(self) -> Dict:
+        return {
+            "url": self.url,
+            "available": self.available,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejections": self.ejections,
+            "latency_ewma_seconds": self.latency_ewma,
+            "health_latency_seconds": self.health_latency,
+        }
 
-from config import settings
 
-_RUNTIME_CACHE: Dict[str, str] = {}
-_RUNTIME_CACHE_TS: float = 0.0
-_RUNTIME_CACHE_TTL_SECONDS = 60 * 10
+class PistonClient:
+    """Keep-alive connection pools to one or more Piston nodes.
+
+    Every request goes to the admitted node with the fewest outstanding
+    requests. A node is ejected after ``PISTON_NODE_MAX_FAILURES`` failed
+    requests in a row, or when its ``/runtimes`` health check fails or is
+    slower than ``PISTON_HEALTH_SLOW_SECONDS``; it is re-admitted by the next
+    passing health check, or once ``PISTON_NODE_EJECT_SECONDS`` have elapsed.
+    If every node is ejected, traffic still goes to the least loaded one.
+
+    Started and closed by the application lifespan, which also runs the health
+    checks when more than one node is configured. Outside of it (scripts,
+    direct calls in tests) each request falls back to a short-lived client.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        self._transport = transport
+        self._nodes: List[PistonNode] = []
+        self._started = False
+        self._cursor = 0
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def nodes(self) -> List[PistonNode]:
+        if not self._started:
+            urls = _node_urls()
+            if [node.url for node in self._nodes] != urls:
+                self._nodes = [PistonNode(url) for url in urls]
+        return self._nodes
+
+    def _build(self, node: PistonNode) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=node.url,
+            transport=self._transport,
+            timeout=httpx.Timeout(
+                settings.PISTON_TIMEOUT_SECONDS,
+                connect=settings.PISTON_CONNECT_TIMEOUT_SECONDS,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.PISTON_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.PISTON_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.PISTON_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
 
+    async def start(self) -> None:
+        if self._started:
+            return
+        for node in self.nodes:
+            node.client = self._build(node)
+            node._publish()
+        self._started = True
+        if len(self._nodes) > 1 and settings.PISTON_HEALTH_INTERVAL_SECONDS > 0:
+            self._health_task = asyncio.ensure_future(self._health_loop())
+
+    async def close(self) -> None:
+        task, self._health_task = self._health_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._started = False
+        for node in self._nodes:
+            client, node.client = node.client, None
+            if client is not None:
+                await client.aclose()
+
+    @asynccontextmanager
+    async def _session(self, node: PistonNode) -> AsyncIterator[httpx.AsyncClient]:
+        if node.client is not None:
+            yield node.client
+            return
+        async with self._build(node) as client:
+            yield client
+
+    def _pick(self, exclude: Tuple[PistonNode, ...] = ()) -> Optional[PistonNode]:
+        nodes = [node for node in self.nodes if node not in exclude]
+        candidates = [node for node in nodes if node.available] or nodes
+        if not candidates:
+            return None
+        # Rotate the starting point so ties do not always land on the first node.
+        self._cursor = (self._cursor + 1) % len(candidates)
+        rotated = candidates[self._cursor:] + candidates[: self._cursor]
+        return min(rotated, key=lambda node: node.outstanding)
+
+    async def _send(self, node: PistonNode, method: str, path: str, payload: Optional[Dict]) -> httpx.Response:
+        node.outstanding += 1
+        node._publish()
+        started = time.monotonic()
+        ok = False
+        try:
+            async with self._session(node) as client:
+                resp = await client.request(method, path, json=payload)
+            ok = resp.status_code < 500
+            return resp
+        finally:
+            node.outstanding -= 1
+            node.record(time.monotonic() - started, ok)
+            node._publish()
+
+    async def request_json(self, method: str, path: str, payload: Optional[Dict] = None, weight: int = 1):
+        # ``weight`` is how many runs the request carries (a batch judges many
+        # cases), so latency is compared per run against the adaptive target.
+        circuit_breaker.before_call()
+        started = time.monotonic()
+        try:
+            resp = await self._request(method, path, payload)
+        except asyncio.CancelledError:
+            circuit_breaker.abandon()
+            raise
+        except Exception:
+            self._observe(started, weight, ok=False)
+            raise
+        self._observe(started, weight, ok=resp.status_code < 500)
+        try:
+            resp.raise_for_status()
+        except httpx.HTTPStatusError as exc:
+            raise RuntimeError(f"Piston {path} error: {resp.status_code} {resp.text}") from exc
+        return resp.json()
+
+    @staticmethod
+    def _observe(started: float, weight: int, ok: bool) -> None:
+        circuit_breaker.record(ok)
+        adaptive_limit.record(started, (time.monotonic() - started) / max(1, weight), ok)
+
+    async def _request(self, method: str, path: str, payload: Optional[Dict]) -> httpx.Response:
+        tried: Tuple[PistonNode, ...] = ()
+        while True:
+            node = self._pick(tried)
+            tried += (node,)
+            last_try = len(tried) >= len(self.nodes)
+            try:
+                resp = await self._send(node, method, path, payload)
+            except _RETRYABLE_ERRORS:
+                if last_try:
+                    raise
+                continue
+            if resp.status_code in _RETRYABLE_STATUS and not last_try:
+                continue
+            return resp
+
+    async def check(self, node: PistonNode) -> bool:
+        started = time.monotonic()
+        try:
+            async with self._session(node) as client:
+                resp = await client.get("/runtimes", timeout=settings.PISTON_HEALTH_TIMEOUT_SECONDS)
+            resp.raise_for_status()
+        except Exception as exc:
+            node.health_latency = None
+            node.eject(f"health check failed: {exc!r}")
+            return False
+        node.health_latency = time.monotonic() - started
+        if node.health_latency > settings.PISTON_HEALTH_SLOW_SECONDS:
+            node.eject(f"health check took {node.health_latency:.2f}s")
+            return False
+        node.admit()
+        return True
 
-def _normalize_base_url() -> str:
-    return settings.PISTON_URL.rstrip("/")
+    async def check_all(self) -> List[bool]:
+        return list(await asyncio.gather(*(self.check(node) for node in self.nodes)))
 
+    async def _health_loop(self) -> None:
+        while True:
+            await self.check_all()
+            await asyncio.sleep(settings.PISTON_HEALTH_INTERVAL_SECONDS)
 
-def _fetch_runtimes() -> List[Dict]:
-    url = f"{_normalize_base_url()}/runtimes"
-    resp = requests.get(url, timeout=settings.PISTON_TIMEOUT_SECONDS)
-    try:
-        resp.raise_for_status()
-    except requests.HTTPError as exc:
-        raise RuntimeError(f"Piston /runtimes error: {resp.status_code} {resp.text}") from exc
-    return resp.json()
+    def snapshot(self) -> List[Dict]:
+        return [node.snapshot() for node in self.nodes]
 
 
-def _normalize(value: Optional[str]) -> str:
-    return (value or "").strip().lower()
+piston_client = PistonClient()
 
 
-def _pick_runtime(runtimes: List[Dict], language: str) -> Optional[Tuple[str, str]]:
-    lang = _normalize(language)
-    candidates = [
-        rt
-        for rt in runtimes
-        if _normalize(rt.get("language")) == lang
-        or lang in {_normalize(a) for a in (rt.get("aliases") or [])}
-    ]
-    if not candidates:
-        return None
-    # choose the highest version (lexicographic is ok for piston versions)
-    candidates.sort(key=lambda rt: rt.get("version", ""), reverse=True)
-    best = candidates[0]
-    return best.get("language"), best.get("version")
+async def _fetch_runtimes() -> List[Dict]:
+    return await piston_client.request_json("GET", "/runtimes")
+
+
+def _normalize(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
 
 
 def _runtime_key(language: str, version: str) -> str:
     return f"{language}:{version}"
 
 
-def get_runtime(language: str) -> Tuple[str, str]:
-    global _RUNTIME_CACHE_TS
-    now = time.time()
-    requested_lang = _normalize(language)
-    if _RUNTIME_CACHE and (now - _RUNTIME_CACHE_TS) < _RUNTIME_CACHE_TTL_SECONDS:
-        version = _RUNTIME_CACHE.get(requested_lang)
-        if version:
-            return requested_lang, version
-
-    runtimes = _fetch_runtimes()
-    _RUNTIME_CACHE.clear()
-    for rt in runtimes:
-        runtime_lang = _normalize(rt.get("language"))
-        version = rt.get("version")
-        if runtime_lang and version and runtime_lang not in _RUNTIME_CACHE:
-            _RUNTIME_CACHE[runtime_lang] = version
-        for alias in rt.get("aliases") or []:
-            alias_norm = _normalize(alias)
-            if alias_norm and version and alias_norm not in _RUNTIME_CACHE:
-                _RUNTIME_CACHE[alias_norm] = version
-    _RUNTIME_CACHE_TS = now
-
-    # Try exact/alias match first, then known synonyms for our UI languages
-    picked = _pick_runtime(runtimes, requested_lang)
-    if not picked:
-        synonyms = {
-            "javascript": ["javascript", "js", "node", "nodejs"],
-            "python": ["python", "py"],
-            "java": ["java"],
-            "cpp": ["cpp", "c++", "cxx"],
-        }
-        for alt in synonyms.get(requested_lang, []):
-            picked = _pick_runtime(runtimes, alt)
-            if picked:
+def _build_runtime_map(runtimes: List[Dict]) -> Dict[str, Tuple[str, str]]:
+    mapping: Dict[str, Tuple[str, str]] = {}
+    # highest version wins (lexicographic is ok for piston versions)
+    for rt in sorted(runtimes, key=lambda rt: rt.get("version") or "", reverse=True):
+        language, version = rt.get("language"), rt.get("version")
+        if not language or not version:
+            continue
+        for name in [language, *(rt.get("aliases") or [])]:
+            mapping.setdefault(_normalize(name), (language, version))
+    for name, alternatives in _RUNTIME_SYNONYMS.items():
+        if name in mapping:
+            continue
+        for alt in alternatives:
+            if alt in mapping:
+                mapping[name] = mapping[alt]
                 break
-    if not picked:
-        raise ValueError(f"Unsupported language: {language}")
-    return picked
+    return mapping
+
+
+class RuntimeRegistry:
+    """Piston's runtime catalog resolved into one name -> (language, version) map.
+
+    Prewarmed and refreshed ahead of expiry by a background loop tied to the
+    application lifespan. Concurrent refreshes share one in-flight fetch, and a
+    failed refresh keeps serving the last good catalog.
+    """
+
+    def __init__(self) -> None:
+        self._runtimes: Dict[str, Tuple[str, str]] = {}
+        self._loaded_at = 0.0
+        self._attempted_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def reset(self) -> None:
+        self._runtimes = {}
+        self._loaded_at = 0.0
+        self._attempted_at = 0.0
+        self._inflight = None
+
+    def _age(self) -> float:
+        return time.monotonic() - self._loaded_at
+
+    async def resolve(self, language: str) -> Tuple[str, str]:
+        requested_lang = _normalize(language)
+        if not self._runtimes:
+            await self.refresh()
+        elif self._age() >= settings.PISTON_RUNTIMES_TTL_SECONDS and self._retry_due():
+            # Nobody refreshed ahead of expiry (no lifespan loop); serve stale meanwhile.
+            self._refresh_in_background()
+
+        picked = self._runtimes.get(requested_lang)
+        if picked is None and self._retry_due():
+            # A runtime installed since the last refresh should not wait a full TTL.
+            await self._refresh_quietly()
+            picked = self._runtimes.get(requested_lang)
+        if picked is None:
+            raise ValueError(f"Unsupported language: {language}")
+        return picked
+
+    def _retry_due(self) -> bool:
+        return time.monotonic() - self._attempted_at >= settings.PISTON_RUNTIMES_RETRY_SECONDS
+
+    async def refresh(self) -> None:
+        task = self._inflight
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._inflight = asyncio.ensure_future(self._load())
+        await asyncio.shield(task)
+
+    async def _load(self) -> None:
+        self._attempted_at = time.monotonic()
+        mapping = _build_runtime_map(await _fetch_runtimes())
+        if not mapping:
+            raise RuntimeError("Piston /runtimes returned no runtimes")
+        self._runtimes = mapping
+        self._loaded_at = time.monotonic()
+
+    async def _refresh_quietly(self) -> bool:
+        try:
+            await self.refresh()
+            return True
+        except Exception as exc:
+            if not self._runtimes:
+                raise
+            logger.warning("Piston runtime refresh failed, serving stale catalog: %s", exc)
+            return False
+
+    def _refresh_in_background(self) -> None:
+        task = asyncio.ensure_future(self._refresh_quietly())
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _run(self) -> None:
+        refresh_after = settings.PISTON_RUNTIMES_TTL_SECONDS * 0.9
+        while True:
+            try:
+                ok = await self._refresh_quietly()
+            except Exception as exc:
+                logger.warning("Piston runtime prewarm failed: %s", exc)
+                ok = False
+            await asyncio.sleep(refresh_after if ok else settings.PISTON_RUNTIMES_RETRY_SECONDS)
+
+    async def start(self) -> None:
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.ensure_future(self._run())
 
+    async def close(self) -> None:
+        task, self._loop_task = self._loop_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
 
-def _normalize_output(text: Optional[str]) -> str:
-    if text is None:
-        return ""
-    normalized = text.replace("\r\n", "\n").replace("\r", "\n")
-    lines = [line.rstrip() for line in normalized.split("\n")]
-    return "\n".join(lines).strip()
+
+runtime_registry = RuntimeRegistry()
+
+
+async def get_runtime(language: str) -> Tuple[str, str]:
+    return await runtime_registry.resolve(language)
+
+
+_ALGO_READ_CALL_RE = re.compile(r"\blire\s*\(", flags=re.IGNORECASE)
+
+
+@lru_cache(maxsize=64)
+def _algo_read_calls(source_code: str) -> int:
+    # Every case of a submission shares the source, so scan it once.
+    return len(_ALGO_READ_CALL_RE.findall(source_code))
 
 
 def _prepare_algo_stdin(source_code: str, stdin: str) -> str:
@@ -107,14 +448,15 @@ def _prepare_algo_stdin(source_code: str, stdin: str) -> str:
     if "\n" in raw_stdin or "\r" in raw_stdin:
         return raw_stdin
 
-    read_calls = len(re.findall(r"\blire\s*\(", source_code, flags=re.IGNORECASE))
+    read_calls = _algo_read_calls(source_code)
     if read_calls > 1 and re.search(r"\s+", raw_stdin):
         return re.sub(r"\s+", "\n", raw_stdin.strip()) + "\n"
 
     return raw_stdin
 
 
-def _execute_algo_compiler(source_code: str, stdin: str) -> Dict:
+async def _execute_algo_compiler(source_code: str, stdin: str, timeout: Optional[float] = None) -> Dict:
+    timeout = timeout or settings.PISTON_TIMEOUT_SECONDS
     jar_path = Path(settings.ALGO_COMPILER_JAR)
     if not jar_path.exists():
         raise RuntimeError(f"Algo compiler jar not found: {jar_path}")
@@ -124,32 +466,47 @@ def _execute_algo_compiler(source_code: str, stdin: str) -> Dict:
         temp_path = Path(temp_file.name)
 
     try:
-        completed = subprocess.run(
-            [settings.JAVA_BIN, "-jar", str(jar_path), str(temp_path)],
-            input=_prepare_algo_stdin(source_code, stdin),
-            text=True,
-            capture_output=True,
-            timeout=settings.PISTON_TIMEOUT_SECONDS,
-        )
-        return {
-            "run": {
-                "stdout": completed.stdout,
-                "stderr": completed.stderr,
-                "code": completed.returncode,
-                "signal": None,
+        stdin_bytes = _prepare_algo_stdin(source_code, stdin).encode("utf-8")
+        if algo_worker_pool.running:
+            return await algo_worker_pool.run(str(temp_path), stdin_bytes, timeout)
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                settings.JAVA_BIN,
+                "-jar",
+                str(jar_path),
+                str(temp_path),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except FileNotFoundError as exc:
+            raise RuntimeError(f"Java runtime not found: {settings.JAVA_BIN}") from exc
+
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(stdin_bytes),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            stdout, stderr = await process.communicate()
+            return {
+                "run": {
+                    "stdout": stdout.decode("utf-8", errors="replace"),
+                    "stderr": stderr.decode("utf-8", errors="replace") + "\nExecution timed out",
+                    "code": 124,
+                    "signal": "timeout",
+                }
             }
-        }
-    except subprocess.TimeoutExpired as exc:
         return {
             "run": {
-                "stdout": exc.stdout or "",
-                "stderr": (exc.stderr or "") + "\nExecution timed out",
-                "code": 124,
-                "signal": "timeout",
+                "stdout": stdout.decode("utf-8", errors="replace"),
+                "stderr": stderr.decode("utf-8", errors="replace"),
+                "code": process.returncode,
+                "signal": None,
             }
         }
-    except FileNotFoundError as exc:
-        raise RuntimeError(f"Java runtime not found: {settings.JAVA_BIN}") from exc
     finally:
         try:
             os.unlink(temp_path)
@@ -157,80 +514,377 @@ def _execute_algo_compiler(source_code: str, stdin: str) -> Dict:
             pass
 
 
-def execute_piston(
+class PistonBackend(ExecutionBackend):
+    name = "piston"
+    supports_batch = True
+
+    def supports(self, language: str) -> bool:
+        return _normalize(language) != "algo"
+
+    async def runtime_version(self, language: str) -> str:
+        runtime_lang, version = await get_runtime(language)
+        return f"{runtime_lang}-{version}"
+
+    async def execute(
+        self,
+        language: str,
+        source_code: str,
+        stdin: str,
+        limits: Optional[RunLimits] = None,
+    ) -> Dict:
+        lang, version = await get_runtime(language)
+        payload = {
+            "language": lang,
+            "version": version,
+            "files": [{"content": source_code}],
+            "stdin": stdin,
+        }
+        if limits is not None:
+            payload.update(_piston_run_limits(limits))
+        return await piston_client.request_json("POST", "/execute", payload)
+
+    async def execute_batch(
+        self,
+        language: str,
+        source_code: str,
+        inputs: List[str],
+        stop_on_error: bool = False,
+        limits: Optional[RunLimits] = None,
+    ) -> List[Optional[Dict]]:
+        return await execute_piston_batch(language, source_code, inputs, stop_on_error, limits)
+
+
+class AlgoBackend(ExecutionBackend):
+    name = "algo"
+
+    def supports(self, language: str) -> bool:
+        return _normalize(language) == "algo"
+
+    async def runtime_version(self, language: str) -> str:
+        return Path(settings.ALGO_COMPILER_JAR).name
+
+    async def execute(
+        self,
+        language: str,
+        source_code: str,
+        stdin: str,
+        limits: Optional[RunLimits] = None,
+    ) -> Dict:
+        started = time.monotonic()
+        timeout = limits.time_ms / 1000 if limits is not None else None
+        result = await _execute_algo_compiler(source_code=source_code, stdin=stdin, timeout=timeout)
+        run = result.get("run")
+        if run is not None and run.get("wall_time") is None:
+            # Includes interpreter start-up; the JVM exposes nothing finer.
+            run["wall_time"] = round((time.monotonic() - started) * 1000)
+        return result
+
+
+piston_backend = PistonBackend()
+algo_backend = AlgoBackend()
+local_backend = LocalSandboxBackend()
+
+
+def resolve_backend(language: str, prefer_local: bool = False) -> ExecutionBackend:
+    if algo_backend.supports(language):
+        return algo_backend
+    if (prefer_local or settings.EXECUTION_BACKEND == "local") and local_backend.supports(language):
+        return local_backend
+    return piston_backend
+
+
+async def runtime_version(language: str, backend: Optional[ExecutionBackend] = None) -> str:
+    return await (backend or resolve_backend(language)).runtime_version(language)
+
+
+async def execute_piston(
     language: str,
     source_code: str,
     stdin: str,
+    limits: Optional[RunLimits] = None,
 ) -> Dict:
-    if _normalize(language) == "algo":
-        return _execute_algo_compiler(source_code=source_code, stdin=stdin)
+    return await resolve_backend(language).execute(language, source_code, stdin, limits=limits)
+
+
+def _piston_run_limits(limits: RunLimits) -> Dict[str, int]:
+    # Piston rejects limits above its own configured maximums, so clamp to them.
+    run_limits = {"run_timeout": min(limits.time_ms, settings.PISTON_RUN_TIMEOUT_MAX_MS)}
+    memory_mb = limits.memory_mb
+    if settings.PISTON_RUN_MEMORY_MAX_MB > 0:
+        memory_mb = min(memory_mb, settings.PISTON_RUN_MEMORY_MAX_MB)
+    run_limits["run_memory_limit"] = memory_mb * 1024 * 1024
+    return run_limits
+
 
-    lang, version = get_runtime(language)
+async def execute_piston_batch(
+    language: str,
+    source_code: str,
+    inputs: List[str],
+    stop_on_error: bool = False,
+    limits: Optional[RunLimits] = None,
+) -> List[Optional[Dict]]:
+    lang, version = await get_runtime(language)
+    batch = build_batch_request(lang, source_code)
+    if batch is None:
+        return [None] * len(inputs)
+
+    nonce = new_batch_nonce()
     payload = {
         "language": lang,
         "version": version,
-        "files": [{"content": source_code}],
-        "stdin": stdin,
+        "files": batch["files"],
+        "args": batch["args"],
+        "stdin": encode_batch_stdin(
+            inputs,
+            limits.time_ms if limits is not None else settings.PISTON_BATCH_CASE_TIMEOUT_MS,
+            stop_on_error,
+            nonce,
+        ),
+    }
+    if limits is not None:
+        # Each case is forked from the harness and inherits the memory rlimit.
+        payload["run_memory_limit"] = _piston_run_limits(limits)["run_memory_limit"]
+    if settings.PISTON_BATCH_RUN_TIMEOUT_MS > 0:
+        payload["run_timeout"] = settings.PISTON_BATCH_RUN_TIMEOUT_MS
+    result = await piston_client.request_json("POST", "/execute", payload, weight=len(inputs))
+
+    compile_stage = result.get("compile")
+    if compile_stage and compile_stage.get("code") not in (None, 0):
+        # The submission itself failed to compile; every case sees the same result.
+        return [result] * len(inputs)
+
+    runs = parse_batch_output((result.get("run") or {}).get("stdout"), len(inputs), nonce)
+    return [{"compile": compile_stage, "run": run} if run is not None else None for run in runs]
+
+
+_LIMIT_STATUS = {"TLE": "Time Limit Exceeded", "MLE": "Memory Limit Exceeded"}
+
+
+def _limit_exceeded(run: Dict, limits: Optional[RunLimits]) -> Optional[str]:
+    if limits is None:
+        return None
+    signal = run.get("signal")
+    failed = bool(signal) or run.get("code") != 0
+    if run.get("status") == "TO" or signal == "timeout":
+        return "TLE"
+    cpu_time = run.get("cpu_time")
+    wall_time = run.get("wall_time")
+    if cpu_time is not None and cpu_time > limits.time_ms:
+        return "TLE"
+    # Killed by the CPU rlimit, or for sleeping or blocking past the wall-clock limit.
+    if signal and max(cpu_time or 0, wall_time or 0) >= limits.time_ms:
+        return "TLE"
+    memory = run.get("memory")
+    if memory is not None:
+        # Hitting the rlimit shows up as a crash just short of the cap.
+        if memory > limits.memory_bytes or (failed and memory >= limits.memory_bytes * 0.9):
+            return "MLE"
+    return None
+
+
+def _build_case_result(
+    tc: Dict,
+    result: Dict,
+    expected: Optional[str] = None,
+    limits: Optional[RunLimits] = None,
+) -> Dict:
+    run = result.get("run", {}) or {}
+    stdout = run.get("stdout")
+    stderr = run.get("stderr")
+    status_code = run.get("code")
+    signal = run.get("signal")
+    limit = _limit_exceeded(run, limits)
+
+    mismatch = None
+    if status_code == 0 and limit is None:
+        if expected is None:
+            expected = tc.get("output_text")
+        mismatch = compare_output(expected, stdout, tc.get("checker"), tc.get("checker_tolerance"))
+    passed = status_code == 0 and limit is None and mismatch is None
+
+    status_desc = "OK" if status_code == 0 else "Runtime Error"
+    if signal:
+        status_desc = f"Signal {signal}"
+    if limit is not None:
+        status_desc = _LIMIT_STATUS[limit]
+
+    memory = run.get("memory")
+    return {
+        "id": tc.get("id"),
+        "input_text": tc.get("input_text"),
+        "output_text": tc.get("output_text"),
+        "is_sample": tc.get("is_sample", True),
+        "stdout": stdout,
+        "stderr": stderr,
+        "compile_output": None,
+        "status_id": status_code,
+        "status": status_desc,
+        "time": _format_seconds(run.get("wall_time")),
+        "cpu_time": _format_seconds(run.get("cpu_time")),
+        "memory": None if memory is None else int(memory) // 1024,
+        "mismatch": mismatch,
+        "limit": limit,
+        "passed": passed,
+    }
+
+
+def _format_seconds(milliseconds: Optional[float]) -> Optional[str]:
+    # Reported like Judge0: seconds as a string with millisecond precision.
+    if milliseconds is None:
+        return None
+    return f"{milliseconds / 1000:.3f}"
+
+
+def _skipped_case_result(tc: Dict) -> Dict:
+    return {
+        "id": tc.get("id"),
+        "input_text": tc.get("input_text"),
+        "output_text": tc.get("output_text"),
+        "is_sample": tc.get("is_sample", True),
+        "stdout": None,
+        "stderr": None,
+        "compile_output": None,
+        "status_id": None,
+        "status": "Skipped",
+        "time": None,
+        "memory": None,
+        "passed": False,
+        "skipped": True,
     }
-    url = f"{_normalize_base_url()}/execute"
-    resp = requests.post(url, json=payload, timeout=settings.PISTON_TIMEOUT_SECONDS)
-    try:
-        resp.raise_for_status()
-    except requests.HTTPError as exc:
-        raise RuntimeError(f"Piston /execute error: {resp.status_code} {resp.text}") from exc
-    return resp.json()
 
 
-def execute_test_cases(
+async def execute_test_cases(
     language: str,
     source_code: str,
     test_cases: List[Dict],
+    owner: str = "anonymous",
+    fail_fast: bool = False,
+    backend: Optional[ExecutionBackend] = None,
+    on_case: Optional[Callable[[int, Dict], None]] = None,
+    limits: Optional[RunLimits] = None,
+    lane: str = DEFAULT_LANE,
 ) -> List[Dict]:
+    # With fail_fast, the first non-passing case (in test order) cancels every
+    # later case that is still queued or running; those come back as skipped.
+    # ``on_case(index, result)`` is called once a case's result is final: as
+    # it completes, or in test order with fail_fast since a later case only
+    # counts once every earlier one has passed. Skipped cases are not reported.
     if not test_cases:
         return []
 
-    def _run_test_case(tc: Dict) -> Dict:
-        result = execute_piston(
-            language=language,
-            source_code=source_code,
-            stdin=tc["input_text"],
+    chosen = backend or resolve_backend(language)
+    if chosen is local_backend and not local_backend.accepts(owner, lane):
+        chosen = backend = piston_backend
+
+    def _local_fallback() -> bool:
+        return (
+            settings.EXECUTION_LOCAL_FALLBACK
+            and local_backend.supports(language)
+            and local_backend.accepts(owner, lane)
         )
 
-        run = result.get("run", {}) or {}
-        stdout = run.get("stdout")
-        stderr = run.get("stderr")
-        status_code = run.get("code")
-        signal = run.get("signal")
+    # The scheduler guards remote sandbox capacity; local runs have their own limit.
+    gate = (lambda: nullcontext()) if chosen is local_backend else (lambda: execution_scheduler.slot(owner, lane))
 
-        normalized_expected = _normalize_output(tc.get("output_text"))
-        normalized_actual = _normalize_output(stdout)
-        passed = status_code == 0 and normalized_actual == normalized_expected
+    cases: List[Optional[Dict]] = [None] * len(test_cases)
+    # Blob-backed cases are read one at a time as they run, never all together.
+    has_blobs = any(tc.get("input_blob") or tc.get("output_blob") for tc in test_cases)
+    if settings.PISTON_BATCH_ENABLED and len(test_cases) > 1 and chosen.supports_batch and not has_blobs:
+        try:
+            async with gate():
+                batch = await chosen.execute_batch(
+                    language,
+                    source_code,
+                    [tc["input_text"] for tc in test_cases],
+                    stop_on_error=fail_fast,
+                    limits=limits,
+                )
+            cases = [
+                _build_case_result(tc, result, limits=limits) if result is not None else None
+                for tc, result in zip(test_cases, batch)
+            ]
+        except (ExecutionQueueFull, SandboxUnavailable):
+            if not _local_fallback():
+                raise
+            # Same fallback as a single case: judge every case locally below.
+            backend, gate = local_backend, (lambda: nullcontext())
+        except Exception as exc:
+            logger.warning("Batched execution failed, judging case by case: %s", exc)
+
+    cutoff = len(test_cases)
+    if fail_fast:
+        cutoff = next(
+            (idx for idx, case in enumerate(cases) if case is not None and not case["passed"]),
+            cutoff,
+        )
 
-        status_desc = "OK" if status_code == 0 else "Runtime Error"
-        if signal:
-            status_desc = f"Signal {signal}"
+    reported = [False] * len(test_cases)
 
-        return {
-            "id": tc.get("id"),
-            "input_text": tc.get("input_text"),
-            "output_text": tc.get("output_text"),
-            "is_sample": tc.get("is_sample", True),
-            "stdout": stdout,
-            "stderr": stderr,
-            "compile_output": None,
-            "status_id": status_code,
-            "status": status_desc,
-            "time": None,
-            "memory": None,
-            "passed": passed,
-        }
+    def _report_final() -> None:
+        if on_case is None:
+            return
+        for idx, case in enumerate(cases):
+            if fail_fast and (case is None or idx > cutoff):
+                break
+            if case is not None and not reported[idx]:
+                reported[idx] = True
+                on_case(idx, case)
+
+    _report_final()
 
-    max_workers = max(1, min(settings.EXECUTION_MAX_WORKERS, len(test_cases)))
-    if max_workers == 1:
-        return [_run_test_case(tc) for tc in test_cases]
+    limiter = asyncio.Semaphore(max(1, settings.EXECUTION_MAX_WORKERS))
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        return list(executor.map(_run_test_case, test_cases))
+    async def _case_text(idx: int, field: str) -> str:
+        tc = test_cases[idx]
+        if tc.get(f"{field}_blob"):
+            return await asyncio.to_thread(load_case_text, tc, field)
+        return tc[f"{field}_text"]
+
+    async def _execute_case(idx: int) -> Dict:
+        stdin = await _case_text(idx, "input")
+        if backend is not None:
+            return await backend.execute(language, source_code, stdin, limits=limits)
+        return await execute_piston(language=language, source_code=source_code, stdin=stdin, limits=limits)
+
+    async def _run_test_case(idx: int) -> Dict:
+        try:
+            async with limiter, gate():
+                result = await _execute_case(idx)
+        except (ExecutionQueueFull, SandboxUnavailable):
+            if not _local_fallback():
+                raise
+            result = await local_backend.execute(language, source_code, await _case_text(idx, "input"), limits=limits)
+        return _build_case_result(test_cases[idx], result, await _case_text(idx, "output"), limits)
+
+    tasks = {
+        asyncio.ensure_future(_run_test_case(idx)): idx
+        for idx in range(min(cutoff + 1, len(test_cases)))
+        if cases[idx] is None
+    }
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                idx = tasks.pop(task)
+                if task.cancelled():
+                    continue
+                cases[idx] = task.result()
+                if fail_fast and idx < cutoff and not cases[idx]["passed"]:
+                    cutoff = idx
+                    for pending, pending_idx in tasks.items():
+                        if pending_idx > cutoff:
+                            pending.cancel()
+            _report_final()
+    except BaseException:
+        # Give queued slots back instead of judging cases nobody will read.
+        for task in tasks:
+            task.cancel()
+        raise
+
+    return [
+        case if idx <= cutoff and case is not None else _skipped_case_result(tc)
+        for idx, (tc, case) in enumerate(zip(test_cases, cases))
+    ]
 
 
 def summarize_results(results: List[Dict]) -> Dict[str, object]:
@@ -239,6 +893,11 @@ def summarize_results(results: List[Dict]) -> Dict[str, object]:
 
     verdict = "AC"
     for r in results:
+        if r.get("skipped"):
+            continue
+        if r.get("limit"):
+            verdict = r["limit"]
+            break
         status_id = r.get("status_id")
         if status_id is None:
             verdict = "IE"
@@ -252,3 +911,28 @@ def summarize_results(results: List[Dict]) -> Dict[str, object]:
         verdict = "NA"
 
     return {"passed": passed, "total": total, "verdict": verdict}
+
+
+def summarize_usage(results: List[Dict]) -> Dict[str, Optional[int]]:
+    """Worst-case runtime (CPU time, else wall time) and peak memory in KB."""
+    runtime_ms: Optional[int] = None
+    memory_kb: Optional[int] = None
+    for r in results:
+        if r.get("skipped"):
+            continue
+        seconds = r.get("cpu_time") or r.get("time")
+        if seconds is not None:
+            runtime_ms = max(runtime_ms or 0, round(float(seconds) * 1000))
+        if r.get("memory") is not None:
+            memory_kb = max(memory_kb or 0, int(r["memory"]))
+    return {"runtime_ms": runtime_ms, "memory_kb": memory_kb}
+
+
+def total_cpu_seconds(results: List[Dict]) -> float:
+    """Sandbox CPU time the judged cases consumed, falling back to wall time."""
+    total = 0.0
+    for r in results:
+        seconds = r.get("cpu_time") or r.get("time")
+        if not r.get("skipped") and seconds is not None:
+            total += float(seconds)
+    return total
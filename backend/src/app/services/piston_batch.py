@@ -0,0 +1,127 @@
+import base64
+import binascii
+import re
+import secrets
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BATCH_MAGIC = "CMBATCH1"
+_RECORD_PREFIX = "@@CMCASE "
+_HARNESS_DIR = Path(__file__).resolve().parent / "harnesses"
+
+_JAVA_PUBLIC_CLASS_RE = re.compile(r"\bpublic\s+(?:(?:final|abstract)\s+)*class\s+([A-Za-z_$][\w$]*)")
+_JAVA_CLASS_RE = re.compile(r"\bclass\s+([A-Za-z_$][\w$]*)")
+
+
+@lru_cache(maxsize=None)
+def _harness_source(name: str) -> str:
+    return (_HARNESS_DIR / name).read_text(encoding="utf-8")
+
+
+def _java_main_class(source_code: str) -> str:
+    match = _JAVA_PUBLIC_CLASS_RE.search(source_code) or _JAVA_CLASS_RE.search(source_code)
+    return match.group(1) if match else "Main"
+
+
+def build_batch_request(runtime_language: str, source_code: str) -> Optional[Dict]:
+    """Return the Piston files/args that run ``source_code`` through a batch harness.
+
+    ``None`` means the runtime has no harness and must be judged case by case.
+    """
+    lang = (runtime_language or "").strip().lower()
+    if lang in {"c", "c++"}:
+        return {
+            "files": [
+                {"name": "main", "content": source_code},
+                {"name": "cm_harness", "content": _harness_source("batch_harness.c")},
+            ],
+            "args": [],
+        }
+    if lang == "python":
+        return {
+            "files": [
+                {"name": "cm_harness.py", "content": _harness_source("batch_harness.py")},
+                {"name": "solution.py", "content": source_code},
+            ],
+            "args": ["solution.py"],
+        }
+    if lang == "java":
+        main_class = _java_main_class(source_code)
+        return {
+            "files": [
+                {"name": "BatchHarness", "content": _harness_source("BatchHarness.java")},
+                {"name": f"{main_class}.java", "content": source_code},
+            ],
+            "args": [f"{main_class}.java", main_class],
+        }
+    return None
+
+
+def new_batch_nonce() -> str:
+    """Per-run token the harness prefixes to its records.
+
+    Case records share stdout with anything the submission manages to write
+    there, so only lines carrying the token of this run are trusted.
+    """
+    return secrets.token_hex(16)
+
+
+def encode_batch_stdin(inputs: List[str], case_timeout_ms: int, stop_on_error: bool, nonce: str) -> str:
+    parts = [f"{BATCH_MAGIC} {len(inputs)} {int(case_timeout_ms)} {1 if stop_on_error else 0} {nonce}\n"]
+    for text in inputs:
+        text = text or ""
+        parts.append(f"{len(text.encode('utf-8'))}\n")
+        parts.append(text)
+    return "".join(parts)
+
+
+def _decode_stream(token: str) -> str:
+    if token == "-":
+        return ""
+    return base64.b64decode(token, validate=True).decode("utf-8", errors="replace")
+
+
+def parse_batch_output(stdout: Optional[str], count: int, nonce: str) -> List[Optional[Dict]]:
+    """Split harness stdout back into per-case ``run`` stages.
+
+    Only records tagged with this run's ``nonce`` count. Cases whose record is
+    missing or malformed (harness killed, output truncated by Piston) come
+    back as ``None`` so the caller can re-run them.
+    """
+    prefix = f"{_RECORD_PREFIX}{nonce} "
+    runs: List[Optional[Dict]] = [None] * count
+    for line in (stdout or "").split("\n"):
+        if not line.startswith(prefix):
+            continue
+        fields = line[len(prefix):].split(" ")
+        if len(fields) == 5:
+            fields += ["-", "-", "-"]
+        if len(fields) != 8:
+            continue
+        raw_idx, raw_code, raw_signal, raw_out, raw_err, raw_wall, raw_cpu, raw_rss = fields
+        try:
+            idx = int(raw_idx)
+            code = None if raw_code == "-" else int(raw_code)
+            stdout_text = _decode_stream(raw_out)
+            stderr_text = _decode_stream(raw_err)
+            wall_ms, cpu_ms, rss_kb = (_optional_int(raw) for raw in (raw_wall, raw_cpu, raw_rss))
+        except (ValueError, binascii.Error):
+            continue
+        if not 0 <= idx < count:
+            continue
+        runs[idx] = {
+            "stdout": stdout_text,
+            "stderr": stderr_text,
+            "output": stdout_text + stderr_text,
+            "code": code,
+            "signal": None if raw_signal == "-" else raw_signal,
+            "wall_time": wall_ms,
+            "cpu_time": cpu_ms,
+            "memory": None if rss_kb is None else rss_kb * 1024,
+        }
+    return runs
+
+
+def _optional_int(raw: str) -> Optional[int]:
+    return None if raw == "-" else int(raw)
@@ -1,15 +1,23 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import logging
 import math
 import threading
 import time
-from collections import defaultdict, deque
-from typing import Deque, Dict, Tuple
+from collections import OrderedDict
+from typing import Optional, Tuple
 
 from fastapi import HTTPException, Request, status
+from redis.asyncio.client import Redis
+from redis.exceptions import NoScriptError
 
-from app.services.auth import decode_access_token
+from app.services.auth import verify_access_token
 from config import settings
+from redis_db import redis_pool
+
+logger = logging.getLogger(__name__)
 
 _UNIT_SECONDS = {
     "second": 1,
@@ -35,64 +43,341 @@ def parse_limit(value: str) -> Tuple[int, int]:
     return amount, unit_seconds
 
 
-class InMemoryRateLimiter:
+class Charge:
+    """Outcome of charging ``cost`` units against one limit.
+
+    ``remaining`` is the budget left afterwards, in units. ``retry_after`` is
+    the number of seconds until the charge would fit. It is 0 when the charge
+    was allowed.
+    """
+
+    __slots__ = ("allowed", "remaining", "retry_after")
+
+    def __init__(self, allowed: bool, remaining: float, retry_after: float) -> None:
+        self.allowed = allowed
+        self.remaining = remaining
+        self.retry_after = retry_after
+
+
+class _Ring:
+    """Units charged to one key per sub-window ("bucket") of its window.
+
+    A fixed ring of ``slots`` counters: the current bucket and the
+    ``slots - 1`` before it, which together always cover the last full
+    window. ``at`` is the index of the newest bucket, counted from the
+    clock's epoch in ``width``-second steps, and ``total`` the ring's sum.
+    """
+
+    __slots__ = ("width", "at", "counts", "total")
+
+    def __init__(self, width: float, slots: int, at: int) -> None:
+        self.width = width
+        self.at = at
+        self.counts = [0] * slots
+        self.total = 0
+
+    def advance(self, at: int) -> None:
+        if at <= self.at:
+            return
+        slots = len(self.counts)
+        if at - self.at >= slots or not self.total:
+            self.counts = [0] * slots
+            self.total = 0
+        else:
+            for bucket in range(self.at + 1, at + 1):
+                self.total -= self.counts[bucket % slots]
+                self.counts[bucket % slots] = 0
+        self.at = at
+
+    def add(self, cost: float) -> None:
+        self.counts[self.at % len(self.counts)] += cost
+        self.total += cost
+
+    def retry_after(self, limit: float, cost: float, now: float) -> float:
+        # Oldest buckets leave the ring first; wait until enough have.
+        slots = len(self.counts)
+        total = self.total
+        freed = 0.0
+        for bucket in range(self.at - slots + 1, self.at + 1):
+            freed += self.counts[bucket % slots]
+            if total - freed + cost <= limit:
+                return (bucket + slots) * self.width - now
+        return (self.at + slots) * self.width - now
+
+    def idle(self, now: float) -> bool:
+        return now >= (self.at + len(self.counts)) * self.width
+
+
+class _Shard:
+    __slots__ = ("lock", "rings")
+
     def __init__(self) -> None:
-        self._events: Dict[str, Deque[float]] = defaultdict(deque)
-        self._lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.rings: "OrderedDict[str, _Ring]" = OrderedDict()
 
-    def hit(self, key: str, limit: int, window_seconds: int) -> float | None:
-        now = time.monotonic()
-        window_start = now - window_seconds
 
-        with self._lock:
-            bucket = self._events[key]
-            while bucket and bucket[0] <= window_start:
-                bucket.popleft()
+class InMemoryRateLimiter:
+    """Process-local sliding-window limiter with a fixed-size state per key.
+
+    The window is split into ``RATE_LIMIT_WINDOW_BUCKETS`` buckets, and a
+    charge fits if the buckets spanning the last window plus the current one
+    leave room for it. That never admits more than ``limit`` units in any
+    window, and a full burst stays available; a spent budget comes back up
+    to one bucket later than an exact log would allow. Keys are spread over
+    independently locked shards. Each hit moves its key to the back of its
+    shard and drops up to two keys from the front whose ring has emptied, so
+    eviction keeps pace with new keys. Past ``max_keys`` the least recently
+    hit key is dropped even if it is still limited.
+    """
+
+    def __init__(self, shards: Optional[int] = None, max_keys: Optional[int] = None) -> None:
+        count = max(1, shards or settings.RATE_LIMIT_MEMORY_SHARDS)
+        self._shards = tuple(_Shard() for _ in range(count))
+        self._shard_max_keys = max(1, (max_keys or settings.RATE_LIMIT_MEMORY_MAX_KEYS) // count)
 
-            if len(bucket) >= limit:
-                retry_after = (bucket[0] + window_seconds) - now
-                return max(0.0, retry_after)
+    def hit(self, key: str, limit: int, window_seconds: int) -> float | None:
+        result = self.charge(key, limit, window_seconds)
+        return None if result.allowed else result.retry_after
+
+    def charge(
+        self,
+        key: str,
+        limit: int,
+        window_seconds: float,
+        cost: float = 1.0,
+        force: bool = False,
+    ) -> Charge:
+        # ``force`` records the cost even past the limit (usage measured
+        # after the fact), leaving the key in debt until it leaves the window.
+        now = time.monotonic()
+        buckets = max(1, settings.RATE_LIMIT_WINDOW_BUCKETS)
+        width = window_seconds / buckets
+        at = int(now // width)
+        shard = self._shards[hash(key) % len(self._shards)]
+
+        with shard.lock:
+            rings = shard.rings
+            ring = rings.pop(key, None)
+            if ring is None or ring.width != width or len(ring.counts) != buckets + 1:
+                ring = _Ring(width, buckets + 1, at)
+            ring.advance(at)
+            allowed = force or ring.total + cost <= limit
+            retry_after = 0.0 if allowed else ring.retry_after(limit, cost, now)
+            if allowed:
+                ring.add(cost)
+            rings[key] = ring
+
+            for _ in range(2):
+                oldest, oldest_ring = next(iter(rings.items()))
+                if not oldest_ring.idle(now) and len(rings) <= self._shard_max_keys:
+                    break
+                del rings[oldest]
+
+        return Charge(allowed, max(0.0, limit - ring.total), retry_after)
+
+    def __len__(self) -> int:
+        return sum(len(shard.rings) for shard in self._shards)
 
-            bucket.append(now)
-            return None
+    def reset(self) -> None:
+        for shard in self._shards:
+            with shard.lock:
+                shard.rings.clear()
+
+
+# The in-process ring (see ``_Ring``) as a hash: fields "w" and "at" hold the
+# bucket width and newest bucket index, "0".."slots-1" the ring's counters. Buckets are
+# ``width`` ms wide and counted from the Redis clock's epoch, so a key costs
+# the same few fields however busy it is.
+# ARGV: width_ms, slots, limit, cost, force.
+# Returns {allowed, budget left, ms until the charge would fit}.
+_WINDOW_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local width = tonumber(ARGV[1])
+local slots = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local fields = {'w', 'at'}
+for i = 0, slots - 1 do
+    fields[i + 3] = tostring(i)
+end
+local state = redis.call('HMGET', KEYS[1], unpack(fields))
+local at = math.floor(now / width)
+local last = at
+local counts = {}
+for i = 0, slots - 1 do
+    counts[i] = 0
+end
+if tonumber(state[1]) == width and state[2] then
+    last = tonumber(state[2])
+    if at < last then
+        at = last
+    end
+    for i = 0, slots - 1 do
+        counts[i] = tonumber(state[i + 3]) or 0
+    end
+end
+if at - last >= slots then
+    for i = 0, slots - 1 do
+        counts[i] = 0
+    end
+else
+    for bucket = last + 1, at do
+        counts[bucket % slots] = 0
+    end
+end
+local total = 0
+for i = 0, slots - 1 do
+    total = total + counts[i]
+end
+if ARGV[5] == '1' or total + cost <= limit then
+    if cost > 0 then
+        counts[at % slots] = counts[at % slots] + cost
+        local values = {'w', width, 'at', at}
+        for i = 0, slots - 1 do
+            values[#values + 1] = tostring(i)
+            values[#values + 1] = counts[i]
+        end
+        redis.call('HSET', KEYS[1], unpack(values))
+        redis.call('PEXPIREAT', KEYS[1], (at + slots) * width)
+    end
+    return {1, tostring(limit - total - cost), '0'}
+end
+local freed = 0
+local retry = (at + slots) * width - now
+for bucket = at - slots + 1, at do
+    freed = freed + counts[bucket % slots]
+    if total - freed + cost <= limit then
+        retry = (bucket + slots) * width - now
+        break
+    end
+end
+return {0, tostring(limit - total), tostring(retry)}
+"""
+_WINDOW_SHA = hashlib.sha1(_WINDOW_SCRIPT.encode("utf-8")).hexdigest()
+
+
+class RedisRateLimiter:
+    """Rate limits shared by every worker process through Redis.
+
+    Each check is a single EVALSHA of ``_WINDOW_SCRIPT`` (falling back to
+    EVAL the first time a Redis node has not seen the script), timed by the
+    Redis clock so workers need not agree on the time. If Redis errors or
+    takes longer than ``RATE_LIMIT_REDIS_TIMEOUT_SECONDS``, checks fall back
+    to this process's in-memory limiter for ``RATE_LIMIT_REDIS_RETRY_SECONDS``.
+    """
+
+    def __init__(self, redis: Optional[Redis] = None, fallback: Optional[InMemoryRateLimiter] = None) -> None:
+        self._redis = redis
+        self._fallback = fallback or InMemoryRateLimiter()
+        self._retry_at = 0.0
+
+    def _client(self) -> Redis:
+        return self._redis if self._redis is not None else Redis(connection_pool=redis_pool)
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> float | None:
+        result = await self.charge(key, limit, window_seconds)
+        return None if result.allowed else result.retry_after
+
+    async def charge(
+        self,
+        key: str,
+        limit: int,
+        window_seconds: float,
+        cost: float = 1.0,
+        force: bool = False,
+    ) -> Charge:
+        if time.monotonic() < self._retry_at:
+            return self._fallback.charge(key, limit, window_seconds, cost, force)
+
+        buckets = max(1, settings.RATE_LIMIT_WINDOW_BUCKETS)
+        args = (
+            1,
+            settings.RATE_LIMIT_REDIS_PREFIX + key,
+            math.ceil(window_seconds * 1000 / buckets),
+            buckets + 1,
+            limit,
+            cost,
+            "1" if force else "0",
+        )
+        client = self._client()
+        try:
+            try:
+                reply = await asyncio.wait_for(
+                    client.evalsha(_WINDOW_SHA, *args), settings.RATE_LIMIT_REDIS_TIMEOUT_SECONDS
+                )
+            except NoScriptError:
+                reply = await asyncio.wait_for(
+                    client.eval(_WINDOW_SCRIPT, *args), settings.RATE_LIMIT_REDIS_TIMEOUT_SECONDS
+                )
+        except Exception as exc:
+            self._retry_at = time.monotonic() + settings.RATE_LIMIT_REDIS_RETRY_SECONDS
+            logger.warning("Rate limiter Redis unavailable, limiting per process: %s", exc)
+            return self._fallback.charge(key, limit, window_seconds, cost, force)
+
+        allowed, budget, retry_ms = reply
+        return Charge(bool(int(allowed)), max(0.0, float(budget)), float(retry_ms) / 1000)
 
     def reset(self) -> None:
-        with self._lock:
-            self._events.clear()
+        self._retry_at = 0.0
+        self._fallback.reset()
 
 
 _limiter = InMemoryRateLimiter()
+_redis_limiter = RedisRateLimiter(fallback=_limiter)
 
 
 def reset_rate_limiter() -> None:
     _limiter.reset()
+    _redis_limiter.reset()
 
 
-def _extract_identity(request: Request) -> str:
+async def charge(key: str, limit: int, window_seconds: float, cost: float = 1.0, force: bool = False) -> Charge:
+    """Charge ``key`` against the configured backend (see ``RATE_LIMIT_BACKEND``)."""
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return await _redis_limiter.charge(key, limit, window_seconds, cost, force)
+    return _limiter.charge(key, limit, window_seconds, cost, force)
+
+
+def _proxied_ip(request: Request) -> Optional[str]:
     forwarded_for = request.headers.get("x-forwarded-for", "")
     if forwarded_for:
         first_ip = forwarded_for.split(",")[0].strip()
         if first_ip:
-            return f"ip:{first_ip}"
+            return first_ip
 
     real_ip = request.headers.get("x-real-ip", "").strip()
-    if real_ip:
-        return f"ip:{real_ip}"
+    return real_ip or None
+
+
+def client_ip(request: Request) -> str:
+    return _proxied_ip(request) or (request.client.host if request.client else "unknown")
 
+
+def bearer_user_id(request: Request) -> Optional[str]:
     auth_header = request.headers.get("authorization", "")
     if auth_header.lower().startswith("bearer "):
         token = auth_header.split(" ", 1)[1].strip()
         if token:
             try:
-                payload = decode_access_token(token)
+                payload = verify_access_token(token, request).payload
                 user_id = payload.get("sub") if isinstance(payload, dict) else None
                 if user_id:
-                    return f"user:{user_id}"
+                    return str(user_id)
             except Exception:
                 pass
+    return None
+
+
+def extract_identity(request: Request) -> str:
+    proxied_ip = _proxied_ip(request)
+    if proxied_ip:
+        return f"ip:{proxied_ip}"
 
-    client_host = request.client.host if request.client else "unknown"
-    return f"ip:{client_host}"
+    user_id = bearer_user_id(request)
+    if user_id:
+        return f"user:{user_id}"
+    return f"ip:{client_ip(request)}"
 
 
 def rate_limit(limit_value: str, scope: str):
@@ -102,16 +387,16 @@ def rate_limit(limit_value: str, scope: str):
         if not settings.RATE_LIMIT_ENABLED:
             return
 
-        identity = _extract_identity(request)
+        identity = extract_identity(request)
         key = f"{scope}:{identity}"
-        retry_after = _limiter.hit(key=key, limit=max_requests, window_seconds=window_seconds)
-        if retry_after is None:
+        result = await charge(key, max_requests, window_seconds)
+        if result.allowed:
             return
 
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Rate limit exceeded",
-            headers={"Retry-After": str(math.ceil(retry_after))},
+            headers={"Retry-After": str(math.ceil(result.retry_after))},
         )
 
     return _dependency
@@ -124,16 +409,16 @@ def rate_limit_from_setting(setting_name: str, scope: str):
 
         limit_value = getattr(settings, setting_name)
         max_requests, window_seconds = parse_limit(limit_value)
-        identity = _extract_identity(request)
+        identity = extract_identity(request)
         key = f"{scope}:{identity}"
-        retry_after = _limiter.hit(key=key, limit=max_requests, window_seconds=window_seconds)
-        if retry_after is None:
+        result = await charge(key, max_requests, window_seconds)
+        if result.allowed:
             return
 
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Rate limit exceeded",
-            headers={"Retry-After": str(math.ceil(retry_after))},
+            headers={"Retry-After": str(math.ceil(result.retry_after))},
         )
 
     return _dependency
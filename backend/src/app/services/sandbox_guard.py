@@ -0,0 +1,162 @@
+import logging
+import time
+from typing import Dict, Optional
+
+from config import settings
+
+try:
+    from prometheus_client import Counter, Gauge
+except ImportError:  # optional in local environments without network install
+    Counter = Gauge = None
+
+logger = logging.getLogger(__name__)
+
+if Gauge is not None:
+    _LIMIT_GAUGE = Gauge("codemaster_execution_adaptive_limit", "Current adaptive sandbox concurrency limit")
+    _BREAKER_GAUGE = Gauge("codemaster_piston_breaker_state", "Piston circuit breaker (0 closed, 1 open, 2 half-open)")
+    _SHED_COUNTER = Counter("codemaster_piston_breaker_rejected_total", "Piston calls failed fast by the breaker")
+else:
+    _LIMIT_GAUGE = _BREAKER_GAUGE = _SHED_COUNTER = None
+
+
+class SandboxUnavailable(RuntimeError):
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit for sandbox calls.
+
+    Every fast, successful call grows the limit by roughly one per window of
+    in-flight calls; an error or a call slower than
+    ``EXECUTION_ADAPTIVE_LATENCY_TARGET_SECONDS`` multiplies it by
+    ``EXECUTION_ADAPTIVE_BACKOFF``. Calls that were already in flight when the
+    limit last dropped do not drop it again, so one slow burst costs one
+    backoff rather than one per call.
+    """
+
+    def __init__(self) -> None:
+        self._limit: Optional[float] = None
+        self._last_drop = 0.0
+        self._drops = 0
+
+    @property
+    def max_limit(self) -> int:
+        return max(1, settings.EXECUTION_MAX_IN_FLIGHT)
+
+    @property
+    def min_limit(self) -> int:
+        return max(1, min(settings.EXECUTION_ADAPTIVE_MIN_IN_FLIGHT, self.max_limit))
+
+    def _current(self) -> float:
+        if self._limit is None:
+            self._limit = float(self.max_limit)
+        return max(float(self.min_limit), min(float(self.max_limit), self._limit))
+
+    @property
+    def limit(self) -> int:
+        if not settings.EXECUTION_ADAPTIVE_ENABLED:
+            return self.max_limit
+        return int(self._current())
+
+    def record(self, started_at: float, seconds: float, ok: bool) -> None:
+        if not settings.EXECUTION_ADAPTIVE_ENABLED:
+            return
+        current = self._current()
+        if ok and seconds <= settings.EXECUTION_ADAPTIVE_LATENCY_TARGET_SECONDS:
+            self._limit = min(float(self.max_limit), current + 1.0 / current)
+        elif started_at >= self._last_drop:
+            self._limit = max(float(self.min_limit), current * settings.EXECUTION_ADAPTIVE_BACKOFF)
+            self._last_drop = time.monotonic()
+            self._drops += 1
+            logger.info("Sandbox concurrency limit lowered to %d", int(self._limit))
+        if _LIMIT_GAUGE is not None:
+            _LIMIT_GAUGE.set(int(self._limit))
+
+    def reset(self) -> None:
+        self._limit = None
+        self._last_drop = 0.0
+        self._drops = 0
+
+    def snapshot(self) -> Dict[str, float]:
+        return {"limit": self.limit, "drops": self._drops}
+
+
+class CircuitBreaker:
+    """Fails Piston calls fast while the sandbox is down.
+
+    Opens after ``PISTON_BREAKER_FAILURE_THRESHOLD`` failures in a row and
+    rejects calls for ``PISTON_BREAKER_OPEN_SECONDS``. After that it lets
+    ``PISTON_BREAKER_HALF_OPEN_PROBES`` calls through: one success closes it,
+    one failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+
+    def __init__(self) -> None:
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._rejected = 0
+
+    def before_call(self) -> None:
+        if not settings.PISTON_BREAKER_ENABLED:
+            return
+        if self.state == self.OPEN:
+            remaining = self._opened_at + settings.PISTON_BREAKER_OPEN_SECONDS - time.monotonic()
+            if remaining > 0:
+                self._reject(remaining)
+            self._set_state(self.HALF_OPEN)
+            self._probes = 0
+        if self.state == self.HALF_OPEN:
+            if self._probes >= max(1, settings.PISTON_BREAKER_HALF_OPEN_PROBES):
+                self._reject(1.0)
+            self._probes += 1
+
+    def record(self, ok: bool) -> None:
+        if not settings.PISTON_BREAKER_ENABLED:
+            return
+        if ok:
+            self._failures = 0
+            if self.state != self.CLOSED:
+                logger.info("Piston circuit breaker closed")
+                self._set_state(self.CLOSED)
+            return
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= settings.PISTON_BREAKER_FAILURE_THRESHOLD:
+            if self.state != self.OPEN:
+                logger.warning("Piston circuit breaker opened after %d failures", self._failures)
+            self._opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def abandon(self) -> None:
+        # A cancelled probe proved nothing; let the next call probe instead.
+        if self.state == self.HALF_OPEN and self._probes:
+            self._probes -= 1
+
+    def _reject(self, retry_after: float) -> None:
+        self._rejected += 1
+        if _SHED_COUNTER is not None:
+            _SHED_COUNTER.inc()
+        raise SandboxUnavailable("Execution service is recovering, try again shortly", retry_after)
+
+    def _set_state(self, state: int) -> None:
+        self.state = state
+        if _BREAKER_GAUGE is not None:
+            _BREAKER_GAUGE.set(state)
+
+    def reset(self) -> None:
+        self._set_state(self.CLOSED)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._rejected = 0
+
+    def snapshot(self) -> Dict[str, float]:
+        return {"state": self.state, "consecutive_failures": self._failures, "rejected": self._rejected}
+
+
+adaptive_limit = AdaptiveLimit()
+circuit_breaker = CircuitBreaker()
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from redis.asyncio.client import Redis
+
+from config import settings
+from redis_db import redis_pool
+
+logger = logging.getLogger(__name__)
+
+_LOCK_PREFIX = "judge-flight:v1:lock:"
+_RESULT_PREFIX = "judge-flight:v1:result:"
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+Results = List[Dict]
+
+
+class SingleFlight:
+    """Collapses concurrent judge calls for the same ``verdict_cache_key``.
+
+    The first caller for a key runs the job; anyone arriving while it is
+    still running awaits the same task and gets the same results (or the
+    same exception). The job is shielded, so a follower disconnecting does
+    not cancel it for the others.
+
+    With ``SINGLE_FLIGHT_REDIS_ENABLED`` the leader also takes a Redis lock
+    and publishes its results under the key when done, so callers in other
+    processes wait for those instead of executing again. A follower that
+    sees the lock vanish without results, or waits longer than
+    ``SINGLE_FLIGHT_WAIT_SECONDS``, runs the job itself.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._redis_retry_at = 0.0
+        self.leaders = 0
+        self.followers = 0
+        self.remote_followers = 0
+
+    async def run(self, key: str, job: Callable[[], Awaitable[Results]]) -> Results:
+        loop = asyncio.get_running_loop()
+        task = self._tasks.get(key)
+        if task is not None and not task.done() and task.get_loop() is loop:
+            self.followers += 1
+            return await asyncio.shield(task)
+
+        self.leaders += 1
+        task = loop.create_task(self._lead(key, job))
+        self._tasks[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Nobody may be awaiting it any more; don't log "exception never retrieved".
+            task.exception()
+
+    async def _lead(self, key: str, job: Callable[[], Awaitable[Results]]) -> Results:
+        token = await self._redis_lock(key)
+        if token is None:
+            results = await self._redis_wait(key)
+            if results is not None:
+                self.remote_followers += 1
+                return results
+            return await job()
+        try:
+            results = await job()
+        except BaseException:
+            if token:
+                await self._redis_release(key, token)
+            raise
+        if token:
+            await self._redis_publish(key, token, results)
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._tasks),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "remote_followers": self.remote_followers,
+        }
+
+    def clear(self) -> None:
+        self._tasks.clear()
+        self._redis_retry_at = 0.0
+        self.leaders = 0
+        self.followers = 0
+        self.remote_followers = 0
+
+    def _redis(self) -> Optional[Redis]:
+        if not settings.SINGLE_FLIGHT_REDIS_ENABLED or time.monotonic() < self._redis_retry_at:
+            return None
+        return Redis(connection_pool=redis_pool)
+
+    def _redis_failed(self, exc: Exception) -> None:
+        self._redis_retry_at = time.monotonic() + 30.0
+        logger.warning("Single-flight Redis unavailable: %s", exc)
+
+    async def _redis_lock(self, key: str) -> Optional[str]:
+        """Lock token if we lead, ``None`` if another process does, ``""`` without Redis."""
+        redis = self._redis()
+        if redis is None:
+            return ""
+        token = uuid.uuid4().hex
+        try:
+            acquired = await redis.set(
+                _LOCK_PREFIX + key,
+                token,
+                nx=True,
+                ex=max(1, int(settings.SINGLE_FLIGHT_LOCK_SECONDS)),
+            )
+        except Exception as exc:
+            self._redis_failed(exc)
+            return ""
+        return token if acquired else None
+
+    async def _redis_release(self, key: str, token: str) -> None:
+        redis = self._redis()
+        if redis is None:
+            return
+        try:
+            await redis.eval(_RELEASE_SCRIPT, 1, _LOCK_PREFIX + key, token)
+        except Exception as exc:
+            self._redis_failed(exc)
+
+    async def _redis_publish(self, key: str, token: str, results: Results) -> None:
+        redis = self._redis()
+        if redis is None:
+            return
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.set(
+                    _RESULT_PREFIX + key,
+                    json.dumps(results),
+                    ex=max(1, int(settings.SINGLE_FLIGHT_RESULT_TTL_SECONDS)),
+                )
+                pipe.eval(_RELEASE_SCRIPT, 1, _LOCK_PREFIX + key, token)
+                await pipe.execute()
+        except Exception as exc:
+            self._redis_failed(exc)
+
+    async def _redis_wait(self, key: str) -> Optional[Results]:
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT_SECONDS
+        delay = 0.05
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            redis = self._redis()
+            if redis is None:
+                return None
+            try:
+                async with redis.pipeline(transaction=False) as pipe:
+                    pipe.get(_RESULT_PREFIX + key)
+                    pipe.exists(_LOCK_PREFIX + key)
+                    raw, locked = await pipe.execute()
+            except Exception as exc:
+                self._redis_failed(exc)
+                return None
+            if raw:
+                try:
+                    return json.loads(raw)
+                except ValueError:
+                    return None
+            if not locked:
+                # The leader failed or expired without publishing.
+                return None
+        return None
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from redis.asyncio.client import Redis
+
+from config import settings
+from redis_db import redis_pool
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "verdict:v1:"
+
+
+def normalize_source(source_code: str) -> str:
+    # Only line endings: any other whitespace can change what a program does.
+    return (source_code or "").replace("\r\n", "\n")
+
+
+def source_digest(source_code: str) -> str:
+    return hashlib.sha256(normalize_source(source_code).encode("utf-8")).hexdigest()
+
+
+def fingerprint_test_cases(test_cases: Iterable[Dict]) -> str:
+    digest = hashlib.sha256()
+    for tc in test_cases:
+        values = (
+            tc.get("id"),
+            tc.get("is_sample"),
+            tc.get("input_text"),
+            tc.get("output_text"),
+            tc.get("input_blob"),
+            tc.get("output_blob"),
+            tc.get("checker"),
+            tc.get("checker_tolerance"),
+        )
+        for value in values:
+            encoded = json.dumps(value).encode("utf-8")
+            digest.update(f"{len(encoded)}:".encode("ascii"))
+            digest.update(encoded)
+    return digest.hexdigest()
+
+
+def verdict_cache_key(
+    source_code: str,
+    language: str,
+    runtime_version: str,
+    test_cases: List[Dict],
+    fail_fast: bool = False,
+    limits=None,
+) -> str:
+    parts = [
+        source_digest(source_code),
+        language,
+        runtime_version,
+        getattr(test_cases, "fingerprint", None) or fingerprint_test_cases(test_cases),
+        "ff" if fail_fast else "all",
+        f"{limits.time_ms}ms:{limits.memory_mb}mb" if limits is not None else "nolimits",
+    ]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+def is_cacheable(results: List[Dict]) -> bool:
+    # Infrastructure failures (no status from the sandbox) must be retried, not replayed.
+    return bool(results) and all(r.get("skipped") or r.get("status_id") is not None for r in results)
+
+
+class VerdictCache:
+    """Judged case results keyed by ``verdict_cache_key``.
+
+    A bounded in-process LRU sits in front of the shared Redis pool. Keys embed
+    the test-set fingerprint, so replacing a problem's test cases makes old
+    entries unreachable everywhere; ``invalidate_problem`` additionally drops
+    them from this process right away.
+    """
+
+    def __init__(self) -> None:
+        self._entries: "OrderedDict[str, Tuple[float, int, List[Dict]]]" = OrderedDict()
+        self._by_problem: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._redis_retry_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[List[Dict]]:
+        if not settings.VERDICT_CACHE_ENABLED:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self._drop(key)
+
+        cached = await self._redis_get(key)
+        if cached is not None:
+            problem_id, results = cached
+            self._store(key, problem_id, results)
+            self.hits += 1
+            return results
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, problem_id: int, results: List[Dict]) -> None:
+        if not settings.VERDICT_CACHE_ENABLED or not is_cacheable(results):
+            return
+        self._store(key, problem_id, results)
+        await self._redis_set(key, problem_id, results)
+
+    def invalidate_problem(self, problem_id: int) -> None:
+        with self._lock:
+            for key in self._by_problem.pop(problem_id, set()):
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_problem.clear()
+            self._redis_retry_at = 0.0
+            self.hits = 0
+            self.misses = 0
+
+    def _store(self, key: str, problem_id: int, results: List[Dict]) -> None:
+        expires_at = time.monotonic() + settings.VERDICT_CACHE_TTL_SECONDS
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (expires_at, problem_id, results)
+            self._by_problem.setdefault(problem_id, set()).add(key)
+            while len(self._entries) > max(1, settings.VERDICT_CACHE_MAX_ENTRIES):
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_problem.get(entry[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_problem[entry[1]]
+
+    def _redis_usable(self) -> bool:
+        return settings.VERDICT_CACHE_REDIS_ENABLED and time.monotonic() >= self._redis_retry_at
+
+    def _redis_failed(self, exc: Exception) -> None:
+        # Back off so an unreachable Redis does not add a connect attempt to every judge call.
+        self._redis_retry_at = time.monotonic() + 30.0
+        logger.warning("Verdict cache Redis unavailable: %s", exc)
+
+    async def _redis_get(self, key: str) -> Optional[Tuple[int, List[Dict]]]:
+        if not self._redis_usable():
+            return None
+        try:
+            raw = await Redis(connection_pool=redis_pool).get(_KEY_PREFIX + key)
+        except Exception as exc:
+            self._redis_failed(exc)
+            return None
+        if not raw:
+            return None
+        try:
+            payload = json.loads(raw)
+            return int(payload["problem_id"]), payload["results"]
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    async def _redis_set(self, key: str, problem_id: int, results: List[Dict]) -> None:
+        if not self._redis_usable():
+            return
+        try:
+            await Redis(connection_pool=redis_pool).set(
+                _KEY_PREFIX + key,
+                json.dumps({"problem_id": problem_id, "results": results}),
+                ex=max(1, int(settings.VERDICT_CACHE_TTL_SECONDS)),
+            )
+        except Exception as exc:
+            self._redis_failed(exc)
+
+
+verdict_cache = VerdictCache()
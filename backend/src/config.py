@@ -45,6 +45,8 @@ class JwtConfig(BaseConfig):
     AUTH_COOKIE_DOMAIN: str | None = None
     AUTH_COOKIE_PATH: str = "/"
     CODE_EXPIRATION_MINUTES : int
+    TOKEN_CACHE_ENABLED: bool = True
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
 
 
 class MailConfig(BaseConfig):
@@ -78,6 +80,11 @@ class UploadConfig(BaseConfig):
     R2_ENDPOINT_URL: str = ""
     R2_REGION: str = "auto"
     R2_PRESIGNED_URL_TTL_SECONDS: int = 3600
+    CASE_BLOB_DIR: str = str(BASE_DIR / "test-data")
+    CASE_BLOB_INLINE_MAX_BYTES: int = 65536
+    CASE_BLOB_PREVIEW_CHARS: int = 256
+    CASE_BLOB_R2_ENABLED: bool = False
+    CASE_BLOB_R2_PREFIX: str = "test-data/"
 
 class RedisConfig(BaseConfig):
     REDIS_URL : str = "redis://localhost:6379/0"
@@ -85,21 +92,135 @@ class RedisConfig(BaseConfig):
 
 class PistonConfig(BaseConfig):
     PISTON_URL: str = "http://host.docker.internal:2000/api/v2"
+    PISTON_URLS: str = ""
+    PISTON_NODE_MAX_FAILURES: int = 3
+    PISTON_NODE_EJECT_SECONDS: float = 30.0
+    PISTON_HEALTH_INTERVAL_SECONDS: float = 5.0
+    PISTON_HEALTH_TIMEOUT_SECONDS: float = 2.0
+    PISTON_HEALTH_SLOW_SECONDS: float = 1.0
     PISTON_TIMEOUT_SECONDS: int = 15
+    PISTON_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    PISTON_MAX_CONNECTIONS: int = 20
+    PISTON_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    PISTON_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    PISTON_RUNTIMES_TTL_SECONDS: int = 600
+    PISTON_RUNTIMES_RETRY_SECONDS: int = 15
     EXECUTION_MAX_WORKERS: int = 10
+    EXECUTION_MAX_IN_FLIGHT: int = 10
+    EXECUTION_MAX_QUEUE: int = 200
+    EXECUTION_LANE_WEIGHTS: str = "interview=6,submit=3,run=1"
+    EXECUTION_LANE_RESERVED: str = "interview=1,submit=1"
+    EXECUTION_ADAPTIVE_ENABLED: bool = True
+    EXECUTION_ADAPTIVE_MIN_IN_FLIGHT: int = 2
+    EXECUTION_ADAPTIVE_LATENCY_TARGET_SECONDS: float = 5.0
+    EXECUTION_ADAPTIVE_BACKOFF: float = 0.5
+    PISTON_BREAKER_ENABLED: bool = True
+    PISTON_BREAKER_FAILURE_THRESHOLD: int = 5
+    PISTON_BREAKER_OPEN_SECONDS: float = 10.0
+    PISTON_BREAKER_HALF_OPEN_PROBES: int = 1
+    PISTON_BATCH_ENABLED: bool = False
+    PISTON_BATCH_CASE_TIMEOUT_MS: int = 3000
+    PISTON_BATCH_RUN_TIMEOUT_MS: int = 0
+    PISTON_RUN_TIMEOUT_MAX_MS: int = 3000
+    PISTON_RUN_MEMORY_MAX_MB: int = 0
+
+
+class SubmissionQueueConfig(BaseConfig):
+    SUBMISSION_QUEUE_BACKEND: str = "memory"
+    SUBMISSION_QUEUE_STREAM: str = "codemaster:submission-jobs"
+    SUBMISSION_QUEUE_GROUP: str = "judges"
+    SUBMISSION_QUEUE_VISIBILITY_SECONDS: int = 300
+    SUBMISSION_QUEUE_MAX_ATTEMPTS: int = 3
+    SUBMISSION_QUEUE_RETRY_BACKOFF_SECONDS: float = 2.0
+    SUBMISSION_WORKER_CONCURRENCY: int = 4
+    SUBMISSION_WORKER_INLINE: bool = False
+    SUBMISSION_JOB_WAIT_SECONDS: int = 120
+    SUBMISSION_JOB_POLL_SECONDS: float = 0.5
+
+
+class LocalSandboxConfig(BaseConfig):
+    EXECUTION_BACKEND: str = "piston"
+    EXECUTION_LOCAL_SAMPLE_RUNS: bool = False
+    EXECUTION_LOCAL_FALLBACK: bool = False
+    LOCAL_SANDBOX_MAX_WORKERS: int = 2
+    LOCAL_SANDBOX_CPU_SECONDS: int = 3
+    LOCAL_SANDBOX_WALL_SECONDS: float = 6.0
+    LOCAL_SANDBOX_COMPILE_SECONDS: int = 20
+    LOCAL_SANDBOX_MEMORY_MB: int = 256
+    LOCAL_SANDBOX_MAX_FILE_BYTES: int = 1048576
+    LOCAL_SANDBOX_OUTPUT_LIMIT_BYTES: int = 65536
+    LOCAL_SANDBOX_ISOLATE_NETWORK: bool = True
+    LOCAL_SANDBOX_ISOLATE_FILESYSTEM: bool = True
+    LOCAL_SANDBOX_UID: int = 65534
+    LOCAL_SANDBOX_GID: int = 65534
+    LOCAL_SANDBOX_READONLY_PATHS: str = (
+        "/usr,/bin,/lib,/lib32,/lib64,/libx32,/etc/ld.so.cache,/etc/alternatives,"
+        "/dev/null,/dev/zero,/dev/random,/dev/urandom"
+    )
+    LOCAL_SANDBOX_PYTHON: str = ""
+    LOCAL_SANDBOX_CXX: str = "g++"
+    LOCAL_SANDBOX_NODE: str = "node"
+
+
+class VerdictCacheConfig(BaseConfig):
+    VERDICT_CACHE_ENABLED: bool = True
+    VERDICT_CACHE_REDIS_ENABLED: bool = True
+    VERDICT_CACHE_TTL_SECONDS: int = 600
+    VERDICT_CACHE_MAX_ENTRIES: int = 2048
+
+
+class SingleFlightConfig(BaseConfig):
+    SINGLE_FLIGHT_ENABLED: bool = True
+    SINGLE_FLIGHT_REDIS_ENABLED: bool = False
+    SINGLE_FLIGHT_LOCK_SECONDS: int = 60
+    SINGLE_FLIGHT_WAIT_SECONDS: float = 30.0
+    SINGLE_FLIGHT_RESULT_TTL_SECONDS: int = 30
+
+
+class JudgeLimitConfig(BaseConfig):
+    JUDGE_DEFAULT_TIME_LIMIT_MS: int = 2000
+    JUDGE_DEFAULT_MEMORY_LIMIT_MB: int = 256
+    JUDGE_TIME_MULTIPLIERS: str = "python=3,javascript=2,java=2,algo=3"
+    JUDGE_MEMORY_MULTIPLIERS: str = "java=2"
+
+
+class CaseBundleCacheConfig(BaseConfig):
+    CASE_BUNDLE_CACHE_ENABLED: bool = True
+    CASE_BUNDLE_CACHE_MAX_PROBLEMS: int = 512
+    CASE_BUNDLE_CACHE_TTL_SECONDS: int = 300
+    CASE_BUNDLE_REDIS_ENABLED: bool = True
+    CASE_BUNDLE_REDIS_CHANNEL: str = "codemaster:case-bundles"
 
 
 class AlgoConfig(BaseConfig):
     ALGO_COMPILER_JAR: str = "/opt/algo/algo-compiler-1.6.0.jar"
     JAVA_BIN: str = "java"
+    ALGO_WORKER_POOL_SIZE: int = 2
+    ALGO_WORKER_CLASSPATH: str = "/opt/algo/worker"
+    ALGO_WORKER_MAX_JOBS: int = 500
+    ALGO_WORKER_MAX_HEAP_MB: int = 256
+    ALGO_WORKER_JVM_HEAP_MB: int = 512
 
 
 class RateLimitConfig(BaseConfig):
     RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_REDIS_PREFIX: str = "ratelimit:v2:"
+    RATE_LIMIT_REDIS_TIMEOUT_SECONDS: float = 0.25
+    RATE_LIMIT_REDIS_RETRY_SECONDS: float = 5.0
+    RATE_LIMIT_MEMORY_SHARDS: int = 64
+    RATE_LIMIT_MEMORY_MAX_KEYS: int = 1000000
+    RATE_LIMIT_WINDOW_BUCKETS: int = 10
     RATE_LIMIT_AUTH_LOGIN: str = "10/minute"
     RATE_LIMIT_AUTH_REGISTER: str = "5/minute"
     RATE_LIMIT_SUBMISSION_RUN: str = "12/minute"
     RATE_LIMIT_SUBMISSION_SUBMIT: str = "6/minute"
+    RATE_LIMIT_SUBMISSION_CASES: str = "400/minute"
+    SANDBOX_CPU_QUOTA_USER: str = "300/hour"
+    SANDBOX_CPU_QUOTA_IP: str = "600/hour"
+    EXECUTION_CONCURRENCY_LIMIT: int = 2
+    EXECUTION_CONCURRENCY_MAX_WAIT_SECONDS: float = 2.0
+    EXECUTION_CONCURRENCY_LEASE_SECONDS: int = 30
 
 
 class AdminBootstrapConfig(BaseConfig):
@@ -117,6 +238,12 @@ class Settings(
     UploadConfig,
     RedisConfig,
     PistonConfig,
+    SubmissionQueueConfig,
+    LocalSandboxConfig,
+    VerdictCacheConfig,
+    SingleFlightConfig,
+    JudgeLimitConfig,
+    CaseBundleCacheConfig,
     AlgoConfig,
     RateLimitConfig,
     AdminBootstrapConfig,
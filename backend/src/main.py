@@ -7,7 +7,11 @@ from fastapi.responses import JSONResponse
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from api import auth ,user , Tag , SavedSolution,Roadmap , Problem , Comment, Progress, Article, Submission, Interviews, Interview 
+from app.controllers.submission_jobs import submission_worker
 from app.services.admin_bootstrap import bootstrap_admin
+from app.services.algo_workers import algo_worker_pool
+from app.services.case_bundles import case_bundle_cache
+from app.services.piston import piston_client, runtime_registry
 from config import settings
 from database import SessionLocal
 
@@ -33,7 +37,23 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         db.close()
-    yield
+    await piston_client.start()
+    await runtime_registry.start()
+    await algo_worker_pool.start()
+    await case_bundle_cache.start()
+    # The in-memory queue is only visible to this process, so it is drained here.
+    inline_worker = settings.SUBMISSION_WORKER_INLINE or settings.SUBMISSION_QUEUE_BACKEND == "memory"
+    if inline_worker:
+        await submission_worker.start()
+    try:
+        yield
+    finally:
+        if inline_worker:
+            await submission_worker.close()
+        await case_bundle_cache.close()
+        await algo_worker_pool.close()
+        await runtime_registry.close()
+        await piston_client.close()
 
 
 app = FastAPI(
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -37,6 +37,9 @@ class ProblemTestCaseIn(BaseModel):
     output_text: str
     is_sample: Optional[bool] = True
     order: Optional[int] = 0
+    # Echoed back from ProblemTestCaseOut to keep a blob whose preview was not edited.
+    input_hash: Optional[str] = None
+    output_hash: Optional[str] = None
 
 
 class ProblemTestCaseOut(BaseModel):
@@ -45,6 +48,11 @@ class ProblemTestCaseOut(BaseModel):
     output_text: str
     is_sample: bool
     order: int
+    input_hash: Optional[str] = None
+    output_hash: Optional[str] = None
+    input_size: Optional[int] = None
+    output_size: Optional[int] = None
+    truncated: bool = False
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -64,6 +72,9 @@ class ProblemStarterCodeOut(BaseModel):
 
 
 # ---------- PROBLEM ----------
+CheckerMode = Literal["exact", "whitespace", "token", "float"]
+
+
 class ProblemIn(BaseModel):
     title: str
     difficulty: str
@@ -73,6 +84,10 @@ class ProblemIn(BaseModel):
     tag_ids: List[int]
     test_cases: Optional[List[ProblemTestCaseIn]] = None
     starter_codes: Optional[List[ProblemStarterCodeIn]] = None
+    checker: CheckerMode = "whitespace"
+    checker_tolerance: Optional[float] = Field(default=None, ge=0)
+    time_limit_ms: Optional[int] = Field(default=None, ge=1, le=60000)
+    memory_limit_mb: Optional[int] = Field(default=None, ge=1, le=4096)
 
 
 class ProblemOut(BaseModel):
@@ -85,6 +100,10 @@ class ProblemOut(BaseModel):
     tags: List[TagOut]
     test_cases: List[ProblemTestCaseOut] = []
     starter_codes: List[ProblemStarterCodeOut] = []
+    checker: str = "whitespace"
+    checker_tolerance: Optional[float] = None
+    time_limit_ms: Optional[int] = None
+    memory_limit_mb: Optional[int] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -186,6 +205,7 @@ class SubmissionRequest(BaseModel):
     problem_id: int
     language: str
     code: str
+    fail_fast: bool = False
 
 
 class SubmissionCaseResult(BaseModel):
@@ -198,8 +218,11 @@ class SubmissionCaseResult(BaseModel):
     compile_output: Optional[str] = None
     status: Optional[str] = None
     time: Optional[str] = None
+    cpu_time: Optional[str] = None
     memory: Optional[int] = None
+    mismatch: Optional[dict] = None
     passed: bool
+    skipped: bool = False
 
 
 class SubmissionSummary(BaseModel):
@@ -208,6 +231,20 @@ class SubmissionSummary(BaseModel):
     total: int
     cases: List[SubmissionCaseResult]
     hidden: Optional[dict] = None
+    failed_case: Optional[dict] = None
+    runtime_ms: Optional[int] = None
+    memory_kb: Optional[int] = None
+
+
+class SubmissionJobStatus(BaseModel):
+    submission_id: int
+    status: str
+    done: bool
+    verdict: Optional[str] = None
+    passed: Optional[int] = None
+    total: Optional[int] = None
+    result: Optional[SubmissionSummary] = None
+    detail: Optional[str] = None
 
 
 class SubmissionListItem(BaseModel):
@@ -217,6 +254,8 @@ class SubmissionListItem(BaseModel):
     verdict: Optional[str] = None
     passed: Optional[int] = None
     total: Optional[int] = None
+    runtime_ms: Optional[int] = None
+    memory_kb: Optional[int] = None
     is_submit: bool
     created_at: Optional[datetime] = None
 
@@ -0,0 +1,37 @@
+import asyncio
+import logging
+import signal
+
+from app.controllers.submission_jobs import submission_worker
+from app.services.algo_workers import algo_worker_pool
+from app.services.case_bundles import case_bundle_cache
+from app.services.piston import piston_client, runtime_registry
+
+logger = logging.getLogger(__name__)
+
+
+async def run_worker() -> None:
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, task.cancel)
+
+    await piston_client.start()
+    await runtime_registry.start()
+    await algo_worker_pool.start()
+    await case_bundle_cache.start()
+    logger.info("Submission worker consuming with %d slots", submission_worker.concurrency)
+    try:
+        await submission_worker.run()
+    except asyncio.CancelledError:
+        logger.info("Submission worker stopping")
+    finally:
+        await case_bundle_cache.close()
+        await algo_worker_pool.close()
+        await runtime_registry.close()
+        await piston_client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_worker())
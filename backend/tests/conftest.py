@@ -33,6 +33,10 @@ _REQUIRED_ENV_DEFAULTS = {
     "POSTGRES_PASSWORD": "test",
     "POSTGRES_HOST": "localhost",
     "RATE_LIMIT_ENABLED": "false",
+    "RATE_LIMIT_BACKEND": "memory",
+    "EXECUTION_ADAPTIVE_ENABLED": "false",
+    "PISTON_BREAKER_ENABLED": "false",
+    "SUBMISSION_QUEUE_BACKEND": "memory",
     "ADMIN_BOOTSTRAP_ENABLED": "false",
     "OAUTH_FRONTEND_CALLBACK_PATH": "/auth/callback",
     "OAUTH_FRONTEND_BASE_URL": "http://localhost:5173",
@@ -42,6 +46,7 @@ _REQUIRED_ENV_DEFAULTS = {
     "GITHUB_OAUTH_CLIENT_ID": "github-client-id",
     "GITHUB_OAUTH_CLIENT_SECRET": "github-client-secret",
     "INTERVIEW_MEDIA_UPLOAD_ROOT": os.path.join(os.getcwd(), "test_uploads"),
+    "CASE_BLOB_DIR": os.path.join(os.getcwd(), "test_uploads", "test-data"),
     "R2_ACCOUNT_ID": "",
     "R2_BUCKET": "",
     "R2_ACCESS_KEY_ID": "",
@@ -55,6 +60,7 @@ for key, value in _REQUIRED_ENV_DEFAULTS.items():
     os.environ[key] = value
 
 from app.models import Base
+from app.services.case_bundles import case_bundle_cache
 from database import get_db
 from main import app
 
@@ -90,6 +96,8 @@ def db_session():
         session.close()
         transaction.rollback()
         connection.close()
+        # Rolled-back problems free their ids for the next test.
+        case_bundle_cache.clear()
 
 
 @pytest.fixture()
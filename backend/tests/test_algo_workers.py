@@ -0,0 +1,93 @@
+import asyncio
+import sys
+import textwrap
+
+from app.services import algo_workers
+from app.services.algo_workers import AlgoWorkerPool
+
+_FAKE_WORKER = textwrap.dedent(
+    """
+    import os, sys, time
+
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    while True:
+        path = stdin.readline()
+        if not path:
+            break
+        data = stdin.read(int(stdin.readline()))
+        if data == b"hang":
+            time.sleep(60)
+        with open(path.decode().strip(), "rb") as fh:
+            out = fh.read() + data
+        err = str(os.getpid()).encode()
+        retire = int(data == b"retire")
+        stdout.write(b"@@CMJOB 0 %d %d 1024 %d\\n" % (len(out), len(err), retire) + out + err)
+        stdout.flush()
+        if retire:
+            break
+    """
+)
+
+
+def _pool(tmp_path, size=1):
+    worker = tmp_path / "fake_worker.py"
+    worker.write_text(_FAKE_WORKER)
+    source = tmp_path / "main.algo"
+    source.write_text("src:")
+    return AlgoWorkerPool(command=[sys.executable, str(worker)], size=size), str(source)
+
+
+def test_algo_worker_pool_reuses_and_recycles_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(algo_workers.settings, "ALGO_WORKER_MAX_JOBS", 3)
+    pool, source = _pool(tmp_path)
+
+    async def scenario():
+        await pool.start()
+        try:
+            return [await pool.run(source, f"{idx}".encode(), timeout=10) for idx in range(4)]
+        finally:
+            await pool.close()
+
+    results = asyncio.run(scenario())
+
+    assert [r["run"]["stdout"] for r in results] == ["src:0", "src:1", "src:2", "src:3"]
+    pids = [r["run"]["stderr"] for r in results]
+    assert pids[0] == pids[1] == pids[2]
+    assert pids[3] != pids[0]
+
+
+def test_algo_worker_pool_kills_and_replaces_timed_out_worker(tmp_path):
+    pool, source = _pool(tmp_path)
+
+    async def scenario():
+        await pool.start()
+        try:
+            timed_out = await pool.run(source, b"hang", timeout=0.5)
+            after = await pool.run(source, b"ok", timeout=10)
+            return timed_out, after
+        finally:
+            await pool.close()
+
+    timed_out, after = asyncio.run(scenario())
+
+    assert timed_out["run"]["code"] == 124
+    assert timed_out["run"]["signal"] == "timeout"
+    assert after["run"]["stdout"] == "src:ok"
+
+
+def test_algo_worker_pool_replaces_a_worker_that_asks_to_retire(tmp_path):
+    pool, source = _pool(tmp_path)
+
+    async def scenario():
+        await pool.start()
+        try:
+            return [await pool.run(source, data, timeout=10) for data in (b"ok", b"retire", b"ok")]
+        finally:
+            await pool.close()
+
+    results = asyncio.run(scenario())
+
+    assert [r["run"]["stdout"] for r in results] == ["src:ok", "src:retire", "src:ok"]
+    pids = [r["run"]["stderr"] for r in results]
+    assert pids[0] == pids[1]
+    assert pids[2] != pids[1]
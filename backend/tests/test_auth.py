@@ -154,3 +154,44 @@ def test_first_time_oauth_requires_role_selection(client, db_session, monkeypatc
 
     user = db_session.query(User).filter(User.email == "new-social@example.com").first()
     assert user.role == "recruiter"
+
+
+def test_access_token_is_verified_once_per_worker_until_it_expires(client, monkeypatch):
+    from app.services import auth as auth_service
+    from config import settings
+
+    _register_user(client, email="token-cache@example.com")
+    _login_user(client, email="token-cache@example.com")
+    headers = _auth_headers_from_client(client)
+    client.cookies.clear()
+    decoded = []
+    real_decode = auth_service.decode_access_token
+
+    def counting_decode(token):
+        decoded.append(token)
+        return real_decode(token)
+
+    monkeypatch.setattr(auth_service, "decode_access_token", counting_decode)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKEND", "memory")
+    auth_service.verified_tokens.clear()
+    payload = {"problem_id": 999999, "language": "python", "code": "print(1)"}
+
+    # Rate limiting, the quota identity and get_current_user share one decode.
+    assert client.post("/submission/submit", json=payload, headers=headers).status_code in {404, 502}
+    assert len(decoded) == 1
+    me = client.get("/auth/me", headers=headers)
+    assert me.status_code == 200 and me.json()["email"] == "token-cache@example.com"
+    assert len(decoded) == 1
+
+    expires_at = auth_service.verified_tokens.get(decoded[0]).expires_at
+    monkeypatch.setattr(auth_service.time, "time", lambda: expires_at)
+    assert auth_service.verified_tokens.get(decoded[0]) is None
+    assert len(auth_service.verified_tokens) == 0
+
+    bad = {"Authorization": "Bearer not-a-jwt"}
+    assert client.get("/auth/me", headers=bad).status_code == 401
+    assert client.get("/auth/me", headers=bad).status_code == 401
+    assert decoded.count("not-a-jwt") == 2
+    assert len(auth_service.verified_tokens) == 0
+    auth_service.verified_tokens.clear()
@@ -0,0 +1,143 @@
+import asyncio
+import gzip
+
+from app.models import Problem, ProblemTestCase
+from app.services import case_blobs, piston
+from app.services.case_blobs import CaseBlobStore, store_case_text
+from app.controllers.submission import prepare_submit
+
+
+def test_blob_store_deduplicates_and_compresses(tmp_path):
+    store = CaseBlobStore(str(tmp_path))
+    data = b"1 2 3\n" * 50_000
+
+    first = store.put(data)
+    second = store.put(data)
+
+    assert first == second
+    stored = list(tmp_path.rglob("*.gz"))
+    assert stored == [store.path(first)]
+    assert stored[0].stat().st_size < len(data) // 10
+    assert gzip.decompress(stored[0].read_bytes()) == data
+    assert store.read_text(first) == data.decode()
+
+
+def test_large_cases_keep_only_a_preview_and_judge_from_blobs(monkeypatch, tmp_path, db_session):
+    monkeypatch.setattr(case_blobs, "case_blob_store", CaseBlobStore(str(tmp_path)))
+    monkeypatch.setattr(case_blobs.settings, "CASE_BLOB_INLINE_MAX_BYTES", 1024)
+    big_input = "7\n" * 4096
+    big_output = "14\n" * 4096
+
+    assert store_case_text("small") == ("small", None, 5)
+    problem = Problem(title="Doubles", difficulty="Easy")
+    db_session.add(problem)
+    db_session.flush()
+    input_text, input_hash, input_size = store_case_text(big_input)
+    output_text, output_hash, output_size = store_case_text(big_output)
+    db_session.add(
+        ProblemTestCase(
+            problem_id=problem.id,
+            input_text=input_text,
+            output_text=output_text,
+            input_hash=input_hash,
+            input_size=input_size,
+            output_hash=output_hash,
+            output_size=output_size,
+            is_sample=False,
+        )
+    )
+    db_session.commit()
+    db_session.refresh(problem)
+
+    stored = problem.test_cases[0]
+    assert len(stored.input_text) == case_blobs.settings.CASE_BLOB_PREVIEW_CHARS
+    assert stored.input_size == len(big_input)
+
+    seen = []
+
+    async def fake_execute_piston(language, source_code, stdin, limits=None):
+        seen.append(stdin)
+        doubled = "".join(f"{int(line) * 2}\n" for line in stdin.split())
+        return {"run": {"stdout": doubled, "stderr": "", "code": 0, "signal": None}}
+
+    monkeypatch.setattr(piston.settings, "PISTON_BATCH_ENABLED", True)
+    monkeypatch.setattr(piston, "execute_piston", fake_execute_piston)
+    _, cases, _ = prepare_submit(db_session, problem.id, "python")
+    results = asyncio.run(
+        piston.execute_test_cases(language="python", source_code="", test_cases=cases + cases)
+    )
+
+    assert seen == [big_input, big_input]
+    assert all(r["passed"] for r in results)
+    assert results[0]["output_text"] == output_text
+
+
+def test_admin_round_trip_keeps_blob_backed_cases(client, db_session, monkeypatch, tmp_path):
+    from tests.test_problem import _auth_headers
+
+    monkeypatch.setattr(case_blobs, "case_blob_store", CaseBlobStore(str(tmp_path)))
+    monkeypatch.setattr(case_blobs.settings, "CASE_BLOB_INLINE_MAX_BYTES", 1024)
+    headers = _auth_headers(client, db_session)
+    big_input = "7\n" * 4096
+    payload = {
+        "title": "Big Doubles",
+        "difficulty": "Easy",
+        "external_link": None,
+        "tag_ids": [],
+        "test_cases": [{"input_text": big_input, "output_text": "14", "is_sample": True, "order": 0}],
+    }
+    problem_id = client.post("/problem/", json=payload, headers=headers).json()["id"]
+
+    shown = client.get(f"/problem/{problem_id}").json()["test_cases"][0]
+    assert shown["truncated"] is True
+    assert shown["input_size"] == len(big_input) and shown["input_hash"]
+    assert len(shown["input_text"]) == case_blobs.settings.CASE_BLOB_PREVIEW_CHARS
+
+    def saved_input():
+        db_session.expire_all()
+        case = db_session.get(Problem, problem_id).test_cases[0]
+        return case_blobs.load_case_text({"input_text": case.input_text, "input_blob": case.input_hash}, "input")
+
+    echoed = {key: shown[key] for key in ("input_text", "output_text", "is_sample", "order", "input_hash")}
+    legacy = {key: shown[key] for key in ("input_text", "output_text", "is_sample", "order")}
+    for case in (echoed, legacy):
+        updated = client.put(f"/problem/{problem_id}", json={**payload, "test_cases": [case]}, headers=headers)
+        assert updated.status_code == 200, updated.text
+        assert saved_input() == big_input
+
+    edited = {**echoed, "input_text": "3\n"}
+    client.put(f"/problem/{problem_id}", json={**payload, "test_cases": [edited]}, headers=headers)
+    assert saved_input() == "3\n"
+
+
+def test_cases_sharing_a_preview_keep_their_own_blobs_without_hashes(client, db_session, monkeypatch, tmp_path):
+    from tests.test_problem import _auth_headers
+
+    monkeypatch.setattr(case_blobs, "case_blob_store", CaseBlobStore(str(tmp_path)))
+    monkeypatch.setattr(case_blobs.settings, "CASE_BLOB_INLINE_MAX_BYTES", 1024)
+    headers = _auth_headers(client, db_session)
+    inputs = ["7\n" * 4096 + "1\n", "7\n" * 4096 + "2\n"]
+    payload = {
+        "title": "Shared Prefix",
+        "difficulty": "Easy",
+        "external_link": None,
+        "tag_ids": [],
+        "test_cases": [
+            {"input_text": text, "output_text": str(order), "is_sample": True, "order": order}
+            for order, text in enumerate(inputs)
+        ],
+    }
+    problem_id = client.post("/problem/", json=payload, headers=headers).json()["id"]
+
+    shown = client.get(f"/problem/{problem_id}").json()["test_cases"]
+    assert shown[0]["input_text"] == shown[1]["input_text"]
+    legacy = [{key: case[key] for key in ("input_text", "output_text", "is_sample", "order")} for case in shown]
+    updated = client.put(f"/problem/{problem_id}", json={**payload, "test_cases": legacy}, headers=headers)
+    assert updated.status_code == 200, updated.text
+
+    db_session.expire_all()
+    saved = sorted(db_session.get(Problem, problem_id).test_cases, key=lambda case: case.order)
+    assert [
+        case_blobs.load_case_text({"input_text": case.input_text, "input_blob": case.input_hash}, "input")
+        for case in saved
+    ] == inputs
@@ -0,0 +1,61 @@
+import json
+
+from sqlalchemy import event
+
+from app.controllers.submission import prepare_submit
+from app.services.case_bundles import case_bundle_cache
+from tests.test_problem import _auth_headers
+
+
+def _count_queries(db_session):
+    statements = []
+    event.listen(db_session.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def _problem_payload(output_text):
+    return {
+        "title": "Echo",
+        "difficulty": "Easy",
+        "external_link": None,
+        "tag_ids": [],
+        "test_cases": [
+            {"input_text": "1", "output_text": output_text, "is_sample": True, "order": 0},
+            {"input_text": "2", "output_text": "2", "is_sample": False, "order": 1},
+        ],
+    }
+
+
+def test_bundle_is_served_without_sql_and_replaced_on_update(client, db_session):
+    headers = _auth_headers(client, db_session)
+    created = client.post("/problem/", json=_problem_payload("1"), headers=headers)
+    assert created.status_code == 200
+    problem_id = created.json()["id"]
+
+    _, cases, _ = prepare_submit(db_session, problem_id, "python")
+    assert [case["output_text"] for case in cases] == ["1", "2"]
+    assert case_bundle_cache.get(db_session, problem_id).samples == cases[:1]
+
+    statements = _count_queries(db_session)
+    _, again, _ = prepare_submit(db_session, problem_id, "python")
+    assert again is cases
+    assert statements == []
+
+    updated = client.put(f"/problem/{problem_id}", json=_problem_payload("one"), headers=headers)
+    assert updated.status_code == 200
+    _, fresh, _ = prepare_submit(db_session, problem_id, "python")
+    assert [case["output_text"] for case in fresh] == ["one", "2"]
+    assert case_bundle_cache.get(db_session, problem_id).version == 2
+
+
+def test_remote_invalidation_drops_bundle_and_rejects_stale_reads(client, db_session):
+    headers = _auth_headers(client, db_session)
+    problem_id = client.post("/problem/", json=_problem_payload("1"), headers=headers).json()["id"]
+    prepare_submit(db_session, problem_id, "python")
+    assert case_bundle_cache.stats()["problems"] == 1
+
+    # Another process committed version 2; this session still reads version 1.
+    case_bundle_cache._on_message(json.dumps({"problem_id": problem_id, "version": 2}))
+    assert case_bundle_cache.stats()["problems"] == 0
+    prepare_submit(db_session, problem_id, "python")
+    assert case_bundle_cache.stats()["problems"] == 0
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from app.services.execution_scheduler import ExecutionQueueFull, ExecutionScheduler
+
+
+def test_scheduler_caps_in_flight_and_serves_owners_round_robin():
+    async def scenario():
+        scheduler = ExecutionScheduler(max_in_flight=1, max_queue=10)
+        order = []
+        gate = asyncio.Event()
+
+        async def job(owner, label):
+            async with scheduler.slot(owner):
+                order.append(label)
+                await gate.wait()
+
+        blocker = asyncio.create_task(job("heavy", "heavy-0"))
+        await asyncio.sleep(0)
+        heavy = [asyncio.create_task(job("heavy", f"heavy-{i}")) for i in range(1, 4)]
+        await asyncio.sleep(0)
+        light = asyncio.create_task(job("light", "light-0"))
+        await asyncio.sleep(0)
+
+        snapshot = scheduler.snapshot()
+        assert snapshot["in_flight"] == 1
+        assert snapshot["queued"] == 4
+        assert snapshot["owners_waiting"] == 2
+
+        gate.set()
+        await asyncio.gather(blocker, *heavy, light)
+        return order, scheduler.snapshot()
+
+    order, snapshot = asyncio.run(scenario())
+
+    assert order == ["heavy-0", "heavy-1", "light-0", "heavy-2", "heavy-3"]
+    assert snapshot["in_flight"] == 0
+    assert snapshot["queued"] == 0
+    assert snapshot["max_queue_depth"] == 4
+    assert snapshot["acquired"] == 5
+
+
+def test_scheduler_rejects_when_queue_is_full_and_cleans_up_cancelled_waiters():
+    async def scenario():
+        scheduler = ExecutionScheduler(max_in_flight=1, max_queue=1)
+        await scheduler.acquire("a")
+        waiter = asyncio.create_task(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(ExecutionQueueFull):
+            await scheduler.acquire("c")
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        after_cancel = scheduler.snapshot()
+        scheduler.release()
+        return after_cancel, scheduler.snapshot()
+
+    after_cancel, final = asyncio.run(scenario())
+
+    assert after_cancel["queued"] == 0
+    assert after_cancel["rejected"] == 1
+    assert final["in_flight"] == 0
+
+
+def test_scheduler_weights_lanes_and_keeps_reserved_slots():
+    async def scenario():
+        scheduler = ExecutionScheduler(
+            max_in_flight=3,
+            max_queue=10,
+            weights={"interview": 6, "submit": 3, "run": 1},
+            reserved={"interview": 1},
+        )
+        order = []
+        gate = asyncio.Event()
+
+        async def job(lane, label):
+            async with scheduler.slot(f"user-{label}", lane):
+                order.append(label)
+                await gate.wait()
+
+        runs = [asyncio.create_task(job("run", f"run-{i}")) for i in range(6)]
+        await asyncio.sleep(0)
+        held = scheduler.snapshot()
+        # Two shared slots go to practice runs; the third stays reserved.
+        assert (held["in_flight"], held["lanes"]["run"]["queued"]) == (2, 4)
+
+        interview = asyncio.create_task(job("interview", "interview-0"))
+        await asyncio.sleep(0)
+        assert order[-1] == "interview-0"
+        submits = [asyncio.create_task(job("submit", f"submit-{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+
+        gate.set()
+        await asyncio.gather(*runs, interview, *submits)
+        return order, scheduler.snapshot()
+
+    order, snapshot = asyncio.run(scenario())
+
+    assert order[:3] == ["run-0", "run-1", "interview-0"]
+    # Submits (weight 3) drain well ahead of the four queued runs (weight 1).
+    # Submits (weight 3) are interleaved ahead of the queued runs (weight 1).
+    assert order[3:] == ["submit-0", "submit-1", "run-2", "submit-2", "run-3", "run-4", "run-5"]
+    assert snapshot["lanes"]["run"]["acquired"] == 6
+    assert snapshot["lanes"]["submit"]["acquired"] == 3
+    assert snapshot["lanes"]["interview"]["max_wait_seconds"] == 0.0
+    assert snapshot["in_flight"] == 0 and snapshot["queued"] == 0
+
+
+def test_scheduler_rejects_unknown_lane():
+    with pytest.raises(ValueError):
+        asyncio.run(ExecutionScheduler(max_in_flight=1).acquire("a", "batch"))
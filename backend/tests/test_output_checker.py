@@ -0,0 +1,48 @@
+import pytest
+
+from app.services.output_checker import compare_output
+
+
+def test_whitespace_mode_ignores_trailing_space_and_blank_lines():
+    assert compare_output("1 2\n3", "\n1 2   \r\n3\n\n\n") is None
+    assert compare_output("", "") is None
+    assert compare_output("1 2", "1  2") == {"line": 1, "column": 3, "expected": "2", "actual": " 2"}
+
+
+def test_exact_mode_only_forgives_line_endings_and_final_newline():
+    assert compare_output("a\nb", "a\r\nb\n", "exact") is None
+    assert compare_output("a\nb", "a \nb", "exact")["line"] == 1
+    mismatch = compare_output("a\nb\nc", "a\nb", "exact")
+    assert mismatch == {"line": 3, "column": 1, "expected": "c", "actual": ""}
+
+
+def test_token_mode_reports_position_in_actual_output():
+    assert compare_output("1 2 3", "1\n2\n   3\n", "token") is None
+    assert compare_output("1 2 3", "1\n  5 3", "token") == {"line": 2, "column": 3, "expected": "2", "actual": "5"}
+    assert compare_output("1 2", "1 2 3", "token") == {"line": 1, "column": 5, "expected": "", "actual": "3"}
+    assert compare_output("1 2", "1\n", "token") == {"line": 1, "column": 2, "expected": "2", "actual": ""}
+
+
+def test_float_mode_uses_tolerance():
+    assert compare_output("0.333333", "0.3333331", "float") is None
+    assert compare_output("1e9 nan", "1000000000.5 nan", "float", 1e-6) is None
+    assert compare_output("0.5 yes", "0.5001 yes", "float", 1e-3) is None
+    assert compare_output("0.5", "0.51", "float", 1e-3)["actual"] == "0.51"
+    assert compare_output("yes", "YES", "float") is not None
+
+
+def test_large_output_difference_is_located():
+    expected = "x" * 200_000 + "\n" + "y" * 100
+    actual = "x" * 200_000 + "\n" + "y" * 50 + "z" + "y" * 49
+    assert compare_output(expected, actual, "exact") == {
+        "line": 2,
+        "column": 51,
+        "expected": "y" * 40,
+        "actual": "z" + "y" * 39,
+    }
+    assert compare_output(expected, expected + "\n") is None
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        compare_output("1", "1", "regex")
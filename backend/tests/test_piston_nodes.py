@@ -0,0 +1,135 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import piston
+
+
+class FakePiston:
+    """Several fake Piston nodes behind one transport, told apart by host."""
+
+    def __init__(self, *hosts):
+        self.hosts = hosts
+        self.calls = {host: [] for host in hosts}
+        self.mode = {host: "ok" for host in hosts}
+        self.delay = {host: 0.0 for host in hosts}
+        self.release = None
+
+    async def handle(self, request):
+        host = request.url.host
+        self.calls[host].append(request.url.path)
+        mode = self.mode[host]
+        if mode == "down":
+            raise httpx.ConnectError("connection refused", request=request)
+        if mode == "hold" and self.release is not None:
+            await self.release.wait()
+        await asyncio.sleep(self.delay[host])
+        if mode == "overloaded":
+            return httpx.Response(503, text="busy")
+        if request.url.path.endswith("/runtimes"):
+            return httpx.Response(200, json=[{"language": "python", "version": "3.11.0", "aliases": []}])
+        return httpx.Response(200, json={"node": host, "run": {"stdout": host, "code": 0}})
+
+    def client(self):
+        return piston.PistonClient(transport=httpx.MockTransport(self.handle))
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setattr(piston.settings, "PISTON_URLS", "http://a/api/v2, http://b/api/v2")
+    monkeypatch.setattr(piston.settings, "PISTON_NODE_MAX_FAILURES", 2)
+    monkeypatch.setattr(piston.settings, "PISTON_NODE_EJECT_SECONDS", 60)
+    monkeypatch.setattr(piston.settings, "PISTON_HEALTH_SLOW_SECONDS", 0.2)
+    monkeypatch.setattr(piston.settings, "PISTON_HEALTH_INTERVAL_SECONDS", 0)
+    return FakePiston("a", "b")
+
+
+def _by_node(client):
+    return {snap["url"]: snap for snap in client.snapshot()}
+
+
+def test_piston_client_routes_to_least_outstanding_node(fake):
+    client = fake.client()
+    fake.mode["a"] = "hold"
+
+    async def scenario():
+        fake.release = asyncio.Event()
+        await client.start()
+        try:
+            held = [asyncio.ensure_future(client.request_json("POST", "/execute", {})) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            # with requests stuck on one node, new work goes to the other
+            served = [(await client.request_json("POST", "/execute", {}))["node"] for _ in range(3)]
+            outstanding = {snap["url"]: snap["outstanding"] for snap in client.snapshot()}
+            fake.release.set()
+            await asyncio.gather(*held)
+            return served, outstanding
+        finally:
+            await client.close()
+
+    served, outstanding = asyncio.run(scenario())
+
+    assert len(fake.calls["a"]) == 1
+    assert served == ["b", "b", "b"]
+    assert outstanding["http://a/api/v2"] == 1
+    assert sum(snap["requests"] for snap in client.snapshot()) == 5
+
+
+def test_piston_client_ejects_failing_node_and_readmits_after_health_check(fake):
+    client = fake.client()
+    fake.mode["b"] = "overloaded"
+
+    async def scenario():
+        served = [(await client.request_json("POST", "/execute", {}))["node"] for _ in range(6)]
+        ejected = _by_node(client)["http://b/api/v2"]["available"]
+        tried_b = len(fake.calls["b"])
+        fake.mode["b"] = "ok"
+        health = await client.check_all()
+        after = [(await client.request_json("POST", "/execute", {}))["node"] for _ in range(4)]
+        return served, ejected, tried_b, health, after
+
+    served, ejected, tried_b, health, after = asyncio.run(scenario())
+
+    # overloaded replies are retried on the healthy node, so callers never see them
+    assert served == ["a"] * 6
+    assert tried_b == 2
+    assert ejected is False
+    assert health == [True, True]
+    assert set(after) == {"a", "b"}
+    stats = _by_node(client)["http://b/api/v2"]
+    assert stats["errors"] == 2
+    assert stats["ejections"] == 1
+
+
+def test_piston_client_fails_over_unreachable_and_slow_nodes(fake):
+    client = fake.client()
+    fake.mode["b"] = "down"
+    fake.delay["a"] = 0.3
+
+    async def scenario():
+        served = [(await client.request_json("POST", "/execute", {}))["node"] for _ in range(3)]
+        health = await client.check_all()
+        return served, health
+
+    served, health = asyncio.run(scenario())
+
+    assert served == ["a", "a", "a"]
+    # a answers, but too slowly; b refuses connections
+    assert health == [False, False]
+    assert not any(snap["available"] for snap in client.snapshot())
+
+    fake.delay["a"] = 0.0
+
+    async def degraded():
+        # with every node ejected traffic still flows to the least loaded one
+        return (await client.request_json("POST", "/execute", {}))["node"]
+
+    assert asyncio.run(degraded()) == "a"
+
+
+def test_piston_client_without_node_list_uses_piston_url(monkeypatch):
+    monkeypatch.setattr(piston.settings, "PISTON_URLS", "")
+    monkeypatch.setattr(piston.settings, "PISTON_URL", "http://solo:2000/api/v2/")
+    client = piston.PistonClient()
+    assert [node.url for node in client.nodes] == ["http://solo:2000/api/v2"]
@@ -29,10 +29,16 @@ def test_problem_create_and_list(client, db_session):
         "test_cases": [
             {"input_text": "1 2", "output_text": "3", "is_sample": True, "order": 0}
         ],
+        "checker": "token",
+        "time_limit_ms": 1500,
     }
     create_resp = client.post("/problem/", json=payload, headers=headers)
     assert create_resp.status_code == 200
     problem_id = create_resp.json()["id"]
+    assert create_resp.json()["checker"] == "token"
+    assert create_resp.json()["time_limit_ms"] == 1500
+    assert client.post("/problem/", json={**payload, "checker": "regex"}, headers=headers).status_code == 422
+    assert client.post("/problem/", json={**payload, "time_limit_ms": 0}, headers=headers).status_code == 422
 
     list_resp = client.get("/problem/")
     assert list_resp.status_code == 200
@@ -41,3 +47,35 @@ def test_problem_create_and_list(client, db_session):
     get_resp = client.get(f"/problem/{problem_id}")
     assert get_resp.status_code == 200
     assert get_resp.json()["id"] == problem_id
+
+
+def test_problem_update_keeps_judging_fields_the_client_left_out(client, db_session):
+    from app.models import Problem
+
+    headers = _auth_headers(client, db_session)
+    payload = {
+        "title": "Float Mean",
+        "difficulty": "Easy",
+        "external_link": None,
+        "tag_ids": [],
+        "test_cases": [{"input_text": "1 2", "output_text": "1.5", "is_sample": True, "order": 0}],
+        "checker": "float",
+        "checker_tolerance": 0.001,
+        "time_limit_ms": 1500,
+        "memory_limit_mb": 128,
+    }
+    problem_id = client.post("/problem/", json=payload, headers=headers).json()["id"]
+
+    edit = {key: payload[key] for key in ("title", "difficulty", "external_link", "tag_ids")}
+    updated = client.put(f"/problem/{problem_id}", json={**edit, "description": "Mean of two numbers."}, headers=headers)
+    assert updated.status_code == 200, updated.text
+    assert (updated.json()["checker"], updated.json()["checker_tolerance"]) == ("float", 0.001)
+    assert (updated.json()["time_limit_ms"], updated.json()["memory_limit_mb"]) == (1500, 128)
+    db_session.expire_all()
+    assert db_session.get(Problem, problem_id).test_version == 1
+
+    updated = client.put(f"/problem/{problem_id}", json={**edit, "checker": "token", "time_limit_ms": None}, headers=headers)
+    assert updated.json()["checker"] == "token"
+    assert (updated.json()["time_limit_ms"], updated.json()["memory_limit_mb"]) == (None, 128)
+    db_session.expire_all()
+    assert db_session.get(Problem, problem_id).test_version == 2
@@ -1,4 +1,11 @@
-from app.services.rate_limiter import reset_rate_limiter
+import asyncio
+import hashlib
+
+from redis.exceptions import NoScriptError
+
+from app.services import concurrency_limiter, rate_limiter
+from app.services.concurrency_limiter import ConcurrencyLimiter, ConcurrencyLimitExceeded
+from app.services.rate_limiter import InMemoryRateLimiter, RedisRateLimiter, reset_rate_limiter
 from config import settings
 from tests.test_auth import _auth_headers_from_client, _login_user, _register_user
 
@@ -91,3 +98,366 @@ def test_submission_submit_rate_limit(client):
         settings.RATE_LIMIT_ENABLED = old_enabled
         settings.RATE_LIMIT_SUBMISSION_SUBMIT = old_submit_limit
         reset_rate_limiter()
+
+
+class InMemoryRedis:
+    """Stand-in for the few Redis calls the limiter makes, with a settable clock.
+
+    Scripts are emulated by Python ports registered per SHA, since there is
+    no Lua interpreter here.
+    """
+
+    def __init__(self) -> None:
+        self.now_ms = 1_700_000_000_000
+        self.values = {}
+        self.calls = []
+        self._loaded = set()
+        self._ports = {hashlib.sha1(rate_limiter._WINDOW_SCRIPT.encode("utf-8")).hexdigest(): self._window}
+
+    def _window(self, key, width, slots, limit, cost, force):
+        width, slots, limit, cost = int(width), int(slots), float(limit), float(cost)
+        at = self.now_ms // width
+        state = self.values.get(key)
+        if state is None or state["w"] != width:
+            state = {"w": width, "at": at, "counts": [0.0] * slots}
+        at = max(at, state["at"])
+        counts = list(state["counts"])
+        if at - state["at"] >= slots:
+            counts = [0.0] * slots
+        else:
+            for bucket in range(state["at"] + 1, at + 1):
+                counts[bucket % slots] = 0.0
+        total = sum(counts)
+        if force == "1" or total + cost <= limit:
+            if cost > 0:
+                counts[at % slots] += cost
+                self.values[key] = {"w": width, "at": at, "counts": counts}
+            return [1, str(limit - total - cost), "0"]
+        freed, retry = 0.0, (at + slots) * width - self.now_ms
+        for bucket in range(at - slots + 1, at + 1):
+            freed += counts[bucket % slots]
+            if total - freed + cost <= limit:
+                retry = (bucket + slots) * width - self.now_ms
+                break
+        return [0, str(limit - total), str(retry)]
+
+    async def evalsha(self, sha, numkeys, *args):
+        self.calls.append("evalsha")
+        if sha not in self._loaded:
+            raise NoScriptError("NOSCRIPT No matching script")
+        return self._ports[sha](*args)
+
+    async def eval(self, script, numkeys, *args):
+        self.calls.append("eval")
+        sha = hashlib.sha1(script.encode("utf-8")).hexdigest()
+        self._loaded.add(sha)
+        return self._ports[sha](*args)
+
+
+class BrokenRedis:
+    async def evalsha(self, *args):
+        raise ConnectionError("connection refused")
+
+
+def test_redis_limiter_is_shared_across_workers():
+    redis = InMemoryRedis()
+    # Start on a bucket boundary: with 6 s buckets a charge frees up 66 s
+    # after the start of its bucket.
+    redis.now_ms = 1_700_000_040_000
+    workers = [RedisRateLimiter(redis=redis), RedisRateLimiter(redis=redis)]
+
+    async def hit(worker):
+        return await workers[worker].hit("run:ip:1.2.3.4", limit=2, window_seconds=60)
+
+    assert asyncio.run(hit(0)) is None
+    redis.now_ms += 20_000
+    assert asyncio.run(hit(1)) is None
+    assert asyncio.run(hit(0)) == 46.0
+    assert asyncio.run(hit(1)) == 46.0
+    redis.now_ms += 46_000
+    assert asyncio.run(hit(1)) is None
+    assert asyncio.run(hit(0)) == 18.0
+    # One round trip per check once the script is loaded.
+    assert redis.calls[:3] == ["evalsha", "eval", "evalsha"]
+    assert len(redis.calls) == 7
+    assert set(redis.values) == {settings.RATE_LIMIT_REDIS_PREFIX + "run:ip:1.2.3.4"}
+
+
+def test_redis_limiter_fails_open_to_local_limits(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_REDIS_RETRY_SECONDS", 60.0)
+    limiter = RedisRateLimiter(redis=BrokenRedis(), fallback=InMemoryRateLimiter())
+
+    async def hits():
+        return [await limiter.hit("login:ip:1.2.3.4", limit=2, window_seconds=60) for _ in range(3)]
+
+    first, second, third = asyncio.run(hits())
+    assert first is None and second is None
+    assert 60.0 <= third <= 66.0
+
+
+def test_rate_limit_dependency_uses_redis_backend(client, monkeypatch):
+    redis = InMemoryRedis()
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKEND", "redis")
+    monkeypatch.setattr(settings, "RATE_LIMIT_SUBMISSION_RUN", "2/minute")
+    monkeypatch.setattr(rate_limiter._redis_limiter, "_redis", redis)
+    reset_rate_limiter()
+    payload = {"problem_id": 999999, "language": "python", "code": "print(1)"}
+
+    statuses = [client.post("/submission/run", json=payload).status_code for _ in range(3)]
+
+    assert statuses[0] in {404, 502} and statuses[1] in {404, 502}
+    assert statuses[2] == 429
+    assert "eval" in redis.calls
+    reset_rate_limiter()
+
+
+def test_limiters_admit_at_most_limit_units_in_any_window(monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: clock["now"])
+    memory = InMemoryRateLimiter(shards=1)
+    redis = InMemoryRedis()
+    shared = RedisRateLimiter(redis=redis)
+    admitted = {"memory": [], "redis": []}
+
+    async def tick(step):
+        clock["now"] = 1000.0 + step / 2
+        redis.now_ms = 1_700_000_000_000 + step * 500
+        if memory.hit("login:ip:1", 10, 60) is None:
+            admitted["memory"].append(step / 2)
+        if await shared.hit("login:ip:1", 10, 60) is None:
+            admitted["redis"].append(step / 2)
+
+    async def hammer():
+        # A request every half second for three windows.
+        for step in range(360):
+            await tick(step)
+
+    asyncio.run(hammer())
+    for times in admitted.values():
+        assert len([t for t in times if t < 60]) == 10
+        assert all(len([t for t in times if start <= t < start + 60]) <= 10 for start in times)
+        assert len(times) == 30
+
+
+def test_in_memory_limiter_evicts_idle_keys_and_caps_size(monkeypatch):
+    clock = {"now": 1020.0}
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: clock["now"])
+    limiter = InMemoryRateLimiter(shards=1, max_keys=1000)
+
+    assert limiter.hit("login:ip:1", limit=1, window_seconds=60) is None
+    assert limiter.hit("login:ip:1", limit=1, window_seconds=60) == 66.0
+    clock["now"] += 30
+    assert limiter.hit("login:ip:2", limit=1, window_seconds=60) is None
+    assert len(limiter) == 2
+
+    clock["now"] += 36
+    assert limiter.hit("login:ip:3", limit=1, window_seconds=60) is None
+    assert len(limiter) == 2
+    assert limiter.hit("login:ip:1", limit=1, window_seconds=60) is None
+
+    capped = InMemoryRateLimiter(shards=4, max_keys=100)
+    for i in range(5000):
+        capped.hit(f"login:ip:{i}", limit=5, window_seconds=3600)
+    assert len(capped) <= 100
+
+
+def test_cases_and_cpu_seconds_are_charged_against_budgets(client, db_session, monkeypatch):
+    from app.services import piston
+    from tests.test_submission import _auth_headers, _create_problem, _fake_python_runtime
+
+    async def fake_execute_piston(language, source_code, stdin, limits=None):
+        return {"run": {"stdout": "3\n", "stderr": "", "code": 0, "signal": None, "cpu_time": 1500}}
+
+    monkeypatch.setattr(piston, "get_runtime", _fake_python_runtime)
+    monkeypatch.setattr(piston, "execute_piston", fake_execute_piston)
+    headers = _auth_headers(client, db_session)
+    problem_id = _create_problem(
+        client,
+        headers,
+        title="Budgeted Sum",
+        difficulty="Easy",
+        description="Return the sum.",
+        constraints="Small.",
+        tag_name="budget",
+        test_cases=[{"input_text": "1 2", "output_text": "3", "is_sample": True, "order": i} for i in range(3)],
+    )
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_SUBMISSION_RUN", "100/minute")
+    monkeypatch.setattr(settings, "RATE_LIMIT_SUBMISSION_CASES", "7/minute")
+    monkeypatch.setattr(settings, "SANDBOX_CPU_QUOTA_USER", "")
+    monkeypatch.setattr(settings, "SANDBOX_CPU_QUOTA_IP", "6/hour")
+    reset_rate_limiter()
+
+    def run(code):
+        payload = {"problem_id": problem_id, "language": "python", "code": code}
+        return client.post("/submission/run", json=payload, headers={"X-Forwarded-For": "203.0.113.9"})
+
+    try:
+        first = run("print(3)")
+        assert first.status_code == 200, first.text
+        assert first.headers["X-RateLimit-Cases-Remaining"] == "4"
+        assert first.headers["X-Sandbox-CPU-Remaining"] == "1.5"
+
+        # Served from the verdict cache: cases are charged, CPU is not.
+        cached = run("print(3)")
+        assert cached.status_code == 200
+        assert cached.headers["X-RateLimit-Cases-Remaining"] == "1"
+        assert cached.headers["X-Sandbox-CPU-Remaining"] == "1.5"
+
+        third = run("print(1 + 2)")
+        assert third.status_code == 429
+        assert third.json()["detail"] == "Rate limit exceeded"
+
+        monkeypatch.setattr(settings, "RATE_LIMIT_SUBMISSION_CASES", "100/minute")
+        reset_cases = run("print(2 + 1)")
+        assert reset_cases.status_code == 200
+        assert reset_cases.headers["X-Sandbox-CPU-Remaining"] == "0.0"
+
+        over = run("print(3 * 1)")
+        assert over.status_code == 429
+        assert over.json()["detail"] == "Sandbox CPU quota exceeded"
+        assert int(over.headers["Retry-After"]) > 0
+    finally:
+        reset_rate_limiter()
+
+
+class LeaseRedis:
+    """Python ports of the lease scripts over a per-key dict of token -> expiry."""
+
+    def __init__(self) -> None:
+        self.now_ms = 1_700_000_000_000
+        self.leases = {}
+        self._ports = {
+            hashlib.sha1(concurrency_limiter._ACQUIRE_SCRIPT.encode("utf-8")).hexdigest(): self._acquire,
+            hashlib.sha1(concurrency_limiter._RENEW_SCRIPT.encode("utf-8")).hexdigest(): self._renew,
+        }
+
+    def _live(self, key):
+        leases = {t: exp for t, exp in self.leases.get(key, {}).items() if exp > self.now_ms}
+        self.leases[key] = leases
+        return leases
+
+    def _acquire(self, key, limit, ttl_ms, token):
+        leases = self._live(key)
+        if len(leases) >= int(limit):
+            return 0
+        leases[token] = self.now_ms + int(ttl_ms)
+        return 1
+
+    def _renew(self, key, ttl_ms, token):
+        leases = self._live(key)
+        if token not in leases:
+            return 0
+        leases[token] = self.now_ms + int(ttl_ms)
+        return 1
+
+    async def evalsha(self, sha, numkeys, *args):
+        return self._ports[sha](*args)
+
+    async def zrem(self, key, token):
+        return int(self.leases.get(key, {}).pop(token, None) is not None)
+
+
+def _lease_settings(monkeypatch, backend, limit=2, max_wait=0.0):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKEND", backend)
+    monkeypatch.setattr(settings, "EXECUTION_CONCURRENCY_LIMIT", limit)
+    monkeypatch.setattr(settings, "EXECUTION_CONCURRENCY_MAX_WAIT_SECONDS", max_wait)
+
+
+def test_concurrency_limiter_rejects_or_queues_past_the_limit(monkeypatch):
+    _lease_settings(monkeypatch, "memory", limit=2, max_wait=0.0)
+    limiter = ConcurrencyLimiter()
+
+    async def scenario():
+        first = await limiter.acquire("user:1")
+        second = await limiter.acquire("user:1")
+        try:
+            await limiter.acquire("user:1")
+        except ConcurrencyLimitExceeded:
+            rejected = True
+        else:
+            rejected = False
+        other = await limiter.acquire("user:2")
+        assert limiter.in_flight("user:1") == 2
+
+        monkeypatch.setattr(settings, "EXECUTION_CONCURRENCY_MAX_WAIT_SECONDS", 1.0)
+        waiter = asyncio.ensure_future(limiter.acquire("user:1"))
+        await asyncio.sleep(0.1)
+        assert not waiter.done()
+        await limiter.release(first)
+        queued = await asyncio.wait_for(waiter, 1.0)
+        for lease in (second, other, queued):
+            await limiter.release(lease)
+        return rejected
+
+    assert asyncio.run(scenario()) is True
+    assert limiter.in_flight("user:1") == 0
+
+
+def test_concurrency_leases_are_shared_and_expire_with_dead_workers(monkeypatch):
+    _lease_settings(monkeypatch, "redis", limit=1)
+    redis = LeaseRedis()
+    workers = [ConcurrencyLimiter(redis=redis), ConcurrencyLimiter(redis=redis)]
+
+    async def scenario():
+        crashed = await workers[0].acquire("user:1")
+        crashed.renewer.cancel()
+        try:
+            await workers[1].acquire("user:1")
+        except ConcurrencyLimitExceeded:
+            blocked = True
+        else:
+            blocked = False
+
+        redis.now_ms += settings.EXECUTION_CONCURRENCY_LEASE_SECONDS * 1000
+        lease = await workers[1].acquire("user:1")
+        assert lease.remote
+        await workers[1].release(lease)
+        return blocked
+
+    assert asyncio.run(scenario()) is True
+    assert redis.leases[settings.RATE_LIMIT_REDIS_PREFIX + "inflight:user:1"] == {}
+
+
+def test_concurrency_limiter_counts_per_process_without_redis(monkeypatch):
+    _lease_settings(monkeypatch, "redis", limit=1)
+    limiter = ConcurrencyLimiter(redis=BrokenRedis())
+
+    async def scenario():
+        lease = await limiter.acquire("ip:1.2.3.4")
+        assert not lease.remote
+        try:
+            await limiter.acquire("ip:1.2.3.4")
+        except ConcurrencyLimitExceeded:
+            return True
+        finally:
+            await limiter.release(lease)
+        return False
+
+    assert asyncio.run(scenario()) is True
+    assert limiter.in_flight("ip:1.2.3.4") == 0
+
+
+def test_submission_run_returns_429_while_executions_are_in_flight(client, monkeypatch):
+    from app.services.concurrency_limiter import execution_leases
+
+    _lease_settings(monkeypatch, "memory", limit=1)
+    monkeypatch.setattr(settings, "RATE_LIMIT_SUBMISSION_RUN", "100/minute")
+    reset_rate_limiter()
+    execution_leases.reset()
+    payload = {"problem_id": 999999, "language": "python", "code": "print(1)"}
+    headers = {"X-Forwarded-For": "198.51.100.4"}
+    try:
+        asyncio.run(execution_leases.acquire("ip:198.51.100.4"))
+        busy = client.post("/submission/run", json=payload, headers=headers)
+        assert busy.status_code == 429
+        assert busy.json()["detail"] == "Too many executions in progress"
+
+        execution_leases.reset()
+        assert client.post("/submission/run", json=payload, headers=headers).status_code in {404, 502}
+        assert execution_leases.in_flight("ip:198.51.100.4") == 0
+    finally:
+        execution_leases.reset()
+        reset_rate_limiter()
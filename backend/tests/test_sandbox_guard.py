@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services import piston, sandbox_guard
+from app.services.execution_scheduler import ExecutionScheduler
+from app.services.sandbox_guard import AdaptiveLimit, CircuitBreaker, SandboxUnavailable
+from tests.test_submission import _auth_headers, _create_problem
+
+
+@pytest.fixture
+def guarded(monkeypatch):
+    monkeypatch.setattr(sandbox_guard.settings, "EXECUTION_ADAPTIVE_ENABLED", True)
+    monkeypatch.setattr(sandbox_guard.settings, "EXECUTION_MAX_IN_FLIGHT", 8)
+    monkeypatch.setattr(sandbox_guard.settings, "EXECUTION_ADAPTIVE_MIN_IN_FLIGHT", 2)
+    monkeypatch.setattr(sandbox_guard.settings, "EXECUTION_ADAPTIVE_LATENCY_TARGET_SECONDS", 1.0)
+    monkeypatch.setattr(sandbox_guard.settings, "PISTON_BREAKER_ENABLED", True)
+    monkeypatch.setattr(sandbox_guard.settings, "PISTON_BREAKER_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(sandbox_guard.settings, "PISTON_BREAKER_OPEN_SECONDS", 0.2)
+    limit, breaker = AdaptiveLimit(), CircuitBreaker()
+    monkeypatch.setattr(sandbox_guard, "adaptive_limit", limit)
+    monkeypatch.setattr(piston, "adaptive_limit", limit)
+    monkeypatch.setattr(piston, "circuit_breaker", breaker)
+    return limit, breaker
+
+
+def test_adaptive_limit_backs_off_once_per_burst_and_recovers_additively(guarded):
+    limit, _ = guarded
+    assert limit.limit == 8
+
+    burst_started = time.monotonic()
+    limit.record(burst_started, 3.0, ok=True)
+    limit.record(burst_started, 0.1, ok=False)
+    assert limit.limit == 4
+
+    limit.record(time.monotonic(), 0.1, ok=False)
+    limit.record(time.monotonic(), 0.1, ok=False)
+    assert limit.limit == 2  # never below the floor
+
+    for _ in range(3):
+        limit.record(time.monotonic(), 0.1, ok=True)
+    assert limit.limit == 3
+    for _ in range(50):
+        limit.record(time.monotonic(), 0.1, ok=True)
+    assert limit.limit == 8
+
+
+def test_scheduler_follows_adaptive_limit(guarded, monkeypatch):
+    limit, _ = guarded
+    monkeypatch.setattr("app.services.execution_scheduler.adaptive_limit", limit)
+    scheduler = ExecutionScheduler(max_queue=10, reserved={})
+    limit.record(time.monotonic(), 5.0, ok=True)
+
+    async def scenario():
+        for _ in range(4):
+            await scheduler.acquire("a")
+        waiter = asyncio.ensure_future(scheduler.acquire("a"))
+        await asyncio.sleep(0)
+        queued = scheduler.snapshot()["queued"]
+        scheduler.release()
+        await waiter
+        return queued
+
+    assert asyncio.run(scenario()) == 1
+    assert scheduler.snapshot()["max_in_flight"] == 4
+
+
+def test_circuit_breaker_fails_fast_then_probes_and_closes(guarded, monkeypatch):
+    _, breaker = guarded
+    monkeypatch.setattr(piston.settings, "PISTON_URLS", "http://sandbox/api/v2")
+    calls = []
+    healthy = {"value": False}
+
+    def _handler(request):
+        calls.append(request.url.path)
+        if not healthy["value"]:
+            return httpx.Response(500, text="sandbox exploded")
+        return httpx.Response(200, json={"run": {"stdout": "ok", "code": 0}})
+
+    client = piston.PistonClient(transport=httpx.MockTransport(_handler))
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await client.request_json("POST", "/execute", {})
+        with pytest.raises(SandboxUnavailable) as rejected:
+            await client.request_json("POST", "/execute", {})
+        sent_while_open = len(calls)
+        await asyncio.sleep(0.25)
+        healthy["value"] = True
+        probe = await client.request_json("POST", "/execute", {})
+        return rejected.value, sent_while_open, probe
+
+    rejected, sent_while_open, probe = asyncio.run(scenario())
+
+    assert 0 < rejected.retry_after <= 0.2
+    assert sent_while_open == 2
+    assert probe["run"]["stdout"] == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_breaker_returns_503_with_retry_after(client, db_session, guarded, monkeypatch):
+    _, breaker = guarded
+    monkeypatch.setattr(sandbox_guard.settings, "PISTON_BREAKER_OPEN_SECONDS", 30)
+    headers = _auth_headers(client, db_session)
+    problem_id = _create_problem(
+        client,
+        headers,
+        title="Breaker",
+        difficulty="Easy",
+        description="Echo.",
+        constraints="None.",
+        tag_name="breaker",
+        test_cases=[{"input_text": "1", "output_text": "1", "is_sample": True, "order": 0}],
+    )
+    breaker.record(ok=False)
+    breaker.record(ok=False)
+
+    resp = client.post(
+        "/submission/run",
+        json={"problem_id": problem_id, "language": "python", "code": "print(input())"},
+        headers=headers,
+    )
+
+    assert resp.status_code == 503, resp.text
+    assert 1 <= int(resp.headers["Retry-After"]) <= 30
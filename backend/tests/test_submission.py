@@ -1,10 +1,22 @@
+import asyncio
+import json
+import os
 from pathlib import Path
+import shutil
+import subprocess
+import sys
 
+import httpx
 import pytest
 
-from app.models import User
+from app.controllers import submission as submission_controller
+from app.models import Submission, User
+from tests.conftest import TestingSessionLocal
 from tests.test_auth import _auth_headers_from_client, _register_user, _login_user
-from app.services import piston
+from app.services import local_sandbox, piston, piston_batch
+from app.services.execution_backends import run_limits
+from app.services.verdict_cache import source_digest, verdict_cache
+from config import settings
 
 
 def _auth_headers(client, db_session):
@@ -47,7 +59,7 @@ def _create_problem(
 
 def _piston_available() -> bool:
     try:
-        piston.get_runtime("python")
+        asyncio.run(piston.get_runtime("python"))
         return True
     except Exception:
         return False
@@ -58,25 +70,384 @@ def _algo_compiler_available() -> bool:
 
 
 def test_get_runtime_prefers_requested_language_on_cold_cache(monkeypatch):
-    piston._RUNTIME_CACHE.clear()
-    piston._RUNTIME_CACHE_TS = 0.0
+    piston.runtime_registry.reset()
 
-    monkeypatch.setattr(
-        piston,
-        "_fetch_runtimes",
-        lambda: [
+    async def _fake_fetch_runtimes():
+        return [
             {"language": "c", "version": "10.2.0", "aliases": ["gcc"]},
             {"language": "c++", "version": "10.2.0", "aliases": ["cpp", "g++"]},
             {"language": "javascript", "version": "20.11.1", "aliases": ["js"]},
             {"language": "python", "version": "3.11.0", "aliases": ["py", "python3"]},
-        ],
-    )
+        ]
+
+    monkeypatch.setattr(piston, "_fetch_runtimes", _fake_fetch_runtimes)
 
-    language, version = piston.get_runtime("cpp")
+    language, version = asyncio.run(piston.get_runtime("cpp"))
 
     assert language == "c++"
     assert version == "10.2.0"
 
+    # warm cache hits resolve aliases to the canonical runtime name too
+    assert asyncio.run(piston.get_runtime("cpp")) == ("c++", "10.2.0")
+
+
+def test_runtime_registry_single_flight_and_serves_stale_catalog(monkeypatch):
+    piston.runtime_registry.reset()
+    fetches = []
+
+    async def _fake_fetch_runtimes():
+        fetches.append(1)
+        if len(fetches) > 1:
+            raise RuntimeError("Piston /runtimes error: 503")
+        await asyncio.sleep(0.01)
+        return [
+            {"language": "python", "version": "3.10.0", "aliases": ["py"]},
+            {"language": "python", "version": "3.11.0", "aliases": ["py"]},
+            {"language": "javascript", "version": "20.11.1", "aliases": ["node"]},
+        ]
+
+    monkeypatch.setattr(piston, "_fetch_runtimes", _fake_fetch_runtimes)
+
+    async def _resolve_concurrently():
+        return await asyncio.gather(*(piston.get_runtime(lang) for lang in ["python", "py", "javascript"] * 5))
+
+    resolved = asyncio.run(_resolve_concurrently())
+    assert len(fetches) == 1
+    assert set(resolved) == {("python", "3.11.0"), ("javascript", "20.11.1")}
+
+    # past the TTL with Piston failing: the stale catalog keeps answering
+    monkeypatch.setattr(piston.settings, "PISTON_RUNTIMES_TTL_SECONDS", 0)
+    monkeypatch.setattr(piston.settings, "PISTON_RUNTIMES_RETRY_SECONDS", 0)
+    assert asyncio.run(piston.get_runtime("javascript")) == ("javascript", "20.11.1")
+    with pytest.raises(ValueError):
+        asyncio.run(piston.get_runtime("cobol"))
+    assert len(fetches) >= 2
+    piston.runtime_registry.reset()
+
+
+def _local_python_piston(tmp_path, calls, rewrite_stdout=None):
+    # Mimics Piston's python runtime: every file lands in the job directory and
+    # the first one is executed with the request args.
+    def _handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        calls.append(payload)
+        job_dir = tmp_path / f"job{len(calls)}"
+        job_dir.mkdir()
+        for idx, file in enumerate(payload["files"]):
+            (job_dir / file.get("name", f"file{idx}.code")).write_text(file["content"])
+        first = payload["files"][0].get("name", "file0.code")
+        completed = subprocess.run(
+            [sys.executable, first, *payload.get("args", [])],
+            input=payload["stdin"],
+            cwd=job_dir,
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+        stdout = completed.stdout
+        if rewrite_stdout is not None:
+            stdout = rewrite_stdout(payload, stdout)
+        return httpx.Response(
+            200,
+            json={
+                "language": payload["language"],
+                "version": payload["version"],
+                "run": {
+                    "stdout": stdout,
+                    "stderr": completed.stderr,
+                    "code": completed.returncode,
+                    "signal": None,
+                },
+            },
+        )
+
+    return piston.PistonClient(transport=httpx.MockTransport(_handler))
+
+
+async def _fake_python_runtime(language):
+    return "python", "3.11.0"
+
+
+def test_execute_test_cases_batches_cases_into_one_request(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(piston.settings, "PISTON_BATCH_ENABLED", True)
+    monkeypatch.setattr(piston, "get_runtime", _fake_python_runtime)
+    monkeypatch.setattr(piston, "piston_client", _local_python_piston(tmp_path, calls))
+
+    results = asyncio.run(
+        piston.execute_test_cases(
+            language="python",
+            source_code="a, b = map(int, input().split())\nprint(a + b)",
+            test_cases=[
+                {"id": 1, "input_text": "1 2", "output_text": "3", "is_sample": True},
+                {"id": 2, "input_text": "2 2", "output_text": "5", "is_sample": False},
+                {"id": 3, "input_text": "oops", "output_text": "0", "is_sample": False},
+            ],
+        )
+    )
+
+    assert len(calls) == 1
+    assert [r["id"] for r in results] == [1, 2, 3]
+    assert results[0]["passed"] is True
+    assert results[0]["stdout"] == "3\n"
+    assert results[1]["passed"] is False
+    assert results[1]["status_id"] == 0
+    assert results[2]["status_id"] == 1
+    assert "ValueError" in results[2]["stderr"]
+    assert piston.summarize_results(results) == {"passed": 1, "total": 3, "verdict": "RE"}
+    assert all(float(r["time"]) >= 0 and r["cpu_time"] is not None and r["memory"] > 0 for r in results)
+    usage = piston.summarize_usage(results)
+    assert usage["memory_kb"] == max(r["memory"] for r in results)
+    assert usage["runtime_ms"] == max(round(float(r["cpu_time"]) * 1000) for r in results)
+
+
+def test_execute_test_cases_fail_fast_skips_cases_after_first_failure(monkeypatch):
+    calls = []
+
+    async def fake_execute_piston(language, source_code, stdin, limits=None):
+        calls.append(stdin)
+        await asyncio.sleep(0.01)
+        return {"run": {"stdout": stdin, "stderr": "", "code": 0, "signal": None}}
+
+    monkeypatch.setattr(piston.settings, "EXECUTION_MAX_WORKERS", 1)
+    monkeypatch.setattr(piston, "execute_piston", fake_execute_piston)
+    test_cases = [
+        {"id": idx, "input_text": str(idx), "output_text": "2" if idx == 2 else "x", "is_sample": idx == 1}
+        for idx in range(1, 6)
+    ]
+    test_cases[0]["output_text"] = "1"
+    reported = []
+
+    results = asyncio.run(
+        piston.execute_test_cases(
+            language="python",
+            source_code="print(input())",
+            test_cases=test_cases,
+            fail_fast=True,
+            on_case=lambda idx, result: reported.append(idx),
+        )
+    )
+
+    assert calls[:3] == ["1", "2", "3"]
+    assert "5" not in calls
+    assert [r["passed"] for r in results] == [True, True, False, False, False]
+    assert [r.get("skipped", False) for r in results] == [False, False, False, True, True]
+    assert results[3]["status"] == "Skipped"
+    assert reported == [0, 1, 2]
+    assert piston.summarize_results(results) == {"passed": 2, "total": 5, "verdict": "WA"}
+
+
+def test_execute_test_cases_uses_problem_checker(monkeypatch):
+    async def fake_execute_piston(language, source_code, stdin, limits=None):
+        return {"run": {"stdout": "0.3333334\n", "stderr": "", "code": 0, "signal": None}}
+
+    monkeypatch.setattr(piston, "execute_piston", fake_execute_piston)
+    case = {"id": 1, "input_text": "", "output_text": "0.333333", "is_sample": True}
+
+    def judge(**checker):
+        return asyncio.run(
+            piston.execute_test_cases(language="python", source_code="", test_cases=[{**case, **checker}])
+        )[0]
+
+    strict = judge()
+    assert strict["passed"] is False
+    assert strict["mismatch"] == {"line": 1, "column": 9, "expected": "", "actual": "4"}
+    assert judge(checker="float", checker_tolerance=1e-5)["passed"] is True
+    assert judge(checker="float", checker_tolerance=1e-5)["mismatch"] is None
+
+
+def test_execute_test_cases_maps_limit_overruns_to_verdicts(monkeypatch):
+    runs = {
+        "ok": {"stdout": "1\n", "code": 0, "signal": None, "cpu_time": 120, "wall_time": 150, "memory": 8 << 20},
+        "slow": {"stdout": "", "code": None, "signal": "SIGKILL", "cpu_time": 400, "wall_time": 1002, "memory": 8 << 20},
+        "hog": {"stdout": "", "code": 137, "signal": None, "cpu_time": 300, "wall_time": 320, "memory": 62 << 20},
+    }
+    payloads = []
+
+    async def fake_execute_piston(language, source_code, stdin, limits=None):
+        payloads.append(limits)
+        return {"run": {"stderr": "", **runs[stdin]}}
+
+    monkeypatch.setattr(piston, "execute_piston", fake_execute_piston)
+    limits = run_limits("cpp", time_limit_ms=1000, memory_limit_mb=64)
+    results = asyncio.run(
+        piston.execute_test_cases(
+            language="cpp",
+            source_code="",
+            test_cases=[
+                {"id": idx, "input_text": stdin, "output_text": "1", "is_sample": True}
+                for idx, stdin in enumerate(runs, start=1)
+            ],
+            limits=limits,
+        )
+    )
+
+    assert payloads == [limits] * 3
+    assert results[0]["passed"] is True
+    assert (results[1]["status"], results[1]["limit"]) == ("Time Limit Exceeded", "TLE")
+    assert (results[2]["status"], results[2]["limit"]) == ("Memory Limit Exceeded", "MLE")
+    assert results[1]["mismatch"] is None and results[1]["passed"] is False
+    assert piston.summarize_results(results) == {"passed": 1, "total": 3, "verdict": "TLE"}
+
+
+def test_run_limits_apply_language_multipliers(monkeypatch):
+    monkeypatch.setattr(settings, "JUDGE_DEFAULT_TIME_LIMIT_MS", 2000)
+    monkeypatch.setattr(settings, "JUDGE_DEFAULT_MEMORY_LIMIT_MB", 256)
+    monkeypatch.setattr(settings, "JUDGE_TIME_MULTIPLIERS", "python=2.5, java=2")
+    monkeypatch.setattr(settings, "JUDGE_MEMORY_MULTIPLIERS", "java=2")
+
+    assert (run_limits("cpp").time_ms, run_limits("cpp").memory_mb) == (2000, 256)
+    assert run_limits("python", time_limit_ms=1000).time_ms == 2500
+    java = run_limits("java", time_limit_ms=1500, memory_limit_mb=100)
+    assert (java.time_ms, java.memory_mb, java.memory_bytes) == (3000, 200, 200 << 20)
+
+
+def test_execute_test_cases_reruns_cases_missing_from_batch_output(monkeypatch, tmp_path):
+    calls = []
+
+    def _keep_first_record(payload, stdout):
+        if "args" not in payload:
+            return stdout
+        return stdout.split("\n", 1)[0] + "\n"
+
+    monkeypatch.setattr(piston.settings, "PISTON_BATCH_ENABLED", True)
+    monkeypatch.setattr(piston, "get_runtime", _fake_python_runtime)
+    monkeypatch.setattr(piston, "piston_client", _local_python_piston(tmp_path, calls, _keep_first_record))
+
+    results = asyncio.run(
+        piston.execute_test_cases(
+            language="python",
+            source_code="print(int(input()) * 2)",
+            test_cases=[
+                {"id": idx, "input_text": str(idx), "output_text": str(idx * 2), "is_sample": True}
+                for idx in range(3)
+            ],
+        )
+    )
+
+    assert len(calls) == 3
+    assert all(r["passed"] for r in results)
+
+
+def test_batch_output_ignores_records_forged_by_the_submission(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(piston.settings, "PISTON_BATCH_ENABLED", True)
+    monkeypatch.setattr(piston, "get_runtime", _fake_python_runtime)
+    monkeypatch.setattr(piston, "piston_client", _local_python_piston(tmp_path, calls))
+    forger = (
+        "import os\n"
+        "try:\n"
+        "    with open(f'/proc/{os.getppid()}/fd/1', 'w') as fh:\n"
+        "        fh.write('@@CMCASE 0 0 - Mwo= - 1 1 1\\n@@CMCASE 1 0 - Mwo= - 1 1 1\\n')\n"
+        "except OSError:\n"
+        "    pass\n"
+        "print('wrong')\n"
+    )
+
+    results = asyncio.run(
+        piston.execute_test_cases(
+            language="python",
+            source_code=forger,
+            test_cases=[{"id": idx, "input_text": "", "output_text": "3", "is_sample": True} for idx in range(2)],
+        )
+    )
+
+    assert len(calls) == 1
+    assert calls[0]["stdin"].split("\n", 1)[0].split(" ")[4]
+    assert [r["stdout"] for r in results] == ["wrong\n", "wrong\n"]
+    assert not any(r["passed"] for r in results)
+
+
+_MEMORY_SCANNER = r"""
+#include <fcntl.h>
+#include <stdio.h>
+#include <string.h>
+#include <unistd.h>
+
+static char chunk[1 << 16];
+static char input[32 << 20];
+
+int main(void) {
+    char line[512];
+    fread(input, 1, sizeof input, stdin);
+    long run = 0, found = 0;
+    FILE *maps = fopen("/proc/self/maps", "r");
+    int mem = open("/proc/self/mem", O_RDONLY);
+    while (fgets(line, sizeof line, maps)) {
+        unsigned long start, end;
+        char perms[5];
+        if (sscanf(line, "%lx-%lx %4s", &start, &end, perms) != 3 || perms[0] != 'r' || strstr(line, "[v")) continue;
+        for (unsigned long at = start; at < end; at += sizeof chunk) {
+            ssize_t got = pread(mem, chunk, sizeof chunk, (off_t)at);
+            if (got <= 0) break;
+            for (ssize_t i = 0; i < got; i++) {
+                run = chunk[i] == 'Q' ? run + 1 : 0;
+                if (run >= 4096) found = 1;
+            }
+        }
+    }
+    puts(found ? "found" : "clean");
+    return 0;
+}
+"""
+
+
+@pytest.mark.skipif(shutil.which("gcc") is None, reason="gcc is unavailable")
+def test_c_batch_harness_keeps_later_inputs_out_of_each_case(tmp_path):
+    (tmp_path / "main.c").write_text(_MEMORY_SCANNER)
+    (tmp_path / "cm_harness.c").write_text(piston_batch._harness_source("batch_harness.c"))
+    subprocess.run(
+        ["gcc", "-O2", "-o", "run", "main.c", "cm_harness.c"], cwd=tmp_path, check=True, capture_output=True
+    )
+    nonce = piston_batch.new_batch_nonce()
+    big = "Q" * (16 << 20)
+
+    completed = subprocess.run(
+        [str(tmp_path / "run")],
+        cwd=tmp_path,
+        input=piston_batch.encode_batch_stdin(["", big], 5000, False, nonce).encode(),
+        capture_output=True,
+        timeout=60,
+    )
+    results = piston_batch.parse_batch_output(completed.stdout.decode(), 2, nonce)
+
+    assert [r["stdout"] for r in results] == ["clean\n", "found\n"]
+    # The parent's 16 MiB of buffered input is not billed to the first case.
+    assert results[0]["memory"] < 8 << 20
+
+
+def test_batch_falls_back_to_the_local_sandbox_when_piston_is_unavailable(monkeypatch):
+    class _Unavailable(piston.PistonBackend):
+        async def execute_batch(self, *args, **kwargs):
+            raise piston.SandboxUnavailable("Execution service is recovering", 5.0)
+
+    class _Local:
+        ran = []
+
+        def supports(self, language):
+            return True
+
+        def accepts(self, owner, lane):
+            return True
+
+        async def execute(self, language, source_code, stdin, limits=None):
+            self.ran.append(stdin)
+            return {"run": {"stdout": stdin, "stderr": "", "code": 0, "signal": None}}
+
+    local = _Local()
+    monkeypatch.setattr(piston.settings, "PISTON_BATCH_ENABLED", True)
+    monkeypatch.setattr(piston, "local_backend", local)
+    cases = [{"id": idx, "input_text": str(idx), "output_text": str(idx), "is_sample": True} for idx in range(3)]
+
+    monkeypatch.setattr(piston.settings, "EXECUTION_LOCAL_FALLBACK", False)
+    with pytest.raises(piston.SandboxUnavailable):
+        asyncio.run(piston.execute_test_cases("python", "", cases, backend=_Unavailable()))
+
+    monkeypatch.setattr(piston.settings, "EXECUTION_LOCAL_FALLBACK", True)
+    results = asyncio.run(piston.execute_test_cases("python", "", cases, backend=_Unavailable()))
+    assert sorted(local.ran) == ["0", "1", "2"]
+    assert all(r["passed"] for r in results)
+
 
 @pytest.mark.skipif(not _piston_available(), reason="Piston execution service is unavailable")
 def test_run_submission_executes_real_code_and_returns_ac(client, db_session):
@@ -185,6 +556,231 @@ def test_submit_submission_executes_real_code_and_counts_hidden_cases(client, db
     assert body["cases"][0]["stdout"].strip() == "3", body
 
 
+def test_submit_reuses_cached_verdict_until_test_cases_change(client, db_session, monkeypatch):
+    calls = []
+
+    async def fake_execute_piston(language, source_code, stdin, limits=None):
+        calls.append(stdin)
+        return {"run": {"stdout": "3\n", "stderr": "", "code": 0, "signal": None}}
+
+    verdict_cache.clear()
+    monkeypatch.setattr(piston.settings, "VERDICT_CACHE_REDIS_ENABLED", False)
+    monkeypatch.setattr(piston, "get_runtime", _fake_python_runtime)
+    monkeypatch.setattr(piston, "execute_piston", fake_execute_piston)
+    headers = _auth_headers(client, db_session)
+    test_cases = [
+        {"input_text": "1 2", "output_text": "3", "is_sample": True, "order": 0},
+        {"input_text": "0 3", "output_text": "3", "is_sample": False, "order": 1},
+    ]
+    problem_id = _create_problem(
+        client,
+        headers,
+        title="Cached Sum",
+        difficulty="Easy",
+        description="Return the sum of two integers.",
+        constraints="Input size small.",
+        tag_name="cache",
+        test_cases=test_cases,
+    )
+    payload = {"problem_id": problem_id, "language": "python", "code": "print(3)\n"}
+
+    first = client.post("/submission/submit", json=payload, headers=headers)
+    second = client.post("/submission/submit", json={**payload, "code": "print(3)\r\n"}, headers=headers)
+    assert first.status_code == 200 and second.status_code == 200, second.text
+    assert first.json() == second.json()
+    assert len(calls) == 2
+    assert db_session.query(Submission).filter(Submission.problem_id == problem_id).count() == 2
+    # Whitespace other than line endings can change behaviour, so it is a new key.
+    assert source_digest('print("a ")\n') != source_digest('print("a")\n')
+    assert source_digest("x = 1 + \\\n2\n") != source_digest("x = 1 + \\ \n2\n")
+
+    update = client.put(
+        f"/problem/{problem_id}",
+        json={
+            "title": "Cached Sum",
+            "difficulty": "Easy",
+            "external_link": None,
+            "description": "Return the sum of two integers.",
+            "constraints": "Input size small.",
+            "tag_ids": [],
+            "test_cases": test_cases + [{"input_text": "2 1", "output_text": "3", "is_sample": False, "order": 2}],
+        },
+        headers=headers,
+    )
+    assert update.status_code == 200, update.text
+
+    third = client.post("/submission/submit", json=payload, headers=headers)
+    assert third.status_code == 200, third.text
+    assert third.json()["total"] == 3
+    assert len(calls) == 5
+
+
+def _sse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_concurrent_identical_judge_calls_share_one_execution(monkeypatch):
+    from app.controllers.submission import judge_cases
+    from app.services.single_flight import single_flight
+
+    calls = []
+
+    async def fake_execute_piston(language, source_code, stdin, limits=None):
+        calls.append(stdin)
+        await asyncio.sleep(0.05)
+        return {"run": {"stdout": "3\n", "stderr": "", "code": 0, "signal": None}}
+
+    monkeypatch.setattr(piston, "get_runtime", _fake_python_runtime)
+    monkeypatch.setattr(piston, "execute_piston", fake_execute_piston)
+    monkeypatch.setattr(settings, "VERDICT_CACHE_ENABLED", False)
+    single_flight.clear()
+    cases = [{"id": 1, "input_text": "1 2", "output_text": "3", "is_sample": True}]
+
+    async def scenario():
+        judge = lambda code, owner: judge_cases(1, "python", code, cases, owner=owner)
+        first, second, other = await asyncio.gather(
+            judge("print(3)", "user:1"), judge("print(3)", "user:2"), judge("print(1 + 2)", "user:1")
+        )
+        again = await judge("print(3)", "user:1")
+        return first, second, other, again
+
+    first, second, other, again = asyncio.run(scenario())
+
+    assert first is second and first[0]["passed"] is True
+    assert other is not first and again is not first
+    assert len(calls) == 3
+    assert single_flight.stats() == {"in_flight": 0, "leaders": 3, "followers": 1, "remote_followers": 0}
+
+
+def test_shared_runs_charge_cpu_to_every_caller(monkeypatch):
+    from app.controllers.submission import judge_cases
+    from app.services.single_flight import single_flight
+
+    class RecordingQuota:
+        def __init__(self):
+            self.settled = []
+
+        async def settle(self, cpu_seconds):
+            self.settled.append(cpu_seconds)
+
+    async def fake_execute_piston(language, source_code, stdin, limits=None):
+        await asyncio.sleep(0.05)
+        return {"run": {"stdout": "3\n", "stderr": "", "code": 0, "signal": None, "cpu_time": 500}}
+
+    monkeypatch.setattr(piston, "get_runtime", _fake_python_runtime)
+    monkeypatch.setattr(piston, "execute_piston", fake_execute_piston)
+    monkeypatch.setattr(settings, "VERDICT_CACHE_ENABLED", False)
+    single_flight.clear()
+    cases = [{"id": 1, "input_text": "1 2", "output_text": "3", "is_sample": True}]
+    leader, follower = RecordingQuota(), RecordingQuota()
+
+    async def scenario():
+        judge = lambda owner, quota: judge_cases(1, "python", "print(3)", cases, owner=owner, quota=quota)
+        leading = asyncio.ensure_future(judge("user:1", leader))
+        await asyncio.sleep(0)
+        following = asyncio.ensure_future(judge("user:2", follower))
+        await asyncio.sleep(0.01)
+        leading.cancel()  # the leader's client went away mid-run
+        await following
+
+    asyncio.run(scenario())
+
+    assert leader.settled == [0.5]
+    assert follower.settled == [0.5]
+
+
+def test_submit_stream_emits_case_events_then_summary(client, db_session, monkeypatch):
+    async def fake_execute_piston(language, source_code, stdin, limits=None):
+        # later cases finish first so events follow completion, not test order
+        await asyncio.sleep(0.05 * (3 - int(stdin)))
+        return {"run": {"stdout": "ok" if stdin != "2" else "bad", "stderr": "", "code": 0, "signal": None}}
+
+    verdict_cache.clear()
+    monkeypatch.setattr(piston.settings, "VERDICT_CACHE_ENABLED", False)
+    monkeypatch.setattr(piston, "get_runtime", _fake_python_runtime)
+    monkeypatch.setattr(piston, "execute_piston", fake_execute_piston)
+    sessions = []
+
+    def session_factory():
+        sessions.append(TestingSessionLocal(bind=db_session.get_bind()))
+        return sessions[-1]
+
+    monkeypatch.setattr(submission_controller, "session_factory", session_factory)
+    headers = _auth_headers(client, db_session)
+    problem_id = _create_problem(
+        client,
+        headers,
+        title="Streamed",
+        difficulty="Easy",
+        description="Print ok.",
+        constraints="None.",
+        tag_name="stream",
+        test_cases=[
+            {"input_text": "0", "output_text": "ok", "is_sample": True, "order": 0},
+            {"input_text": "1", "output_text": "ok", "is_sample": False, "order": 1},
+            {"input_text": "2", "output_text": "ok", "is_sample": False, "order": 2},
+        ],
+    )
+    payload = {"problem_id": problem_id, "language": "python", "code": "print('ok')"}
+
+    resp = client.post("/submission/submit/stream", json=payload, headers=headers)
+    assert resp.status_code == 200, resp.text
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _sse_events(resp.text)
+
+    assert [name for name, _ in events] == ["case", "case", "case", "summary"]
+    cases = [data for name, data in events if name == "case"]
+    assert [c["index"] for c in cases] == [2, 1, 0]
+    assert [c["completed"] for c in cases] == [1, 2, 3]
+    # hidden cases report progress but stay redacted exactly like the summary
+    assert cases[0]["case"] is None and cases[0]["passed"] is False
+    assert cases[2]["case"]["input_text"] == "0"
+
+    blocking = client.post("/submission/submit", json=payload, headers=headers)
+    assert events[-1][1] == blocking.json()
+    assert events[-1][1]["hidden"] == {"passed": 1, "total": 2}
+    assert db_session.query(Submission).filter(Submission.problem_id == problem_id).count() == 2
+    # The streamed submit is recorded through its own session, not the request's.
+    assert len(sessions) == 1
+
+    missing = client.post("/submission/run/stream", json={**payload, "problem_id": 999999}, headers=headers)
+    assert missing.status_code == 404
+
+
+def test_run_stream_reports_execution_failure_as_error_event(client, db_session, monkeypatch):
+    async def broken_execute_piston(language, source_code, stdin, limits=None):
+        raise RuntimeError("Piston /execute error: 500")
+
+    verdict_cache.clear()
+    monkeypatch.setattr(piston.settings, "VERDICT_CACHE_ENABLED", False)
+    monkeypatch.setattr(piston, "get_runtime", _fake_python_runtime)
+    monkeypatch.setattr(piston, "execute_piston", broken_execute_piston)
+    headers = _auth_headers(client, db_session)
+    problem_id = _create_problem(
+        client,
+        headers,
+        title="Streamed Failure",
+        difficulty="Easy",
+        description="Print ok.",
+        constraints="None.",
+        tag_name="stream-error",
+        test_cases=[{"input_text": "0", "output_text": "ok", "is_sample": True, "order": 0}],
+    )
+
+    resp = client.post(
+        "/submission/run/stream",
+        json={"problem_id": problem_id, "language": "python", "code": "print('ok')"},
+        headers=headers,
+    )
+
+    assert resp.status_code == 200
+    assert _sse_events(resp.text) == [("error", {"status_code": 502, "detail": "Execution service unavailable"})]
+
+
 def test_submission_run_requires_sample_cases(client, db_session):
     headers = _auth_headers(client, db_session)
     problem_id = _create_problem(
@@ -380,3 +976,140 @@ def test_run_submission_algo_problem_returns_wa_for_wrong_answer(client, db_sess
     assert body["passed"] == 0, body
     assert body["total"] == 1, body
     assert body["cases"][0]["stdout"].strip() == "4", body
+
+
+def test_piston_client_pool_follows_app_lifespan(client):
+    node = piston.piston_client.nodes[0]
+    assert node.client is not None
+    assert not node.client.is_closed
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Local sandbox uses Linux rlimits and namespaces")
+def test_local_sandbox_backend_judges_python_and_enforces_limits(monkeypatch):
+    monkeypatch.setattr(piston.settings, "LOCAL_SANDBOX_CPU_SECONDS", 1)
+    monkeypatch.setattr(piston.settings, "LOCAL_SANDBOX_WALL_SECONDS", 3.0)
+
+    results = asyncio.run(
+        piston.execute_test_cases(
+            language="python",
+            source_code=(
+                "import socket, sys\n"
+                "line = input()\n"
+                "if line == 'spin':\n"
+                "    while True: pass\n"
+                "if line == 'net':\n"
+                "    socket.create_connection(('1.1.1.1', 53), timeout=1)\n"
+                "a, b = map(int, line.split())\n"
+                "print(a + b)\n"
+            ),
+            test_cases=[
+                {"id": 1, "input_text": "1 2", "output_text": "3", "is_sample": True},
+                {"id": 2, "input_text": "spin", "output_text": "", "is_sample": True},
+                {"id": 3, "input_text": "net", "output_text": "", "is_sample": True},
+            ],
+            backend=piston.local_backend,
+        )
+    )
+
+    assert results[0]["passed"] is True, results[0]
+    assert results[0]["memory"] > 0 and results[0]["cpu_time"] is not None, results[0]
+    assert results[1]["status"].startswith("Signal"), results[1]
+    assert float(results[1]["cpu_time"]) >= 0.9, results[1]
+    assert results[2]["status_id"] == 1, results[2]
+    assert "OSError" in results[2]["stderr"] or "unreachable" in results[2]["stderr"], results[2]
+
+    limited = asyncio.run(
+        piston.execute_test_cases(
+            language="python",
+            source_code="while True: pass\n",
+            test_cases=[{"id": 1, "input_text": "", "output_text": "", "is_sample": True}],
+            backend=piston.local_backend,
+            limits=run_limits("cpp", time_limit_ms=1000, memory_limit_mb=256),
+        )
+    )
+    assert limited[0]["limit"] == "TLE", limited[0]
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Local sandbox uses Linux namespaces")
+@pytest.mark.parametrize("privileged", [True, False])
+def test_local_sandbox_jails_programs_in_their_work_dir(monkeypatch, privileged):
+    if privileged and os.geteuid() != 0:
+        pytest.skip("dropping to the sandbox ids needs root")
+    monkeypatch.setattr(local_sandbox, "_privileged", lambda: privileged)
+    source = (
+        "import os\n"
+        f"print(os.path.exists({str(Path(__file__).resolve())!r}), os.getuid())\n"
+        "print(sorted(os.listdir('/')))\n"
+        "open('scratch', 'w').write('ok')\n"
+    )
+
+    result = asyncio.run(piston.LocalSandboxBackend().execute("python", source, ""))
+
+    assert result["run"]["code"] == 0, result
+    visible, uid, listing = result["run"]["stdout"].replace("\n", " ", 1).split(" ", 2)
+    assert visible == "False"
+    assert "'main.py'" in listing and "'scratch'" not in listing
+    assert int(uid) == settings.LOCAL_SANDBOX_UID
+
+
+@pytest.mark.parametrize("privileged", [True, False])
+def test_local_sandbox_jail_survives_a_chroot_escape(monkeypatch, privileged):
+    if privileged and os.geteuid() != 0:
+        pytest.skip("dropping to the sandbox ids needs root")
+    monkeypatch.setattr(local_sandbox, "_privileged", lambda: privileged)
+    source = (
+        "import os\n"
+        "os.makedirs('/tmp/sub', exist_ok=True)\n"
+        "try:\n"
+        "    os.chroot('/tmp/sub')\n"
+        "    for _ in range(64):\n"
+        "        os.chdir('..')\n"
+        "    os.chroot('.')\n"
+        "except OSError as exc:\n"
+        "    print('refused', exc.errno)\n"
+        f"print(os.path.exists({str(Path(__file__).resolve())!r}))\n"
+    )
+
+    result = asyncio.run(piston.LocalSandboxBackend().execute("python", source, ""))
+
+    assert result["run"]["code"] == 0, result
+    assert result["run"]["stdout"].split() == ["refused", "1", "False"]
+
+
+def test_unisolated_local_sandbox_only_takes_signed_in_sample_runs(monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_SANDBOX_ISOLATE_FILESYSTEM", False)
+    monkeypatch.setattr(settings, "EXECUTION_LOCAL_FALLBACK", True)
+    local = piston.local_backend
+    assert local.accepts("user:7", "run")
+    assert not local.accepts("ip:203.0.113.9", "run")
+    assert not local.accepts("user:7", "submit")
+
+    class _Unavailable(piston.PistonBackend):
+        async def execute(self, *args, **kwargs):
+            raise piston.SandboxUnavailable("Execution service is recovering", 5.0)
+
+    case = {"id": 1, "input_text": "", "output_text": "", "is_sample": True}
+    with pytest.raises(piston.SandboxUnavailable):
+        asyncio.run(
+            piston.execute_test_cases("python", "print()", [case], owner="user:7", backend=_Unavailable(), lane="submit")
+        )
+
+
+def test_local_sandbox_backend_compiles_cpp_once(monkeypatch):
+    if subprocess.run(["which", piston.settings.LOCAL_SANDBOX_CXX], capture_output=True).returncode != 0:
+        pytest.skip("C++ compiler unavailable")
+    backend = piston.LocalSandboxBackend()
+    source = "#include <iostream>\nint main(){long long a,b;std::cin>>a>>b;std::cout<<a*b<<'\\n';}\n"
+
+    async def scenario():
+        first = await backend.execute("cpp", source, "6 7")
+        second = await backend.execute("c++", source, "3 3")
+        broken = await backend.execute("cpp", "int main( {", "")
+        return first, second, broken
+
+    first, second, broken = asyncio.run(scenario())
+
+    assert first["run"]["stdout"] == "42\n"
+    assert second["run"]["stdout"] == "9\n"
+    assert len(backend._binaries) == 1
+    assert "run" not in broken and broken["compile"]["code"] != 0
@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+
+from app.controllers import submission_jobs
+from app.models import Submission, User
+from app.services import piston
+from app.services.job_queue import InMemoryJobQueue, JobWorker, PermanentJobError
+from app.services.rate_limiter import reset_rate_limiter
+from app.services.verdict_cache import verdict_cache
+from tests.conftest import TestingSessionLocal
+from tests.test_submission import _auth_headers, _create_problem, _fake_python_runtime, _sse_events
+
+
+@pytest.fixture
+def jobs(monkeypatch, db_session):
+    verdict_cache.clear()
+    monkeypatch.setattr(piston.settings, "VERDICT_CACHE_ENABLED", False)
+    monkeypatch.setattr(piston.settings, "SUBMISSION_QUEUE_RETRY_BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(piston.settings, "SUBMISSION_JOB_POLL_SECONDS", 0.02)
+    monkeypatch.setattr(piston, "get_runtime", _fake_python_runtime)
+    monkeypatch.setattr(submission_jobs, "session_factory", lambda: TestingSessionLocal(bind=db_session.get_bind()))
+
+
+def _sum_problem(client, headers, tag_name):
+    return _create_problem(
+        client,
+        headers,
+        title=f"Queued Sum {tag_name}",
+        difficulty="Easy",
+        description="Return the sum of two integers.",
+        constraints="Input size small.",
+        tag_name=tag_name,
+        test_cases=[
+            {"input_text": "1 2", "output_text": "3", "is_sample": True, "order": 0},
+            {"input_text": "2 2", "output_text": "4", "is_sample": False, "order": 1},
+        ],
+    )
+
+
+def test_queued_submit_is_judged_by_worker_and_retried_on_backend_failure(client, db_session, jobs, monkeypatch):
+    calls = []
+
+    async def flaky_execute_piston(language, source_code, stdin, limits=None):
+        calls.append(stdin)
+        if len(calls) == 1:
+            raise RuntimeError("Piston /execute error: 502")
+        a, b = map(int, stdin.split())
+        return {"run": {"stdout": f"{a + b}\n", "stderr": "", "code": 0, "signal": None}}
+
+    monkeypatch.setattr(piston, "execute_piston", flaky_execute_piston)
+    headers = _auth_headers(client, db_session)
+    problem_id = _sum_problem(client, headers, "queue")
+    payload = {"problem_id": problem_id, "language": "python", "code": "print(sum(map(int, input().split())))"}
+
+    accepted = client.post("/submission/jobs", json=payload, headers=headers)
+    assert accepted.status_code == 202, accepted.text
+    job = accepted.json()
+    assert job["status"] == "queued" and job["done"] is False
+
+    events = _sse_events(client.get(f"/submission/jobs/{job['submission_id']}/events", headers=headers).text)
+    assert {name for name, _ in events} == {"status"}
+    final = events[-1][1]
+    assert final["done"] is True
+    assert final["verdict"] == "AC"
+    assert final["result"]["hidden"] == {"passed": 1, "total": 1}
+    assert len(calls) == 4  # both cases of the failed attempt, then both again on retry
+
+    polled = client.get(f"/submission/jobs/{job['submission_id']}", headers=headers)
+    assert polled.json() == final
+    row = db_session.get(Submission, job["submission_id"])
+    assert (row.verdict, row.passed, row.total, row.status) == ("AC", 2, 2, "AC")
+
+
+def test_queued_submit_fails_after_max_attempts(client, db_session, jobs, monkeypatch):
+    async def broken_execute_piston(language, source_code, stdin, limits=None):
+        raise RuntimeError("Piston /execute error: 500")
+
+    monkeypatch.setattr(piston.settings, "SUBMISSION_QUEUE_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(piston, "execute_piston", broken_execute_piston)
+    headers = _auth_headers(client, db_session)
+    problem_id = _sum_problem(client, headers, "queue-fail")
+
+    accepted = client.post(
+        "/submission/jobs",
+        json={"problem_id": problem_id, "language": "python", "code": "print(3)"},
+        headers=headers,
+    )
+    submission_id = accepted.json()["submission_id"]
+    final = _sse_events(client.get(f"/submission/jobs/{submission_id}/events", headers=headers).text)[-1][1]
+
+    assert final["status"] == "failed"
+    assert final["detail"] == "Execution service unavailable"
+    assert final["result"] is None
+    assert client.get("/submission/jobs/999999", headers=headers).status_code == 404
+
+
+def test_enqueue_rejects_users_with_too_many_pending_jobs(client, db_session, jobs, monkeypatch):
+    headers = _auth_headers(client, db_session)
+    problem_id = _sum_problem(client, headers, "queue-busy")
+    user = db_session.query(User).filter(User.email == "submit@example.com").first()
+    for status in (submission_jobs.QUEUED, submission_jobs.RUNNING):
+        db_session.add(Submission(user_id=user.id, problem_id=problem_id, language="python", code="", status=status))
+    db_session.commit()
+    monkeypatch.setattr(piston.settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(piston.settings, "RATE_LIMIT_SUBMISSION_SUBMIT", "100/minute")
+    monkeypatch.setattr(piston.settings, "EXECUTION_CONCURRENCY_LIMIT", 2)
+    reset_rate_limiter()
+
+    try:
+        busy = client.post(
+            "/submission/jobs",
+            json={"problem_id": problem_id, "language": "python", "code": "print(3)"},
+            headers=headers,
+        )
+    finally:
+        reset_rate_limiter()
+
+    assert busy.status_code == 429
+    assert busy.json()["detail"] == "Too many executions in progress"
+    assert db_session.query(Submission).filter(Submission.user_id == user.id).count() == 2
+
+
+def test_job_worker_does_not_retry_permanent_failures():
+    queue = InMemoryJobQueue()
+    handled, failed = [], []
+
+    async def handler(job):
+        handled.append(job)
+        raise PermanentJobError("problem deleted")
+
+    async def on_failure(job, exc):
+        failed.append((job["id"], str(exc)))
+
+    async def scenario():
+        worker = JobWorker(queue, handler, on_failure, concurrency=2)
+        await queue.enqueue({"id": 1})
+        await worker.start()
+        for _ in range(100):
+            if failed:
+                break
+            await asyncio.sleep(0.01)
+        await worker.close()
+
+    asyncio.run(scenario())
+
+    assert handled == [{"id": 1}]
+    assert failed == [(1, "problem deleted")]
+    assert len(queue) == 0
+
+
+def test_job_worker_backs_off_without_holding_a_consumer(monkeypatch):
+    monkeypatch.setattr(piston.settings, "SUBMISSION_QUEUE_RETRY_BACKOFF_SECONDS", 0.3)
+    queue = InMemoryJobQueue()
+    handled = []
+
+    async def handler(job):
+        handled.append((job["id"], job.get("attempt", 1)))
+        if job["id"] == 1 and job.get("attempt", 1) == 1:
+            raise RuntimeError("Piston /execute error: 502")
+
+    async def on_failure(job, exc):
+        raise AssertionError(f"job {job} should not fail")
+
+    async def scenario():
+        worker = JobWorker(queue, handler, on_failure, concurrency=1)
+        await queue.enqueue({"id": 1})
+        await queue.enqueue({"id": 2})
+        await worker.start()
+        await asyncio.sleep(0.15)
+        during_backoff = list(handled)
+        for _ in range(100):
+            if len(handled) == 3:
+                break
+            await asyncio.sleep(0.02)
+        await worker.close()
+        return during_backoff
+
+    during_backoff = asyncio.run(scenario())
+
+    assert during_backoff == [(1, 1), (2, 1)]
+    assert handled == [(1, 1), (2, 1), (1, 2)]
+    assert len(queue) == 0